@@ -1,3 +1,4 @@
+// font_to_bin manifest: ee0689c40260c9cc8f16c03a768696950e676a0e424341b8caf30c9613d54672
 #include <stdint.h>
 
 // --- 8x8 Font Data (Misaki Gothic) ---
@@ -0,0 +1,55 @@
+"""
+並列描画 (render_charset_bits の jobs 指定) と1プロセスでの描画を比較するベンチマーク。
+
+リポジトリのルートで次のように実行します:
+    python -m benchmarks.bench_parallel --range jis1 --jobs 1 2 4 8
+"""
+import argparse
+import os
+import time
+
+from charset import parse_range
+from font_engine import clear_font_cache, render_charset_bits
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_render(charset, font_path, size, jobs):
+    # キャッシュを空にして、毎回フォントの読み込みから計測する
+    clear_font_cache()
+    start = time.perf_counter()
+    glyphs = render_charset_bits(charset, font_path, size, jobs)
+    return time.perf_counter() - start, glyphs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="並列描画のベンチマーク")
+    parser.add_argument("--font", default=os.path.join(ROOT_DIR, "DotGothic16-Regular.ttf"))
+    parser.add_argument("--size", type=int, default=16)
+    parser.add_argument("--range", default="jis1")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    charset = parse_range(args.range)
+    print(f"{os.path.basename(args.font)} {args.size}px, {len(charset)}文字, "
+          f"CPU数 {os.cpu_count()}, 各 {args.repeat} 回の最良値")
+
+    serial = min(time_render(charset, args.font, args.size, None)[0]
+                 for _ in range(args.repeat))
+    _, expected = time_render(charset, args.font, args.size, None)
+    print(f"{'serial':>8}: {serial:7.3f}s {len(charset) / serial:10.0f} glyphs/s")
+
+    for jobs in args.jobs:
+        best = None
+        for _ in range(args.repeat):
+            elapsed, glyphs = time_render(charset, args.font, args.size, jobs)
+            if glyphs != expected:
+                raise SystemExit(f"jobs={jobs} の結果が1プロセスでの描画と一致しません")
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{f'jobs={jobs}':>8}: {best:7.3f}s {len(charset) / best:10.0f} glyphs/s "
+              f"(x{serial / best:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+ヘッドレスで使うスクリプト (バッチCLI版・font_build.py・convASCII.py など) の起動の速さを確認するベンチマーク。
+python -X importtime で次の2点を確認し、満たさない場合は終了コード 1 で終了します (CI での確認用)。
+
+- モジュールの読み込み時間が予算 (IMPORT_BUDGETS_MS) 以内であること
+- ヘルプの表示・生成条件が前回と同じ場合・ディスクキャッシュにある文字だけを出力する場合に、
+  Pillow・tkinter・NumPy・multiprocessing を読み込まないこと
+
+リポジトリのルートで次のように実行します:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget-scale 2   # 遅いマシンでは予算を2倍にする
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# モジュールの読み込み時間の予算 (ミリ秒、python -X importtime の累積時間)
+IMPORT_BUDGETS_MS = {
+    "font_to_binary_batch": 100,
+    "font_build": 100,
+    "convASCII": 80,
+    "font_to_binary_CUI": 80,
+    "render_server": 200,
+}
+
+# 描画せずに済む場合に読み込んではいけないモジュール
+FORBIDDEN = ("PIL", "tkinter", "numpy", "multiprocessing")
+
+
+def run_importtime(args, cwd=ROOT_DIR, env=None):
+    """
+    python -X importtime で args を実行し、(読み込んだモジュール名 -> 累積マイクロ秒, 経過秒) を返します。
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=cwd, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"実行に失敗しました: {' '.join(args)}\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules, elapsed
+
+
+def forbidden_modules(modules):
+    return sorted({name.split(".")[0] for name in modules} & set(FORBIDDEN))
+
+
+def check_imports(repeat, scale, out):
+    """
+    モジュールごとの読み込み時間を計測し、予算を超えたモジュールのリストを返します。
+    """
+    failures = []
+    print("モジュールの読み込み時間 (最良値)", file=out)
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        best = min(run_importtime(["-c", f"import {module}"])[0][module]
+                   for _ in range(repeat)) / 1000
+        limit = budget * scale
+        heavy = forbidden_modules(run_importtime(["-c", f"import {module}"])[0])
+        ok = best <= limit and not heavy
+        if not ok:
+            failures.append(module)
+        note = f"  読み込んだモジュール: {', '.join(heavy)}" if heavy else ""
+        print(f"  {module:<24}{best:8.1f}ms (予算 {limit:.0f}ms) {'OK' if ok else 'NG'}{note}",
+              file=out)
+    return failures
+
+
+def scenarios(work_dir):
+    """
+    (名前, 引数, 作業ディレクトリ, 準備として先に実行する引数のリスト) を順に返します。
+    準備の実行でグリフをディスクキャッシュに入れ、出力ファイルを作っておきます。
+    """
+    batch = os.path.join(ROOT_DIR, "font_to_binary_batch.py")
+    build = os.path.join(ROOT_DIR, "font_build.py")
+    table = (f"font={os.path.join(ROOT_DIR, 'misaki_gothic_2nd.ttf')},size=8,layout=row8,"
+             f"output={os.path.join(work_dir, 'font8.c')}")
+    blob = (f"font={os.path.join(ROOT_DIR, 'DotGothic16-Regular.ttf')},size=16,layout=row16,"
+            f"output={os.path.join(work_dir, 'font16.bin')}")
+    batch_args = [batch, "-r", "ascii", "-r", "kana", "-t", table, "-t", blob, "-q"]
+    yield "バッチCLI版 --help", [batch, "--help"], ROOT_DIR, []
+    yield "font_build.py --help", [build, "--help"], ROOT_DIR, []
+    yield "生成条件が前回と同じ", batch_args, ROOT_DIR, [batch_args]
+    yield "ディスクキャッシュから出力", batch_args + ["--force"], ROOT_DIR, [batch_args]
+    # convASCII.py はカレントディレクトリの array.c に出力する
+    convascii = os.path.join(ROOT_DIR, "convASCII.py")
+    yield "convASCII.py (生成条件が前回と同じ)", [convascii], work_dir, [[convascii]]
+
+
+def check_scenarios(repeat, out):
+    """
+    描画せずに済む場合に重いモジュールを読み込んでいないかを確認し、失敗した場合の名前のリストを返します。
+    """
+    failures = []
+    print("描画しない実行で読み込むモジュール (経過時間は最良値)", file=out)
+    with tempfile.TemporaryDirectory() as work_dir:
+        # ディスクキャッシュは一時ディレクトリに作る (利用者のキャッシュを使わない)
+        env = dict(os.environ, FONT_TO_BIN_CACHE_DIR=os.path.join(work_dir, "cache"))
+        for name, args, cwd, setup in scenarios(work_dir):
+            for setup_args in setup:
+                run_importtime(setup_args, cwd, env)
+            best = None
+            heavy = []
+            for _ in range(repeat):
+                modules, elapsed = run_importtime(args, cwd, env)
+                heavy = forbidden_modules(modules) or heavy
+                best = elapsed if best is None else min(best, elapsed)
+            if heavy:
+                failures.append(name)
+            note = f"NG  読み込んだモジュール: {', '.join(heavy)}" if heavy else "OK"
+            # 全角の名前は表示幅が2倍なので、文字数ではなく表示幅で揃える
+            width = sum(2 if ord(char) > 0x7F else 1 for char in name)
+            print(f"  {name}{' ' * max(1, 36 - width)}{best * 1000:8.1f}ms {note}", file=out)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="起動の速さ (モジュールの読み込み) のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="読み込み時間の予算に掛ける倍率 (遅いマシン用。既定: 1)")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat には1以上の数を指定してください。")
+
+    failures = check_imports(args.repeat, args.budget_scale, sys.stdout)
+    print()
+    failures += check_scenarios(args.repeat, sys.stdout)
+    if failures:
+        print(f"\n{len(failures)}件が予算を超えたか、不要なモジュールを読み込んでいます: "
+              f"{', '.join(failures)}")
+        return 1
+    print("\n全て予算内です。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+フォントの読み込み・描画・C言語ソースへの整形・ファイルへの書き出しの各段階を計測するベンチマーク。
+同梱の2つのフォントを 8px と 16px で、ASCII・かな・JIS第1水準の文字セットについて計測し、
+段階ごとの時間 (繰り返しの最良値と中央値)・1秒あたりのグリフ数・ピークRSS を表示します。
+
+リポジトリのルートで次のように実行します:
+    python -m benchmarks.bench_suite --output bench.json
+    python -m benchmarks.bench_suite --baseline bench.json   # 保存した結果と比較する
+
+--baseline を指定すると、最良値が基準より --threshold (%) 以上、かつ --min-delta 秒以上
+遅くなった段階を退行として表示し、終了コード 1 で終了します (CI での確認用)。
+ディスクのグリフキャッシュは使わず、各段階の前に必要なキャッシュを空にするので、
+何度実行しても同じ条件で計測されます。
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import PIL
+
+import glyph_array
+from charset import parse_range
+from font_engine import clear_font_cache, load_font, render_charset_bits, render_glyph_bits
+from font_to_binary_batch import generate_output, parse_table_spec, write_table
+
+try:
+    import resource
+except ImportError:
+    # Windows には resource モジュールが無い
+    resource = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FONTS = ["DotGothic16-Regular.ttf", "misaki_gothic_2nd.ttf"]
+SIZES = [8, 16]
+CHARSETS = ["ascii", "kana", "jis1"]
+STAGES = ["font_load", "glyph_render", "charset_render", "format_c", "write_c", "write_bin"]
+
+# glyph_render (1文字ずつの描画) で計測する文字数
+GLYPH_SAMPLE = 256
+
+# 結果の JSON の形式バージョン
+RESULT_VERSION = 1
+
+
+def peak_rss_kb():
+    """
+    このプロセスのこれまでのピークRSS (KB) を返します。計測できない環境では None を返します。
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト単位、Linux は KB 単位
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def time_stage(func, setup, repeat):
+    """
+    setup() の後に func() を実行する時間を repeat 回計測し、(最良値, 中央値) を秒で返します。
+    """
+    times = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+def default_layout(size):
+    """
+    実際のビルドと同じく、8px 以下は row8、16px 以下は row16、それ以上は packed を使います。
+    """
+    if size <= 8:
+        return "row8"
+    if size <= 16:
+        return "row16"
+    return "packed"
+
+
+def make_table(font_path, size, charset, output):
+    defaults = {"layout": default_layout(size), "reverse": False, "mirror": False, "name": "",
+                "title": "", "format": "", "lookup": False, "dedup": False, "compress": "none",
+                "proportional": False, "charset": charset}
+    return parse_table_spec(f"font={font_path},size={size},output={output}", defaults)
+
+
+def bench_case(font_path, size, charset_name, stages, repeat, work_dir):
+    """
+    1つのフォント・サイズ・文字セットの組み合わせを計測します。
+
+    Returns:
+        dict: 結果の JSON の results の1件。
+    """
+    charset = parse_range(charset_name)
+    sample = charset[:GLYPH_SAMPLE]
+    c_table = make_table(font_path, size, charset, os.path.join(work_dir, "bench.c"))
+    bin_table = make_table(font_path, size, charset, os.path.join(work_dir, "bench.bin"))
+
+    def warm():
+        # 整形・書き出しの段階は、描画済みのグリフがメモリ上にある状態で計測する
+        render_charset_bits(charset, font_path, size)
+
+    def warm_font():
+        clear_font_cache()
+        load_font(font_path, size)
+
+    plans = {
+        "font_load": (lambda: load_font(font_path, size), clear_font_cache, 0),
+        "glyph_render": (lambda: [render_glyph_bits(char, font_path, size) for char in sample],
+                         warm_font, len(sample)),
+        "charset_render": (lambda: render_charset_bits(charset, font_path, size),
+                           clear_font_cache, len(charset)),
+        "format_c": (lambda: write_table(io.StringIO(), c_table, charset, False),
+                     warm, len(charset)),
+        "write_c": (lambda: generate_output(c_table["output"], [c_table], False, force=True),
+                    warm, len(charset)),
+        "write_bin": (lambda: generate_output(bin_table["output"], [bin_table], False,
+                                              force=True),
+                      warm, len(charset)),
+    }
+    results = {}
+    for stage in stages:
+        func, setup, glyphs = plans[stage]
+        best, median = time_stage(func, setup, repeat)
+        results[stage] = {
+            "seconds": best,
+            "median": median,
+            "glyphs": glyphs,
+            "glyphs_per_sec": glyphs / best if glyphs and best else None,
+        }
+    return {
+        "font": os.path.basename(font_path),
+        "size": size,
+        "charset": charset_name,
+        "chars": len(charset),
+        "layout": c_table["layout"],
+        "stages": results,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def environment():
+    """
+    結果と一緒に記録する実行環境の情報を返します。
+    """
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "pillow": PIL.__version__,
+        "numpy": glyph_array.np.__version__ if glyph_array.available() else None,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def case_key(result):
+    return f"{result['font']} {result['size']}px {result['charset']}"
+
+
+def print_results(results, out):
+    # 全角の見出しは表示幅が2倍なので、空白の数で揃える
+    print("組み合わせ" + " " * 30 + "段階" + " " * 12 + " " * 6 + "最良" + " " * 4 + "中央値"
+          + f"{'glyphs/s':>12}", file=out)
+    for result in results:
+        for stage, timing in result["stages"].items():
+            rate = timing["glyphs_per_sec"]
+            rate = f"{rate:12.0f}" if rate else f"{'-':>12}"
+            print(f"{case_key(result):<40}{stage:<16}{timing['seconds'] * 1000:8.2f}ms"
+                  f"{timing['median'] * 1000:8.2f}ms{rate}", file=out)
+        rss = result["peak_rss_kb"]
+        if rss is not None:
+            print(f"{case_key(result):<40}{'peak_rss':<16}{rss / 1024:8.1f}MB", file=out)
+
+
+def compare_results(results, baseline, threshold, min_delta, out):
+    """
+    baseline (保存した結果の JSON) と比較して表示し、退行した (組み合わせ, 段階) のリストを返します。
+
+    Args:
+        threshold (float): 退行とみなす遅くなった割合 (0.1 は10%)。
+        min_delta (float): 退行とみなす最小の差 (秒)。ごく短い段階の揺らぎを無視します。
+    """
+    before = {case_key(result): result for result in baseline["results"]}
+    env = baseline.get("environment", {})
+    print(f"\n基準: {env.get('date', '?')} (Python {env.get('python', '?')}, "
+          f"Pillow {env.get('pillow', '?')}, NumPy {env.get('numpy')})", file=out)
+    regressions = []
+    for result in results:
+        old = before.get(case_key(result))
+        if old is None:
+            print(f"{case_key(result):<40}基準に無い組み合わせです", file=out)
+            continue
+        for stage, timing in result["stages"].items():
+            old_timing = old["stages"].get(stage)
+            if old_timing is None:
+                continue
+            delta = timing["seconds"] - old_timing["seconds"]
+            ratio = timing["seconds"] / old_timing["seconds"] if old_timing["seconds"] else 1.0
+            regressed = ratio > 1 + threshold and delta > min_delta
+            if regressed:
+                regressions.append((case_key(result), stage))
+            print(f"{case_key(result):<40}{stage:<16}{old_timing['seconds'] * 1000:8.2f}ms -> "
+                  f"{timing['seconds'] * 1000:8.2f}ms ({(ratio - 1) * 100:+6.1f}%)"
+                  f"{'  << 退行' if regressed else ''}", file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="描画・整形・書き出しのベンチマーク")
+    parser.add_argument("--font", action="append", metavar="PATH",
+                        help="計測するフォント (複数指定可。既定: 同梱の2つのフォント)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--charsets", nargs="+", default=CHARSETS,
+                        help="文字セット (--range と同じ名前・範囲。既定: ascii kana jis1)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", metavar="PATH", help="結果を JSON で保存する")
+    parser.add_argument("--baseline", metavar="PATH", help="保存した結果と比較する")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="退行とみなす遅くなった割合 (%%、既定: 10)")
+    parser.add_argument("--min-delta", type=float, default=0.002,
+                        help="退行とみなす最小の差 (秒、既定: 0.002)")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat には1以上の数を指定してください。")
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"基準の結果を読み込めません: {e}")
+        if baseline.get("version") != RESULT_VERSION:
+            parser.error(f"基準の結果の形式が異なります: {args.baseline}")
+
+    fonts = args.font or [os.path.join(ROOT_DIR, name) for name in FONTS]
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for font_path in fonts:
+            for size in args.sizes:
+                for charset_name in args.charsets:
+                    result = bench_case(font_path, size, charset_name, args.stages, args.repeat,
+                                        work_dir)
+                    results.append(result)
+                    print(f"{case_key(result)}: {result['chars']}文字 計測済み", file=sys.stderr)
+
+    env = environment()
+    print(f"Python {env['python']}, Pillow {env['pillow']}, NumPy {env['numpy']}, "
+          f"CPU数 {env['cpu_count']}, 各 {args.repeat} 回")
+    print_results(results, sys.stdout)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"version": RESULT_VERSION, "environment": env, "repeat": args.repeat,
+                       "results": results}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\n'{args.output}' に保存しました。")
+
+    if baseline is not None:
+        regressions = compare_results(results, baseline, args.threshold / 100, args.min_delta,
+                                      sys.stdout)
+        if regressions:
+            print(f"\n{len(regressions)}件の退行があります。")
+            return 1
+        print("\n退行はありません。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
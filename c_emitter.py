@@ -0,0 +1,301 @@
+import filecmp
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+
+import perf_stats
+from font_layout import layout_info, pack_glyph
+
+# 生成するファイルの形式に関わる変更をしたら上げる (マニフェストのハッシュに含まれる)
+TOOL_VERSION = "1.2.0"
+
+MANIFEST_PREFIX = "// font_to_bin manifest: "
+
+# 1バイト (8ピクセル) を "0, 1, 0, ..." の形にした表
+_BYTE_TEXT = [", ".join(str((b >> (7 - i)) & 1) for i in range(8)) for b in range(256)]
+
+
+def format_c_accessor_macros(array_name, width, height, layout,
+                             reverse_bits=False, mirror=False, buffer=False):
+    """
+    レイアウトに対応したC言語のマクロ (レイアウトのタグ、サイズ定義、ピクセル取得マクロ) を返します。
+    PIXEL(glyph, x, y) は格納時のビット順・左右反転を打ち消し、
+    元のグリフの左上を (0, 0) としたピクセル値 (0/1) を返します。
+    buffer=True の場合は PIXEL(buf, x, y) となり、1文字分を展開したバッファからピクセルを取り出します
+    (圧縮したテーブル用。pixel レイアウトには使えません)。
+    """
+    prefix = array_name.upper()
+    glyph_bytes = layout_info(layout, width, height)["bytes"]
+    lines = [
+        f"// layout: {layout}, bit reversed: {'yes' if reverse_bits else 'no'}, "
+        f"mirrored: {'yes' if mirror else 'no'}",
+        f"#define {prefix}_LAYOUT_{layout.upper()} 1",
+        f"#define {prefix}_BIT_REVERSED {int(reverse_bits)}",
+        f"#define {prefix}_MIRRORED {int(mirror)}",
+        f"#define {prefix}_WIDTH {width}",
+        f"#define {prefix}_HEIGHT {height}",
+        f"#define {prefix}_GLYPH_BYTES {glyph_bytes}",
+    ]
+
+    x = f"({width - 1} - (x))" if mirror else "(x)"
+    glyph = "(buf)" if buffer else f"{array_name}[(glyph)]"
+    if layout == "pixel":
+        pixel = f"({glyph}[(y)][{x}])"
+    elif layout in ("row8", "row16"):
+        msb = 7 if layout == "row8" else 15
+        shift = x if reverse_bits else f"({msb} - {x})"
+        pixel = f"(({glyph}[(y)] >> {shift}) & 1)"
+    elif layout == "packed":
+        bit = f"((y) * {width} + {x})"
+        shift = f"({bit} & 7)" if reverse_bits else f"(7 - ({bit} & 7))"
+        pixel = f"(({glyph}[{bit} >> 3] >> {shift}) & 1)"
+    elif layout == "vpage":
+        shift = "(7 - ((y) & 7))" if reverse_bits else "((y) & 7)"
+        pixel = f"(({glyph}[((y) >> 3) * {width} + {x}] >> {shift}) & 1)"
+    else:
+        pages = (height + 7) // 8
+        shift = "((y) & 7)" if reverse_bits else "(7 - ((y) & 7))"
+        pixel = f"(({glyph}[{x} * {pages} + ((y) >> 3)] >> {shift}) & 1)"
+    lines.append(f"#define {prefix}_PIXEL({'buf' if buffer else 'glyph'}, x, y) {pixel}")
+    return "\n".join(lines) + "\n"
+
+
+def _pixel_rows(data, width, height, mirror=False):
+    """
+    1ピクセル1要素の形式で、行ごとの "0, 1, ..." の文字列のリストを返します。
+    """
+    if mirror:
+        values = pack_glyph(data, width, height, "pixel", mirror=True)
+        return [", ".join(map(str, values[y * width:(y + 1) * width]))
+                for y in range(height)]
+    # 1バイト分の "0, 1, ..." を表から引いて、行ごとにまとめて組み立てる
+    stride = (width + 7) // 8
+    row_len = width * 3 - 2
+    return [", ".join(_BYTE_TEXT[b] for b in data[y:y + stride])[:row_len]
+            for y in range(0, len(data), stride)]
+
+
+def _format_glyph(data, width, height, layout, reverse_bits, mirror, indent):
+    """
+    1文字分の配列の初期化子 ({...}) を返します。
+    """
+    if layout != "pixel":
+        values = pack_glyph(data, width, height, layout, reverse_bits, mirror)
+        hex_digits = 4 if layout == "row16" else 2
+        return f"{indent}{{{', '.join(f'0x{v:0{hex_digits}X}' for v in values)}}}"
+    rows = _pixel_rows(data, width, height, mirror)
+    body = ",\n".join(f"{indent}    {{{row}}}" for row in rows)
+    return f"{indent}{{\n{body}\n{indent}}}"
+
+
+def write_c_array(out, array_name, glyphs, width, height, layout,
+                  reverse_bits=False, mirror=False, count=None):
+    """
+    グリフを1文字ずつ受け取り、指定レイアウトのC言語配列として out に書き出します。
+    文字列全体を組み立てずに書き出すので、文字数が多くても使用メモリは増えません。
+    pixel レイアウトの場合は従来通り [文字数][高さ][幅] の3次元配列になります。
+
+    Args:
+        out: 書き出し先のテキストファイル (write() を持つオブジェクト)。
+        array_name (str): 配列名。
+        glyphs: (コメントに書く文字, ビット列) を順に返すイテラブル (ジェネレータ可)。
+        width (int): グリフの幅。
+        height (int): グリフの高さ。
+        layout (str): font_layout.LAYOUTS のいずれか。
+        reverse_bits (bool): 要素内のビット順を反転する (font_layout.pack_glyph() を参照)。
+        mirror (bool): 左右反転して格納する。
+        count (int): 文字数。分かっている場合は配列の大きさとして書き、None の場合は省略します。
+
+    Returns:
+        int: 書き出した文字数 (0 の場合は何も書き出しません)
+    """
+    info = layout_info(layout, width, height)
+    first_dim = "" if count is None else count
+    if layout == "pixel":
+        dims = f"[{first_dim}][{height}][{width}]"
+    else:
+        dims = f"[{first_dim}][{info['elements']}]"
+    separator = ",\n\n" if layout == "pixel" else ",\n"
+
+    written = 0
+    timer = perf_stats.laps(array_name)
+    for label, data in glyphs:
+        # グリフの描画 (glyphs の取り出し) の時間は含めない
+        timer.start()
+        text = _format_glyph(data, width, height, layout, reverse_bits, mirror, "    ")
+        timer.lap("format")
+        if written == 0:
+            out.write(f"const {info['ctype']} {array_name}{dims} = {{\n")
+        else:
+            out.write(separator)
+        out.write(f"    // {label}\n")
+        out.write(text)
+        timer.lap("write")
+        written += 1
+    if written:
+        out.write("\n};")
+    return written
+
+
+def write_c_fragment(out, glyphs, width, height):
+    """
+    GUI版・CUI版で表示する、配列の宣言を含まない1ピクセル1要素の初期化子を out に書き出します。
+    1文字の場合は2次元、複数文字の場合は文字ごとに {} で囲んだ3次元の中身になります。
+
+    Args:
+        out: 書き出し先のテキストファイル (write() を持つオブジェクト)。
+        glyphs: ビット列を順に返すイテラブル (ジェネレータ可)。
+
+    Returns:
+        int: 書き出した文字数
+    """
+    glyphs = iter(glyphs)
+    first = next(glyphs, None)
+    if first is None:
+        return 0
+    second = next(glyphs, None)
+    if second is None:
+        # 1文字だけの場合は2次元配列の中身として書く
+        rows = _pixel_rows(first, width, height)
+        out.write(",\n".join(f"    {{{row}}}" for row in rows) + "\n")
+        return 1
+
+    out.write(format_fragment_glyph(first, width, height))
+    written = 1
+    for data in itertools.chain((second,), glyphs):
+        out.write(",\n")
+        out.write(format_fragment_glyph(data, width, height))
+        written += 1
+    return written
+
+
+def format_fragment_glyph(data, width, height):
+    """
+    write_c_fragment() が複数文字を書き出すときの1文字分の初期化子を返します
+    ("{" の行, height 行, "}" の行。文字の間の区切り ",\n" は含みません)。
+    """
+    return _format_glyph(data, width, height, "pixel", False, False, "    ")
+
+
+def write_c_header(out, title, array_name, width, height, layout,
+                   reverse_bits=False, mirror=False, macros=True):
+    """
+    write_c_source() が配列の前に書く、見出しコメントとマクロを out に書き出します。
+    """
+    out.write(f"// --- {title} ---\n")
+    if macros:
+        out.write(format_c_accessor_macros(
+            array_name, width, height, layout, reverse_bits, mirror))
+        out.write("\n")
+
+
+def write_c_source(out, title, array_name, glyphs, width, height, layout,
+                   reverse_bits=False, mirror=False, count=None, macros=True):
+    """
+    1つのフォントテーブルを、見出しコメント・マクロ・配列を含むC言語ソースとして out に書き出します。
+    (ファイル先頭の #include は含みません)
+
+    Args:
+        title (str): 見出しコメント ("// --- title ---") の内容。
+        macros (bool): format_c_accessor_macros() のマクロを出力する。
+        その他の引数は write_c_array() と同じです。
+
+    Returns:
+        int: 書き出した文字数
+    """
+    write_c_header(out, title, array_name, width, height, layout, reverse_bits, mirror, macros)
+    written = write_c_array(out, array_name, glyphs, width, height, layout,
+                            reverse_bits, mirror, count)
+    out.write("\n")
+    return written
+
+
+class OutputFile:
+    """
+    生成したファイルを書き出すためのコンテキストマネージャ。
+    同じディレクトリの一時ファイルに書き込み、閉じるときに既存のファイルと内容が異なる場合だけ
+    置き換えます (更新時刻を変えず、make などの再ビルドを防ぐため)。
+
+    使い方:
+        output = OutputFile("array.c")
+        with output as f:
+            f.write(...)
+        output.changed  # 書き換えた場合は True
+
+    binary=True の場合はバイナリファイル (.bin など) として開きます。
+    """
+
+    def __init__(self, path, binary=False):
+        self.path = path
+        self.binary = binary
+        self.changed = False
+        self._file = None
+        self._tmp_path = None
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        if self.binary:
+            self._file = os.fdopen(fd, "w+b")
+        else:
+            self._file = os.fdopen(fd, "w", encoding="utf-8")
+        return self._file
+
+    def __exit__(self, exc_type, exc, tb):
+        with perf_stats.stage("file_commit", self.path):
+            return self._commit(exc_type)
+
+    def _commit(self, exc_type):
+        self._file.close()
+        try:
+            if exc_type is None and os.path.exists(self.path) \
+                    and filecmp.cmp(self._tmp_path, self.path, shallow=False):
+                return False
+            if exc_type is None:
+                if os.path.exists(self.path):
+                    mode = os.stat(self.path).st_mode & 0o777
+                else:
+                    umask = os.umask(0)
+                    os.umask(umask)
+                    mode = 0o666 & ~umask
+                os.chmod(self._tmp_path, mode)
+                os.replace(self._tmp_path, self.path)
+                self.changed = True
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+        return False
+
+
+def manifest_hash(manifest):
+    """
+    生成条件 (フォントのハッシュ、文字セット、サイズ、レイアウト、ツールのバージョンなど) の辞書から
+    マニフェストのハッシュを求めます。
+    """
+    encoded = json.dumps(dict(manifest, tool_version=TOOL_VERSION),
+                         sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def format_manifest_line(digest):
+    """
+    生成したファイルの先頭に書くマニフェストの行を返します。
+    """
+    return f"{MANIFEST_PREFIX}{digest}\n"
+
+
+def read_manifest_hash(path):
+    """
+    生成済みファイルの先頭行からマニフェストのハッシュを読み取ります。
+    ファイルが無い場合やマニフェストが無い場合は None を返します。
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            first_line = f.readline()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if first_line.startswith(MANIFEST_PREFIX):
+        return first_line[len(MANIFEST_PREFIX):].strip()
+    return None
@@ -0,0 +1,108 @@
+import unicodedata
+
+# convASCII.py で使われている文字セット
+ASCII_CHARACTER_SET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789!?"
+
+
+def jis_rows(first, last):
+    """
+    JIS X 0208 の区 first 〜 last に含まれる文字を区点順に返します。
+    (EUC-JP の2バイトコードをデコードして求めるため、未定義の点は含まれません)
+    """
+    chars = []
+    for row in range(first, last + 1):
+        for cell in range(1, 95):
+            try:
+                chars.append(bytes((0xA0 + row, 0xA0 + cell)).decode("euc_jp"))
+            except UnicodeDecodeError:
+                pass
+    return "".join(chars)
+
+
+# --range で指定できる名前付きの文字集合
+NAMED_RANGES = {
+    "ascii": lambda: "".join(chr(c) for c in range(0x20, 0x7F)),
+    "convascii": lambda: ASCII_CHARACTER_SET,
+    "hiragana": lambda: jis_rows(4, 4),
+    "katakana": lambda: jis_rows(5, 5),
+    "kana": lambda: jis_rows(4, 5),
+    "jis-nonkanji": lambda: jis_rows(1, 8),
+    "jis1": lambda: jis_rows(16, 47),
+    "jis2": lambda: jis_rows(48, 84),
+    "jis": lambda: jis_rows(1, 84),
+}
+
+
+# サロゲートのコードポイントの範囲 (文字ではないので文字セットに含めない)
+SURROGATE_FIRST = 0xD800
+SURROGATE_LAST = 0xDFFF
+
+
+def _parse_codepoint(text):
+    text = text.strip().upper()
+    if text.startswith("U+"):
+        text = text[2:]
+    elif text.startswith("0X"):
+        text = text[2:]
+    return int(text, 16)
+
+
+def parse_range(spec):
+    """
+    文字範囲の指定を文字列に展開します。
+
+    指定できる形式:
+        名前付きの集合 (NAMED_RANGES のキー。例: "jis1", "kana")
+        "U+3040-U+309F" / "0x20-0x7E" / "3040-309F" (16進数、両端を含む。サロゲートは除きます)
+        "U+00A5" (1文字)
+
+    Raises:
+        ValueError: 形式が正しくない場合。
+    """
+    name = spec.strip().lower()
+    if name in NAMED_RANGES:
+        return NAMED_RANGES[name]()
+
+    try:
+        if "-" in spec:
+            start, end = spec.split("-", 1)
+            start, end = _parse_codepoint(start), _parse_codepoint(end)
+        else:
+            start = end = _parse_codepoint(spec)
+    except ValueError:
+        raise ValueError(
+            f"文字範囲の形式が正しくありません: {spec} "
+            f"(例: U+3040-U+309F, 0x20-0x7E, {', '.join(NAMED_RANGES)})")
+    if start > end or end > 0x10FFFF:
+        raise ValueError(f"文字範囲が正しくありません: {spec}")
+    if SURROGATE_FIRST <= start and end <= SURROGATE_LAST:
+        raise ValueError(f"サロゲート (U+D800-U+DFFF) は文字として使えません: {spec}")
+    # 範囲の途中のサロゲートは UTF-8 にできない (文字ではない) ので除く
+    return "".join(chr(c) for c in range(start, end + 1)
+                   if not SURROGATE_FIRST <= c <= SURROGATE_LAST)
+
+
+def read_charset_file(path):
+    """
+    文字セットファイル (UTF-8) を読み込みます。改行は無視されます。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return "".join(line.rstrip("\r\n") for line in f)
+
+
+def unique_chars(text):
+    """
+    重複した文字を取り除きます (最初に現れた順序を保ちます)。
+    """
+    return "".join(dict.fromkeys(text))
+
+
+def glyph_label(char):
+    """
+    C言語のコメントに書くための文字の表記を返します。
+    制御文字・空白・バックスラッシュなど、そのまま書くと紛らわしい文字はコードポイントで表します。
+    """
+    if char == "\\" or char.isspace() or not char.isprintable() \
+            or unicodedata.category(char) in ("Mn", "Me", "Cf"):
+        return f"U+{ord(char):04X}"
+    return char
@@ -1,83 +1,59 @@
 import os
-from PIL import Image, ImageDraw, ImageFont
+import sys
+
+import perf_stats
+from c_emitter import (OutputFile, format_manifest_line, manifest_hash,
+                       read_manifest_hash, write_c_source)
+from font_coverage import unsupported_chars
+from font_engine import font_cache_info, iter_charset_bits, render_glyph
+from font_layout import layout_info, size_report
+from glyph_cache import GlyphDiskCache, font_sha256
+from glyph_dedup import GlyphDeduplicator, dedup_report, glyph_map_bytes, write_c_glyph_map
+from glyph_lookup import build_lookup, lookup_report, write_c_lookup
 
 # conv_ASCII関数で定義された文字セット
 # A-Z (0-25), a-z (26-51), 0-9 (52-61), ! (62), ? (63)
 CHARACTER_SET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789!?"
 
+# 出力レイアウト (font_layout.LAYOUTS のいずれか)
+# "pixel" は従来の1ピクセル1バイト形式、"row8" / "packed" は1ピクセル1ビットに詰めた形式、
+# "vpage" / "column" はSSD1306などのコントローラにそのまま転送できる縦方向の形式
+OUTPUT_LAYOUT = "pixel"
+# 要素内のビット順を反転する / 左右反転して格納する
+OUTPUT_BIT_REVERSED = False
+OUTPUT_MIRRORED = False
+# True にすると、コードポイントからグリフ番号を求める検索表と関数 font_data_8_lookup() も出力する
+# (CHARACTER_SET の並び順に頼らず、任意の文字セットで文字から配列の位置を引けるようにする)
+OUTPUT_LOOKUP = False
+# True にすると、同じビットマップのグリフを1つにまとめ、空白のグリフ (フォントに無い文字を含む) を
+# 格納しない。文字の並び順から配列の位置を引く変換表 font_data_8_glyph_map も出力する
+# (OUTPUT_LOOKUP も True の場合は、検索関数が配列の位置を直接返すので変換表は出力しない)
+OUTPUT_DEDUP = False
+
+# 描画済みグリフをディスクにキャッシュし、フォントが変わらなければ再描画しない
+USE_DISK_CACHE = True
+
+# True にすると、生成条件が前回と同じでも描画と書き込みをやり直す
+FORCE_REGENERATE = False
+
+# True にすると、終了時に描画・整形・書き込みの段階ごとの時間と回数の表を表示する (perf_stats.py)
+PROFILE_TIMINGS = False
+# 段階ごとの時間と回数を JSON で書き出すパス (None の場合は書き出さない)
+PROFILE_TRACE = None
+# cProfile の結果を保存するパス (None の場合は cProfile を使わない)
+PROFILE_CPROFILE = None
+
 
 def generate_binary_from_dot_font(text, font_path, size):
     """
     指定されたドットフォントを使い、文字をバイナリ行列に変換します。
     フォントに文字が存在しない場合は、すべて0の行列を返します。
     """
-    if not os.path.exists(font_path):
-        raise FileNotFoundError(f"フォントファイルが見つかりません: {font_path}")
-
-    output_size = (size, size)
-    font = ImageFont.truetype(font_path, size=size)
-
-    image = Image.new("1", output_size, 0)
-    draw = ImageDraw.Draw(image)
-
-    try:
-        bbox = draw.textbbox((0, 0), text, font=font)
-    except AttributeError:
-        left, top, right, bottom = draw.textsize(text, font=font)
-        bbox = (left, top, right, bottom)
-
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
-
-    # フォントにグリフ（文字の形）が含まれているかチェック
-    if text_width == 0 or text_height == 0:
+    matrix = render_glyph(text, font_path, size)
+    if matrix is None:
         # 含まれていない場合は空の（全て0の）行列を返す
         return [[0] * size for _ in range(size)]
-
-    x_offset = (size - text_width) // 2 - bbox[0]
-    y_offset = (size - text_height) // 2 - bbox[1]
-
-    draw.text((x_offset, y_offset), text, font=font, fill=1)
-
-    binary_matrix = []
-    for y in range(size):
-        row = [image.getpixel((x, y)) for x in range(size)]
-        binary_matrix.append(row)
-
-    return binary_matrix
-
-
-def format_c_3d_array(array_name, matrices, size):
-    """
-    バイナリ行列のリストを、C言語の3次元配列形式の文字列にフォーマットします。
-    """
-    if not matrices:
-        return ""
-
-    # 配列の定義を開始
-    result_string = f"const uint8_t {array_name}[{len(matrices)}][{size}][{size}] = {{\n"
-
-    # 各文字の2D配列を生成
-    for char_index, matrix in enumerate(matrices):
-        result_string += f"    // {CHARACTER_SET[char_index]}\n"
-        result_string += "    {\n"
-
-        for i, row in enumerate(matrix):
-            row_str = ", ".join(map(str, row))
-            result_string += f"        {{{row_str}}}"
-            if i < len(matrix) - 1:
-                result_string += ",\n"
-            else:
-                result_string += "\n"
-
-        result_string += "    }"
-        if char_index < len(matrices) - 1:
-            result_string += ",\n\n"
-        else:
-            result_string += "\n"
-
-    result_string += "};"
-    return result_string
+    return matrix
 
 
 def main():
@@ -102,26 +78,77 @@ def main():
         print("フォントファイル (misaki_gothic_2nd.ttf) をカレントディレクトリに配置してください。")
         font_path_8 = "misaki_gothic_2nd.ttf"
 
-    # --- 8x8配列の生成 ---
-    matrices_8 = []
-    for char in CHARACTER_SET:
-        matrix = generate_binary_from_dot_font(char, font_path_8, 8)
-        matrices_8.append(matrix)
-
-    # C言語の配列形式にフォーマット
-    array_string = format_c_3d_array("font_data_8", matrices_8, 8)
-
-    # --- ファイルへの書き込み ---
+    # --- 生成条件が前回と同じかどうかの確認 ---
+    # フォント・文字セット・レイアウト・ツールのバージョンが同じなら、出力も同じになる
+    title = "8x8 Font Data (Misaki Gothic)"
+    digest = manifest_hash({
+        "font_sha256": font_sha256(font_path_8),
+        "charset": CHARACTER_SET,
+        "size": 8,
+        "layout": OUTPUT_LAYOUT,
+        "reverse_bits": OUTPUT_BIT_REVERSED,
+        "mirror": OUTPUT_MIRRORED,
+        "lookup": OUTPUT_LOOKUP,
+        "dedup": OUTPUT_DEDUP,
+        "name": "font_data_8",
+        "title": title,
+    })
+    if not FORCE_REGENERATE and read_manifest_hash(output_filename) == digest:
+        print(f"\n生成条件が前回と同じため、'{output_filename}' は更新しませんでした。")
+        return
+
+    # --- 8x8配列の生成とファイルへの書き込み ---
+    # ディスクキャッシュがあれば、描画するのは追加された文字とフォントが変わった場合だけになる
+    disk_cache = GlyphDiskCache() if USE_DISK_CACHE else None
+    glyphs_8 = iter_charset_bits(CHARACTER_SET, font_path_8, 8, disk_cache=disk_cache)
+    # フォントに文字が存在しない場合は全て0のグリフにする
+    labeled_glyphs = ((char, data if data is not None else bytes(8))
+                      for char, data in zip(CHARACTER_SET, glyphs_8))
+    dedup = None
+    if OUTPUT_DEDUP:
+        dedup = GlyphDeduplicator()
+        labeled_glyphs = dedup.filter(labeled_glyphs)
+
+    # 描画した文字から順にC言語の配列形式で書き出す
+    output = OutputFile(output_filename)
     try:
-        with open(output_filename, "w", encoding="utf-8") as f:
+        with output as f:
+            f.write(format_manifest_line(digest))
             f.write("#include <stdint.h>\n\n")
-            f.write("// --- 8x8 Font Data (Misaki Gothic) ---\n")
-            f.write(array_string)
-            f.write("\n")
-        print(f"\n生成が完了しました。'{output_filename}' を確認してください。")
+            count = write_c_source(
+                f, title, "font_data_8", labeled_glyphs, 8, 8, OUTPUT_LAYOUT,
+                OUTPUT_BIT_REVERSED, OUTPUT_MIRRORED,
+                count=None if dedup else len(CHARACTER_SET),
+                macros=OUTPUT_LAYOUT != "pixel" or OUTPUT_MIRRORED)
+            map_bytes = 0
+            if OUTPUT_LOOKUP:
+                lookup = build_lookup(CHARACTER_SET, dedup.slots if dedup else None)
+                f.write("\n")
+                write_c_lookup(f, "font_data_8", lookup)
+            elif dedup:
+                f.write("\n")
+                write_c_glyph_map(f, "font_data_8", dedup)
+                map_bytes = glyph_map_bytes(dedup)
+        if output.changed:
+            print(f"\n生成が完了しました。'{output_filename}' を確認してください。")
+        else:
+            print(f"\n出力が既存のファイルと同じため、'{output_filename}' は更新しませんでした。")
+        print(size_report("font_data_8", count, 8, 8, OUTPUT_LAYOUT))
+        if dedup:
+            glyph_bytes = layout_info(OUTPUT_LAYOUT, 8, 8)["bytes"]
+            print(dedup_report("font_data_8", dedup, glyph_bytes, map_bytes))
+        if OUTPUT_LOOKUP:
+            print(lookup_report("font_data_8", lookup))
+        # フォントに無い文字は全て0のグリフになっているので、気付けるように表示する
+        missing = unsupported_chars(CHARACTER_SET, font_path_8)
+        if missing:
+            print(f"フォントに無い文字 (全て0のグリフを出力): {' '.join(missing)}")
+        stats = font_cache_info()
+        print(f"フォントキャッシュ: ヒット {stats['hits']} 回 / ミス {stats['misses']} 回")
     except IOError as e:
         print(f"エラー: ファイルの書き込みに失敗しました: {e}")
 
 
 if __name__ == "__main__":
-    main()
+    with perf_stats.session(PROFILE_TIMINGS, PROFILE_TRACE, PROFILE_CPROFILE, sys.stdout):
+        main()
@@ -0,0 +1,301 @@
+import codecs
+import collections
+import csv
+import itertools
+import json
+import os
+import re
+import unicodedata
+
+# ソースコードやメッセージカタログから、実際に表示する文字だけを集めるための処理。
+# ファイルは1行 (テキストは一定の大きさ) ずつ読み、全体をメモリに載せずに走査します。
+#   C/C++ のソース : 文字列リテラルと文字リテラルの中身 (コメントと #include は除く)
+#   JSON          : 文字列の値 (オブジェクトのキーは除く)
+#   CSV/TSV       : 全てのセル
+#   テキスト       : ファイル全体
+# ディレクトリを指定した場合は、下の拡張子のファイルだけを走査します (隠しディレクトリは除く)。
+# ファイルを直接指定した場合、拡張子が分からないファイルはテキストとして扱います。
+C_EXTENSIONS = (".c", ".h", ".cc", ".cpp", ".cxx", ".hpp", ".hh", ".ino")
+JSON_EXTENSIONS = (".json",)
+CSV_EXTENSIONS = (".csv", ".tsv")
+TEXT_EXTENSIONS = (".txt", ".md")
+
+# 一度に読む大きさ (テキストは文字数、それ以外は行単位で読むときのおおよそのバイト数)
+_TEXT_CHUNK = 1 << 20
+_CSV_ROWS = 10000
+
+# C言語: 文字列リテラル (1), 文字リテラル (2), 閉じていないブロックコメントの先頭の "/" (3)、
+# 行コメント、ブロックコメント、#include の行 (1行に収まる文字列・文字リテラルだけを対象にする)
+_C_TOKEN = re.compile(
+    r'"([^"\\\n]*(?:\\.[^"\\\n]*)*)"|\'([^\'\\\n]*(?:\\.[^\'\\\n]*)*)\''
+    r'|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/|(/)\*.*\Z|//[^\n]*'
+    r'|^[ \t]*#[ \t]*include[^\n]*', re.DOTALL | re.MULTILINE)
+_C_ESCAPE = re.compile(r"\\(x[0-9A-Fa-f]+|u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|[0-7]{1,3}|.)")
+_C_SIMPLE_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "a": "\a", "b": "\b",
+                     "f": "\f", "v": "\v", "e": "\x1b"}
+# JSON: 文字列と、それがキーの場合に続く ":"
+_JSON_STRING = re.compile(r'"([^"\\]*(?:\\.[^"\\]*)*)"(\s*:)?')
+
+
+def _decode_c_literal(text):
+    # \x や8進数のエスケープは UTF-8 のバイト列として組み立て直す ("\xE3\x81\x82" -> "あ")
+    if "\\" not in text:
+        return text
+    if "\\\\" not in text:
+        # よく使われる改行・タブは先に置き換える (どちらも制御文字なので文字セットには入らない)
+        text = text.replace("\\n", "\n").replace("\\t", "\t").replace("\\r", "\r")
+        if "\\" not in text:
+            return text
+    data = bytearray()
+    pos = 0
+    for m in _C_ESCAPE.finditer(text):
+        data += text[pos:m.start()].encode("utf-8")
+        escape = m.group(1)
+        if escape[0] == "x":
+            data.append(int(escape[1:], 16) & 0xFF)
+        elif escape[0] in "uU":
+            codepoint = int(escape[1:], 16)
+            if codepoint <= 0x10FFFF and not 0xD800 <= codepoint <= 0xDFFF:
+                data += chr(codepoint).encode("utf-8")
+        elif escape[0] in "01234567":
+            data.append(int(escape, 8) & 0xFF)
+        else:
+            data += _C_SIMPLE_ESCAPES.get(escape, escape).encode("utf-8")
+        pos = m.end()
+    data += text[pos:].encode("utf-8")
+    # UTF-8 として正しくないバイト列 (Shift_JIS で書かれたエスケープなど) は無視する
+    return data.decode("utf-8", "ignore")
+
+
+def _iter_blocks(f):
+    # 行の途中で切らないように、おおよそ _TEXT_CHUNK バイトずつ行をまとめて返す
+    while True:
+        lines = f.readlines(_TEXT_CHUNK)
+        if not lines:
+            break
+        yield "".join(lines)
+
+
+def _scan_c(f, counts):
+    in_comment = False
+    for block in _iter_blocks(f):
+        pos = 0
+        if in_comment:
+            end = block.find("*/")
+            if end < 0:
+                continue
+            pos = end + 2
+            in_comment = False
+        tokens = _C_TOKEN.findall(block, pos)
+        in_comment = bool(tokens) and tokens[-1][2] == "/"
+        # エスケープはまとめて展開する (区切りの改行は制御文字なので文字セットには入らない)
+        counts.update(_decode_c_literal("\n".join(string or char for string, char, _ in tokens)))
+
+
+def _scan_json(f, counts):
+    for block in _iter_blocks(f):
+        values = []
+        for text, colon in _JSON_STRING.findall(block):
+            if colon:
+                continue
+            if "\\" in text:
+                try:
+                    text = json.loads(f'"{text}"')
+                except ValueError:
+                    pass
+            values.append(text)
+        counts.update("".join(values))
+
+
+def _scan_csv(f, counts, delimiter):
+    rows = csv.reader(f, delimiter=delimiter)
+    while True:
+        cells = list(itertools.chain.from_iterable(itertools.islice(rows, _CSV_ROWS)))
+        if not cells:
+            break
+        counts.update("".join(cells))
+
+
+def _scan_text(f, counts):
+    while True:
+        chunk = f.read(_TEXT_CHUNK)
+        if not chunk:
+            break
+        counts.update(chunk)
+
+
+def _is_display_char(char):
+    # 制御文字・BOM・不正なサロゲートは描画しないので文字セットに含めない
+    return char != "\ufeff" and unicodedata.category(char) not in ("Cc", "Cs")
+
+
+def _scan_file(path, encoding):
+    """
+    1つのファイルを拡張子に応じた方法で走査します (ワーカープロセスからも呼ばれます)。
+
+    Returns:
+        tuple: (パス, 文字ごとの出現回数, ファイルのバイト数, 読めなかった理由 (読めた場合は None))
+    """
+    ext = os.path.splitext(path)[1].lower()
+    counts = collections.Counter()
+    try:
+        with open(path, "r", encoding=encoding, newline="") as f:
+            if ext in C_EXTENSIONS:
+                _scan_c(f, counts)
+            elif ext in JSON_EXTENSIONS:
+                _scan_json(f, counts)
+            elif ext in CSV_EXTENSIONS:
+                _scan_csv(f, counts, "\t" if ext == ".tsv" else ",")
+            else:
+                _scan_text(f, counts)
+        return path, counts, os.path.getsize(path), None
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        return path, None, 0, str(e)
+
+
+def iter_corpus_files(path):
+    """
+    path がディレクトリの場合は走査する拡張子のファイルを、ファイルの場合はそのファイルを返します。
+
+    Raises:
+        FileNotFoundError: path が存在しない場合。
+    """
+    if os.path.isdir(path):
+        extensions = C_EXTENSIONS + JSON_EXTENSIONS + CSV_EXTENSIONS + TEXT_EXTENSIONS
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in extensions:
+                    yield os.path.join(root, name)
+    elif os.path.exists(path):
+        yield path
+    else:
+        raise FileNotFoundError(f"コーパスのファイルが見つかりません: {path}")
+
+
+class CorpusScan:
+    """
+    複数のファイル・ディレクトリを走査し、使われている文字と出現回数を集めるクラス。
+
+    使い方:
+        scan = CorpusScan()
+        scan.scan_paths(["src", "lang/ja.json"])
+        charset = scan.chars()  # コードポイント順の文字列
+    """
+
+    def __init__(self, encoding="utf-8"):
+        try:
+            name = codecs.lookup(encoding).name
+        except LookupError:
+            raise ValueError(f"文字コードの名前が正しくありません: {encoding}")
+        # UTF-8 の場合は先頭の BOM を読み飛ばす
+        self.encoding = "utf-8-sig" if name == "utf-8" else encoding
+        self.counts = collections.Counter()
+        # 文字 -> 最初に見つかったファイル
+        self.first_seen = {}
+        self.files = 0
+        self.bytes = 0
+        # 読めなかったファイル [(パス, 理由)]
+        self.skipped = []
+
+    def scan_paths(self, paths, jobs=None):
+        """
+        ファイル・ディレクトリを順に走査します。
+
+        Args:
+            paths: ファイルまたはディレクトリのパスのリスト。
+            jobs (int): 指定した場合、ファイルを jobs 個のワーカープロセスで分担して走査します
+                (0 はCPU数)。結果はファイルの順にまとめるので、ワーカー数によらず同じになります。
+
+        Raises:
+            FileNotFoundError: 存在しないパスが指定された場合。
+        """
+        files = [file for path in paths for file in iter_corpus_files(path)]
+        if jobs is None or len(files) < 2:
+            for file in files:
+                self._add(*_scan_file(file, self.encoding))
+            return
+        jobs = min(jobs or os.cpu_count() or 1, len(files))
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for result in executor.map(_scan_file, files, [self.encoding] * len(files)):
+                self._add(*result)
+
+    def scan_path(self, path):
+        """
+        ファイルまたはディレクトリを走査します。
+
+        Raises:
+            FileNotFoundError: path が存在しない場合。
+        """
+        self.scan_paths([path])
+
+    def scan_file(self, path):
+        """
+        1つのファイルを拡張子に応じた方法で走査します。
+        文字コードが正しくないファイルなどは skipped に記録して読み飛ばします。
+        """
+        self._add(*_scan_file(path, self.encoding))
+
+    def _add(self, path, counts, size, error):
+        if error is not None:
+            self.skipped.append((path, error))
+            return
+        for char in counts.keys() - self.counts.keys():
+            self.first_seen[char] = path
+        self.counts.update(counts)
+        self.files += 1
+        self.bytes += size
+
+    def chars(self):
+        """
+        見つかった文字 (制御文字を除く) をコードポイント順に並べた文字列を返します。
+        """
+        return "".join(sorted(char for char in self.counts if _is_display_char(char)))
+
+    def summary(self):
+        """
+        走査した結果の概要を文字列で返します。
+        """
+        text = (f"コーパス: {self.files}ファイル ({self.bytes}バイト) から "
+                f"{len(self.chars())}種類の文字")
+        if self.skipped:
+            text += f", 読めなかったファイル {len(self.skipped)}個"
+        return text
+
+
+def coverage_missing(scan, absent):
+    """
+    フォントに無い文字 absent を出現回数の多い順に並べて返します。
+    """
+    return sorted(set(absent), key=lambda char: (-scan.counts[char], char))
+
+
+def coverage_report(scan, font_label, missing, limit=20):
+    """
+    コーパスの文字のうちフォントに無い文字の一覧を、出現回数の多い順に limit 件まで文字列で返します。
+    """
+    total = len(scan.chars())
+    covered = total - len(missing)
+    ratio = covered / total * 100 if total else 100
+    lines = [f"{font_label}: コーパスの {total}文字中 {covered}文字を収録 ({ratio:.1f}%)"]
+    if missing:
+        uses = sum(scan.counts[char] for char in missing)
+        lines[0] += f", フォントに無い文字 {len(missing)}文字 (出現 {uses}回)"
+        for char in missing[:limit]:
+            lines.append(f"  U+{ord(char):04X} {char} {scan.counts[char]}回 "
+                         f"({scan.first_seen[char]})")
+        if len(missing) > limit:
+            lines.append(f"  ... ほか {len(missing) - limit}文字")
+    return "\n".join(lines)
+
+
+def write_coverage_file(out, scan, font_label, missing):
+    """
+    フォントに無い文字の全件を、タブ区切り (フォント, コードポイント, 文字, 出現回数, 最初のファイル) で
+    out に書き出します。
+    """
+    for char in missing:
+        out.write(f"{font_label}\tU+{ord(char):04X}\t{char}\t{scan.counts[char]}\t"
+                  f"{scan.first_seen[char]}\n")
@@ -0,0 +1,255 @@
+import mmap
+import struct
+
+import perf_stats
+from font_layout import LAYOUTS, layout_info, pack_glyph, unpack_glyph
+
+# .bin ファイル (外部フラッシュなどに書き込むためのフォントデータ) の形式。全てリトルエンディアン
+#   ヘッダ (64バイト):
+#     マジック "F2BB", 形式バージョン (uint16), ヘッダサイズ (uint16),
+#     グリフの幅 (uint16), 高さ (uint16), レイアウト番号 (uint8, LAYOUTS の順),
+#     フラグ (uint8, bit0: ビット順反転, bit1: 左右反転), 予約 (uint16),
+#     文字数 (索引の件数, uint32), 1グリフのバイト数 (uint32),
+#     索引の位置 (uint32), ビットマップの位置 (uint32), マニフェストの SHA-256 (32バイト)
+#   ビットマップ: レイアウトに従って詰めたグリフを並べたもの (row16 は uint16 のリトルエンディアン)
+#   索引: (コードポイント uint32, ビットマップ内のグリフ番号 uint32) をコードポイント順に並べたもの
+#         (グリフ番号が BLANK_SLOT の文字は、ビットマップを持たない空白のグリフ)
+# フォントに無い文字は索引に含めません。
+BLOB_MAGIC = b"F2BB"
+BLOB_VERSION = 1
+_HEADER = struct.Struct("<4sHHHHBBHIIII32s")
+_INDEX_ENTRY = struct.Struct("<II")
+
+FLAG_REVERSE_BITS = 0x01
+FLAG_MIRROR = 0x02
+
+BLANK_SLOT = 0xFFFFFFFF
+
+
+def glyph_to_bytes(values, layout):
+    """
+    pack_glyph() の要素値を .bin に書き込むバイト列にします。
+    """
+    if layout == "row16":
+        return struct.pack(f"<{len(values)}H", *values)
+    return bytes(values)
+
+
+def write_blob(out, glyphs, width, height, layout, reverse_bits=False, mirror=False,
+               digest=None, dedup=False):
+    """
+    グリフを1文字ずつ受け取り、.bin 形式で out に書き出します。
+    ビットマップは受け取った順に書き出し、索引とヘッダは最後にまとめて書きます
+    (out はシークできるバイナリファイルである必要があります)。
+
+    Args:
+        out: 書き出し先のバイナリファイル。
+        glyphs: (文字, ビット列) を順に返すイテラブル。ビット列が None の文字は索引に含めません。
+        width (int): グリフの幅。
+        height (int): グリフの高さ。
+        layout (str): font_layout.LAYOUTS のいずれか。
+        reverse_bits (bool): 要素内のビット順を反転する。
+        mirror (bool): 左右反転して格納する。
+        digest (str): ヘッダに記録するマニフェストのハッシュ (16進数)。
+        dedup (bool): 同じビットマップを1回だけ格納し、空白のグリフは格納しない。
+
+    Returns:
+        tuple: (索引に入れた文字数, ビットマップに格納したグリフ数)
+    """
+    start_blob(out)
+
+    index = {}
+    # ビットマップ -> グリフ番号 (dedup の場合)
+    seen = {}
+    stored = 0
+    timer = perf_stats.laps(None)
+    for char, data in glyphs:
+        if data is None or ord(char) in index:
+            continue
+        timer.start()
+        if dedup:
+            if not any(data):
+                index[ord(char)] = BLANK_SLOT
+                continue
+            if data in seen:
+                index[ord(char)] = seen[data]
+                continue
+            seen[data] = stored
+        index[ord(char)] = stored
+        stored += 1
+        packed = glyph_to_bytes(pack_glyph(data, width, height, layout, reverse_bits, mirror),
+                                layout)
+        timer.lap("pack")
+        out.write(packed)
+        timer.lap("write")
+
+    finish_blob(out, index, stored, width, height, layout, reverse_bits, mirror, digest)
+    return len(index), stored
+
+
+def start_blob(out):
+    """
+    ヘッダの領域を空けます。続けてビットマップを書き出し、最後に finish_blob() を呼んでください。
+    """
+    out.write(bytes(_HEADER.size))
+
+
+def finish_blob(out, index, stored, width, height, layout, reverse_bits=False, mirror=False,
+                digest=None):
+    """
+    ビットマップを書き出し終えた out に、索引を書き出してからヘッダを書き込みます。
+
+    Args:
+        index (dict): コードポイント -> ビットマップ内のグリフ番号 (空白は BLANK_SLOT)。
+        stored (int): ビットマップに格納したグリフ数。
+        その他の引数は write_blob() と同じです。
+    """
+    info = layout_info(layout, width, height)
+    index_offset = _HEADER.size + stored * info["bytes"]
+    for codepoint in sorted(index):
+        out.write(_INDEX_ENTRY.pack(codepoint, index[codepoint]))
+
+    flags = (FLAG_REVERSE_BITS if reverse_bits else 0) | (FLAG_MIRROR if mirror else 0)
+    out.seek(0)
+    out.write(_HEADER.pack(
+        BLOB_MAGIC, BLOB_VERSION, _HEADER.size, width, height, LAYOUTS.index(layout), flags, 0,
+        len(index), info["bytes"], index_offset, _HEADER.size,
+        bytes.fromhex(digest) if digest else bytes(32)))
+    out.seek(0, 2)
+
+
+def blob_size(count, stored, width, height, layout):
+    """
+    文字数 count, 格納したグリフ数 stored の .bin ファイルのバイト数を (ヘッダ, 索引, ビットマップ) で返します。
+    """
+    glyph_bytes = layout_info(layout, width, height)["bytes"]
+    return _HEADER.size, count * _INDEX_ENTRY.size, stored * glyph_bytes
+
+
+def read_blob_manifest(path):
+    """
+    .bin ファイルのヘッダからマニフェストのハッシュを読み取ります。
+    ファイルが無い場合や形式が異なる場合は None を返します。
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    fields = _HEADER.unpack(header)
+    if fields[0] != BLOB_MAGIC or fields[1] != BLOB_VERSION or not any(fields[-1]):
+        return None
+    return fields[-1].hex()
+
+
+class FontBlob:
+    """
+    .bin ファイルを mmap で開き、コードポイントからグリフを取り出す読み込み用のクラス。
+    ファイル全体は読み込まず、索引を二分探索して必要なグリフの部分だけを参照します。
+
+    使い方:
+        with FontBlob("font16.bin") as blob:
+            data = blob.get_bits("あ")  # render_glyph_bits() と同じ形式 (無い場合は None)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空のファイルは mmap できない
+                raise ValueError(f".bin ファイルの形式が正しくありません: {path}")
+        try:
+            self._read_header()
+        except ValueError:
+            self._map.close()
+            raise
+
+    def _read_header(self):
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f".bin ファイルの形式が正しくありません: {self.path}")
+        (magic, version, header_size, self.width, self.height, layout_id, flags, _,
+         self.count, self.glyph_bytes, self._index_offset, self._bitmap_offset,
+         digest) = _HEADER.unpack_from(self._map)
+        if magic != BLOB_MAGIC:
+            raise ValueError(f".bin ファイルの形式が正しくありません: {self.path}")
+        if version != BLOB_VERSION or header_size != _HEADER.size:
+            raise ValueError(f"対応していない .bin ファイルのバージョンです: {version}")
+        if layout_id >= len(LAYOUTS):
+            raise ValueError(f"不明なレイアウト番号です: {layout_id}")
+        self.layout = LAYOUTS[layout_id]
+        self.reverse_bits = bool(flags & FLAG_REVERSE_BITS)
+        self.mirror = bool(flags & FLAG_MIRROR)
+        self.manifest = digest.hex() if any(digest) else None
+        if self.glyph_bytes != layout_info(self.layout, self.width, self.height)["bytes"] \
+                or self._index_offset + self.count * _INDEX_ENTRY.size > len(self._map):
+            raise ValueError(f".bin ファイルが壊れています: {self.path}")
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, char):
+        return self._slot(char) is not None
+
+    def _slot(self, char):
+        codepoint = char if isinstance(char, int) else ord(char)
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            entry, slot = _INDEX_ENTRY.unpack_from(
+                self._map, self._index_offset + mid * _INDEX_ENTRY.size)
+            if entry < codepoint:
+                low = mid + 1
+            elif entry > codepoint:
+                high = mid
+            else:
+                return slot
+        return None
+
+    def codepoints(self):
+        """
+        収録されているコードポイントを昇順に返します。
+        """
+        for i in range(self.count):
+            yield _INDEX_ENTRY.unpack_from(self._map, self._index_offset + i * _INDEX_ENTRY.size)[0]
+
+    def get(self, char):
+        """
+        文字 (またはコードポイント) のグリフを、ファイルに格納されているバイト列のまま返します。
+        収録されていない場合は None を返します。
+        """
+        slot = self._slot(char)
+        if slot is None:
+            return None
+        if slot == BLANK_SLOT:
+            return bytes(self.glyph_bytes)
+        start = self._bitmap_offset + slot * self.glyph_bytes
+        return self._map[start:start + self.glyph_bytes]
+
+    def get_bits(self, char):
+        """
+        文字 (またはコードポイント) のグリフを render_glyph_bits() と同じ形式のビット列で返します。
+        収録されていない場合は None を返します。
+        """
+        raw = self.get(char)
+        if raw is None:
+            return None
+        if self.layout == "row16":
+            values = struct.unpack(f"<{len(raw) // 2}H", raw)
+        else:
+            values = raw
+        return unpack_glyph(values, self.width, self.height, self.layout,
+                            self.reverse_bits, self.mirror)
@@ -0,0 +1,341 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import perf_stats
+from corpus import CorpusScan
+from font_engine import font_cache_info, glyph_cache_info
+from font_paths import resolve_font_path
+from font_to_binary_batch import (TABLE_KEYS, build_charset, check_table, generate_output,
+                                  group_outputs)
+from glyph_cache import GlyphDiskCache, default_cache_dir
+
+# マニフェストファイル (TOML または JSON) に書かれた全てのフォントテーブルを1回で生成するランナー。
+#
+#   skip_missing = false            # 省略可 (--skip-missing と同じ)
+#
+#   [defaults]                      # 省略可。全てのテーブルの既定値
+#   layout = "row8"
+#   charset = { range = ["ascii", "jis1"] }
+#
+#   [[table]]                       # キーは font_to_binary_batch.py の --table と同じ
+#   font = "DotGothic16-Regular.ttf"
+#   size = 16
+#   layout = "row16"
+#   output = "font16.c"
+#
+#   [[table]]
+#   font = "misaki_gothic_2nd.ttf"
+#   size = 8
+#   output = "font8.bin"
+#   charset = { range = ["ascii"], chars = "℃" }
+#
+# charset には chars (文字列), charset_file, range, corpus (文字列またはそのリスト)、
+# corpus_encoding を指定できます。相対パスはマニフェストファイルのある場所から解決します。
+# 同じ出力先のテーブルは1つのファイルにまとめ (1ファイルが1ジョブ)、同じ (フォント, サイズ) を
+# 使うジョブは同じプロセスで順に実行してフォントと描画済みグリフを共有します。
+# 共有するものが無いジョブのまとまりは、--jobs を指定すると別々のプロセスで並列に実行します。
+
+MANIFEST_KEYS = ("skip_missing", "defaults", "table")
+CHARSET_KEYS = ("chars", "charset_file", "range", "corpus", "corpus_encoding")
+
+# --table の既定値 (font_to_binary_batch.py のコマンドライン引数の既定値と同じ)
+TABLE_DEFAULTS = {"layout": "pixel", "reverse": False, "mirror": False, "name": "", "title": "",
+                  "format": "", "lookup": False, "dedup": False, "compress": "none",
+                  "proportional": False}
+
+STATUS_LABELS = {"written": "書き込み", "unchanged": "内容が同じ", "skipped": "生成条件が同じ",
+                 "error": "エラー"}
+
+
+def load_manifest(path):
+    """
+    マニフェストファイルを読み込みます。拡張子が .json の場合は JSON、それ以外は TOML として読みます。
+
+    Raises:
+        OSError: ファイルを読めない場合。
+        ValueError: 形式が正しくない場合。
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.lower().endswith(".json"):
+        try:
+            manifest = json.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"マニフェストの JSON が正しくありません: {e}")
+    else:
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("TOML のマニフェストには Python 3.11 以降が必要です (JSON は使えます)")
+        try:
+            manifest = tomllib.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, tomllib.TOMLDecodeError) as e:
+            raise ValueError(f"マニフェストの TOML が正しくありません: {e}")
+    if not isinstance(manifest, dict):
+        raise ValueError("マニフェストの最上位はテーブル (オブジェクト) である必要があります")
+    unknown = set(manifest) - set(MANIFEST_KEYS)
+    if unknown:
+        raise ValueError(f"マニフェストに不明なキーがあります: {', '.join(sorted(unknown))} "
+                         f"(使えるキー: {', '.join(MANIFEST_KEYS)})")
+    if not isinstance(manifest.get("table"), list) or not manifest["table"]:
+        raise ValueError("マニフェストに [[table]] がありません")
+    return manifest
+
+
+def _as_list(value, key):
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return value
+    raise ValueError(f"charset の {key} には文字列またはそのリストを指定してください")
+
+
+def _resolve_path(path, base_dir):
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def resolve_charset(spec, base_dir, scans):
+    """
+    マニフェストの charset の指定から文字セットを組み立てます。
+    同じコーパスの走査結果は scans に記録して使い回します。
+
+    Raises:
+        OSError: 文字セットファイルやコーパスを読めない場合。
+        ValueError: 指定が正しくない場合。
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("charset はテーブル (オブジェクト) で指定してください")
+    unknown = set(spec) - set(CHARSET_KEYS)
+    if unknown:
+        raise ValueError(f"charset に不明なキーがあります: {', '.join(sorted(unknown))} "
+                         f"(使えるキー: {', '.join(CHARSET_KEYS)})")
+    scan = None
+    if "corpus" in spec:
+        paths = tuple(_resolve_path(p, base_dir) for p in _as_list(spec["corpus"], "corpus"))
+        encoding = spec.get("corpus_encoding", "utf-8")
+        key = (paths, encoding)
+        if key not in scans:
+            scans[key] = CorpusScan(encoding)
+            scans[key].scan_paths(paths)
+        scan = scans[key]
+    return build_charset(
+        _as_list(spec["chars"], "chars") if "chars" in spec else None,
+        [_resolve_path(p, base_dir) for p in _as_list(spec.get("charset_file", []),
+                                                      "charset_file")],
+        _as_list(spec.get("range", []), "range"),
+        scan)
+
+
+def resolve_tables(manifest, base_dir):
+    """
+    マニフェストの [[table]] を、既定値と文字セットを補った font_to_binary_batch.py の
+    テーブルの辞書のリストにします。
+
+    Raises:
+        OSError: 文字セットファイルやコーパスを読めない場合。
+        ValueError: 指定が正しくない場合。
+    """
+    defaults = manifest.get("defaults", {})
+    if not isinstance(defaults, dict):
+        raise ValueError("[defaults] はテーブルで指定してください")
+    scans = {}
+    tables = []
+    for index, entry in enumerate(manifest["table"]):
+        label = f"table[{index}]"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{label} はテーブルで指定してください")
+        merged = dict(defaults, **entry)
+        unknown = set(merged) - set(TABLE_KEYS) - {"charset"}
+        if unknown:
+            raise ValueError(f"{label} に不明なキーがあります: {', '.join(sorted(unknown))} "
+                             f"(使えるキー: {', '.join(TABLE_KEYS)}, charset)")
+        if "charset" not in merged:
+            raise ValueError(f"{label} に charset がありません ([defaults] で共通に指定することもできます)")
+        table = dict(TABLE_DEFAULTS, **{k: v for k, v in merged.items() if k != "charset"})
+        for key in ("font", "output", "layout", "name", "title", "format", "compress"):
+            if key in table and not isinstance(table[key], str):
+                raise ValueError(f"{label} の {key} には文字列を指定してください")
+        if table.get("output") == "-":
+            raise ValueError(f"{label}: マニフェストでは output に標準出力 (-) は使えません")
+        if table.get("output"):
+            table["output"] = _resolve_path(table["output"], base_dir)
+        if table.get("font"):
+            # マニフェストの場所に無ければ、カレントディレクトリと同梱フォントの場所も探す
+            font = _resolve_path(table["font"], base_dir)
+            table["font"] = font if os.path.exists(font) else resolve_font_path(table["font"])
+        table = check_table(table, label)
+        table["charset"] = resolve_charset(merged["charset"], base_dir, scans)
+        if not table["charset"]:
+            raise ValueError(f"{label}: 文字セットが空です")
+        tables.append(table)
+    return tables
+
+
+def plan_groups(outputs):
+    """
+    出力ファイル (ジョブ) を、同じ (フォント, サイズ) を使うものどうしが同じグループになるようにまとめます。
+    グループの中のジョブは描画済みグリフを共有できるように同じプロセスで順に実行し、
+    グループどうしは共有するものが無いので並列に実行できます。
+
+    Returns:
+        list: グループ (出力先のパスのリスト) のリスト。マニフェストの順を保ちます。
+    """
+    # Union-Find で (フォント, サイズ) を共有するジョブをつなぐ
+    parent = {path: path for path in outputs}
+
+    def find(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    owner = {}
+    for path, tables in outputs.items():
+        for table in tables:
+            key = (os.path.abspath(table["font"]), table["size"])
+            if key in owner:
+                parent[find(path)] = find(owner[key])
+            else:
+                owner[key] = path
+
+    groups = {}
+    for path in outputs:
+        groups.setdefault(find(path), []).append(path)
+    return list(groups.values())
+
+
+def run_group(jobs, skip_missing, cache_dir, cache_max_bytes, force, quiet, render_jobs=None):
+    """
+    1つのグループのジョブを順に実行します (ワーカープロセスからも呼ばれます)。
+
+    Args:
+        jobs: (出力先のパス, テーブルのリスト) のリスト。
+
+    Returns:
+        list: ジョブごとの (出力先のパス, 結果, 秒数, レポートの文字列)。
+            結果は generate_output() の戻り値、または "error" です。
+    """
+    disk_cache = GlyphDiskCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+    results = []
+    for path, tables in jobs:
+        report = io.StringIO()
+        start = time.perf_counter()
+        try:
+            status = generate_output(path, tables, skip_missing, render_jobs, disk_cache, force,
+                                     None if quiet else report)
+        except OSError as e:
+            status = "error"
+            report.write(f"エラー: {e}\n")
+        results.append((path, status, time.perf_counter() - start, report.getvalue()))
+    return results
+
+
+def print_summary(results, groups, workers, elapsed, out):
+    """
+    ジョブごとの時間と結果の一覧を表示します。
+    """
+    names = [os.path.relpath(path) for path, _, _, _ in results]
+    width = max(max(len(name) for name in names), 6)
+    # 見出しは全角文字なので、表示幅 (1文字2桁) で揃える
+    print("ジョブ" + " " * (width - 6) + "       時間  結果", file=out)
+    for name, (_, status, seconds, _) in zip(names, results):
+        print(f"{name.ljust(width)}  {seconds:7.2f}秒  {STATUS_LABELS[status]}", file=out)
+    total = sum(seconds for _, _, seconds, _ in results)
+    print(f"{len(results)}ジョブ ({len(groups)}グループ, 並列 {workers}), 経過 {elapsed:.2f}秒 "
+          f"(各ジョブの合計 {total:.2f}秒)", file=out)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="マニフェストファイル (TOML / JSON) に書かれたフォントテーブルをまとめて生成します。",
+        epilog="例: python font_build.py fonts.toml --jobs 0")
+    parser.add_argument("manifest", help="マニフェストファイルのパス (.toml または .json)")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                        help="共有するものが無いジョブのグループを N 個のプロセスで並列に実行する "
+                             "(0 はCPU数)。グループが1つだけの場合は描画を並列にします")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="生成せずに、ジョブとグループの一覧だけを表示する")
+    parser.add_argument("--cache-dir", metavar="PATH",
+                        help=f"描画済みグリフのキャッシュを置くディレクトリ (既定: {default_cache_dir()})")
+    parser.add_argument("--cache-max-mb", type=float, default=64, metavar="MB",
+                        help="キャッシュディレクトリの上限サイズ (既定: 64MB)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ディスク上のグリフキャッシュを使わない")
+    parser.add_argument("--force", action="store_true",
+                        help="生成条件が前回と同じでも描画と書き込みをやり直す")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="テーブルごとのレポートを表示しない (ジョブの一覧は表示します)")
+    perf_stats.add_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 0:
+        parser.error("--jobs には0以上の数を指定してください。")
+
+    try:
+        manifest = load_manifest(args.manifest)
+        base_dir = os.path.dirname(os.path.abspath(args.manifest))
+        tables = resolve_tables(manifest, base_dir)
+        outputs = group_outputs(tables)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    skip_missing = manifest.get("skip_missing", False)
+    if not isinstance(skip_missing, bool):
+        parser.error("skip_missing には true または false を指定してください。")
+
+    groups = plan_groups(outputs)
+    if args.dry_run:
+        for number, group in enumerate(groups, 1):
+            print(f"グループ {number}:")
+            for path in group:
+                for table in outputs[path]:
+                    print(f"  {os.path.relpath(path)}: {os.path.basename(table['font'])} {table['size']}px, "
+                          f"{table['layout']}, {len(table['charset'])}文字")
+        return 0
+
+    with perf_stats.session(args.timings, args.trace, args.cprofile):
+        cache_dir = None
+        if not args.no_cache:
+            cache_dir = args.cache_dir or default_cache_dir()
+        common = (skip_missing, cache_dir, int(args.cache_max_mb * 1024 * 1024), args.force, args.quiet)
+        group_jobs = [[(path, outputs[path]) for path in group] for group in groups]
+
+        start = time.perf_counter()
+        workers = 1
+        if args.jobs is None or len(groups) == 1:
+            # 1プロセスで実行する (グループが1つだけなら、--jobs は描画の並列化に使う)
+            render_jobs = args.jobs if len(groups) == 1 else None
+            results = [run_group(jobs, *common, render_jobs) for jobs in group_jobs]
+        else:
+            workers = min(args.jobs or os.cpu_count() or 1, len(groups))
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(run_group, jobs, *common) for jobs in group_jobs]
+                results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+
+        # グループごとの結果をマニフェストの順に並べ直す
+        by_path = {result[0]: result for group_results in results for result in group_results}
+        ordered = [by_path[path] for path in outputs]
+        for _, _, _, text in ordered:
+            sys.stderr.write(text)
+        print_summary(ordered, groups, workers, elapsed, sys.stderr)
+        if workers == 1 and not args.quiet:
+            fonts = font_cache_info()
+            glyphs = glyph_cache_info()
+            print(f"フォントキャッシュ: ヒット {fonts['hits']} 回 / ミス {fonts['misses']} 回, "
+                  f"グリフキャッシュ: ヒット {glyphs['hits']} 回 / ミス {glyphs['misses']} 回",
+                  file=sys.stderr)
+        return 1 if any(status == "error" for _, status, _, _ in ordered) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import argparse
+import os
+import struct
+import sys
+
+# TrueType / OpenType フォントの cmap テーブルから、グリフが割り当てられているコードポイントを
+# 読み取るための最小限のパーサ (fontTools などの追加の依存は使いません)。
+# Unicode の部分テーブルのうち、形式 12 (UCS-4 全体) と形式 4 (BMP) に対応しています。
+# FreeType (Pillow) と同じく、形式 12 の部分テーブルがあればそれを、無ければ形式 4 を使います。
+# TrueType Collection (.ttc) の場合は、Pillow の既定と同じく最初のフォントを読みます。
+
+# 優先する順の (プラットフォームID, エンコーディングID, 形式)
+_SUBTABLE_PREFERENCE = (
+    (3, 10, 12), (0, 6, 12), (0, 4, 12),
+    (3, 1, 4), (0, 3, 4), (0, 2, 4), (0, 1, 4), (0, 0, 4),
+)
+
+# (フォントパス, 更新時刻, ファイルサイズ) -> コードポイントの frozenset (読めない場合は None)
+_coverage_cache = {}
+
+
+def _table_offset(data, tag):
+    # sfnt のテーブルディレクトリから tag のテーブルの位置を探す
+    offset = 0
+    if data[:4] == b"ttcf":
+        offset = struct.unpack_from(">I", data, 12)[0]
+    num_tables = struct.unpack_from(">H", data, offset + 4)[0]
+    for i in range(num_tables):
+        entry_tag, _, table_offset, _ = struct.unpack_from(">4sIII", data, offset + 12 + i * 16)
+        if entry_tag == tag:
+            return table_offset
+    raise ValueError(f"{tag.decode()} テーブルがありません")
+
+
+def _format4_codepoints(data, offset):
+    seg_count = struct.unpack_from(">H", data, offset + 6)[0] // 2
+    ends = struct.unpack_from(f">{seg_count}H", data, offset + 14)
+    starts_offset = offset + 16 + seg_count * 2
+    starts = struct.unpack_from(f">{seg_count}H", data, starts_offset)
+    deltas = struct.unpack_from(f">{seg_count}H", data, starts_offset + seg_count * 2)
+    range_offsets_offset = starts_offset + seg_count * 4
+    range_offsets = struct.unpack_from(f">{seg_count}H", data, range_offsets_offset)
+
+    codepoints = set()
+    for i in range(seg_count):
+        start, end, delta, range_offset = starts[i], ends[i], deltas[i], range_offsets[i]
+        if start == 0xFFFF:
+            continue
+        if range_offset == 0:
+            # グリフ番号 = (コードポイント + delta) & 0xFFFF。0 (.notdef) になる1点だけを除く
+            notdef = (0x10000 - delta) & 0xFFFF
+            if start <= notdef <= end:
+                codepoints.update(range(start, notdef))
+                codepoints.update(range(notdef + 1, end + 1))
+            else:
+                codepoints.update(range(start, end + 1))
+            continue
+        # glyphIdArray を参照する区間 (range_offset は自身の位置からの相対バイト数)
+        base = range_offsets_offset + i * 2 + range_offset
+        glyphs = struct.unpack_from(f">{end - start + 1}H", data, base)
+        codepoints.update(start + j for j, glyph in enumerate(glyphs)
+                          if glyph and (glyph + delta) & 0xFFFF)
+    # 最後の区間の 0xFFFF は文字ではない
+    codepoints.discard(0xFFFF)
+    return codepoints
+
+
+def _format12_codepoints(data, offset):
+    num_groups = struct.unpack_from(">I", data, offset + 12)[0]
+    codepoints = set()
+    for i in range(num_groups):
+        start, end, glyph = struct.unpack_from(">III", data, offset + 16 + i * 12)
+        end = min(end, 0x10FFFF)
+        codepoints.update(range(start if glyph else start + 1, end + 1))
+    return codepoints
+
+
+def parse_cmap_codepoints(data):
+    """
+    フォントファイルの内容から、グリフが割り当てられている Unicode のコードポイントを返します。
+
+    Args:
+        data (bytes): TrueType / OpenType (または .ttc) ファイルの内容。
+
+    Returns:
+        frozenset: コードポイント (int) の集合。
+
+    Raises:
+        ValueError: sfnt 形式でない場合や、対応している Unicode の cmap が無い場合。
+    """
+    try:
+        cmap = _table_offset(data, b"cmap")
+        num_subtables = struct.unpack_from(">H", data, cmap + 2)[0]
+        subtables = {}
+        for i in range(num_subtables):
+            platform, encoding, offset = struct.unpack_from(">HHI", data, cmap + 4 + i * 8)
+            fmt = struct.unpack_from(">H", data, cmap + offset)[0]
+            subtables.setdefault((platform, encoding, fmt), cmap + offset)
+        for key in _SUBTABLE_PREFERENCE:
+            if key in subtables:
+                if key[2] == 12:
+                    return frozenset(_format12_codepoints(data, subtables[key]))
+                return frozenset(_format4_codepoints(data, subtables[key]))
+    except struct.error:
+        raise ValueError("フォントファイルが壊れています")
+    raise ValueError("対応している Unicode の cmap (形式 4 または 12) がありません")
+
+
+def font_coverage(font_path):
+    """
+    フォントに収録されているコードポイントの集合を返します。
+    ファイルごとに1回だけ読み込み、以降は (パス, 更新時刻, サイズ) が同じ間キャッシュから返します。
+    cmap を読めないフォント (TrueType / OpenType 以外の形式など) の場合は None を返します。
+
+    Raises:
+        FileNotFoundError: フォントファイルが存在しない場合。
+    """
+    try:
+        st = os.stat(font_path)
+    except OSError:
+        raise FileNotFoundError(f"フォントファイルが見つかりません: {font_path}")
+    key = (os.path.abspath(font_path), st.st_mtime_ns, st.st_size)
+    if key not in _coverage_cache:
+        with open(font_path, "rb") as f:
+            data = f.read()
+        try:
+            _coverage_cache[key] = parse_cmap_codepoints(data)
+        except ValueError:
+            _coverage_cache[key] = None
+    return _coverage_cache[key]
+
+
+def unsupported_chars(chars, font_path):
+    """
+    chars のうちフォントに収録されていない文字を、最初に現れた順に重複なく返します。
+    空白文字も cmap に無ければ含めます (描画でも、cmap に無い文字はグリフが無い扱いになるため)。
+    cmap を読めないフォントの場合は None を返します。
+    """
+    coverage = font_coverage(font_path)
+    if coverage is None:
+        return None
+    return [char for char in dict.fromkeys(chars)
+            if len(char) == 1 and ord(char) not in coverage]
+
+
+def coverage_ranges(coverage):
+    """
+    コードポイントの集合を、連続した区間 (先頭, 末尾) のリストにまとめて返します。
+    """
+    ranges = []
+    for codepoint in sorted(coverage):
+        if ranges and ranges[-1][1] == codepoint - 1:
+            ranges[-1][1] = codepoint
+        else:
+            ranges.append([codepoint, codepoint])
+    return [tuple(r) for r in ranges]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="フォントの cmap から収録されている文字を調べます。",
+        epilog="例: python font_coverage.py misaki_gothic_2nd.ttf --chars 温度℃한")
+    parser.add_argument("font", help="TrueType / OpenType フォントのパス")
+    parser.add_argument("-c", "--chars", metavar="TEXT",
+                        help="収録されているか調べる文字列 (フォントに無い文字を表示します)")
+    parser.add_argument("--ranges", action="store_true",
+                        help="収録されているコードポイントの区間を全て表示する")
+    args = parser.parse_args(argv)
+
+    try:
+        coverage = font_coverage(args.font)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    if coverage is None:
+        print(f"エラー: {args.font} の cmap を読み取れません。", file=sys.stderr)
+        return 1
+
+    ranges = coverage_ranges(coverage)
+    print(f"{os.path.basename(args.font)}: {len(coverage)}文字 ({len(ranges)}区間)")
+    if args.ranges:
+        for first, last in ranges:
+            print(f"U+{first:04X}" if first == last else f"U+{first:04X}-U+{last:04X}")
+    if args.chars:
+        missing = unsupported_chars(args.chars, args.font)
+        if missing:
+            print(f"フォントに無い文字: {len(missing)}文字")
+            for char in missing:
+                print(f"  U+{ord(char):04X} {char}")
+        else:
+            print("全ての文字が収録されています。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,478 @@
+import os
+import threading
+from collections import OrderedDict
+
+import perf_stats
+from font_coverage import font_coverage
+
+# Pillow (PIL) と並列描画用の multiprocessing は、実際に描画するときに初めて読み込みます。
+# ヘルプの表示や、生成条件が前回と同じ場合、ディスクキャッシュにある文字だけを出力する場合は
+# 読み込まないので、起動が速くなります (benchmarks/bench_startup.py で確認できます)。
+
+# 読み込み済みフォントを保持する最大数 ((フォント, サイズ) の組み合わせ単位)
+FONT_CACHE_SIZE = 16
+
+# 描画済みグリフを保持する最大数
+GLYPH_CACHE_SIZE = 65536
+
+# 並列描画でワーカーに渡す1チャンクあたりの最小文字数
+PARALLEL_MIN_CHUNK = 64
+
+# (フォントパス, 更新時刻, サイズ) -> FreeTypeFont
+_font_cache = OrderedDict()
+# (フォントパス, 更新時刻, サイズ, 文字) -> render_glyph_bits() の結果
+_glyph_cache = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0, "glyph_hits": 0, "glyph_misses": 0, "unsupported": 0}
+
+# プロポーショナルで、行の高さが size を超えるときに切り出す位置を決めるための文字
+DESCENDER_PROBE = "_gjpqy,;"
+
+# (フォントパス, サイズ) -> _proportional_rows() の先頭の行
+_proportional_tops = {}
+
+# 描画キャンバスはスレッドごとに1枚ずつ使い回す
+_local = threading.local()
+
+# 1バイトを左端(MSB)から順に0/1へ展開するための表
+_BYTE_BITS = [tuple((b >> (7 - i)) & 1 for i in range(8)) for b in range(256)]
+
+
+def _font_key(font_path, size):
+    """
+    キャッシュのキー (フォントパス, 更新時刻, サイズ) を返します。
+    """
+    try:
+        mtime = os.stat(font_path).st_mtime_ns
+    except OSError:
+        raise FileNotFoundError(f"フォントファイルが見つかりません: {font_path}")
+    return (os.path.abspath(font_path), mtime, size)
+
+
+def _load_font_by_key(key):
+    font = _font_cache.get(key)
+    if font is not None:
+        _cache_stats["hits"] += 1
+        _font_cache.move_to_end(key)
+        return font
+
+    _cache_stats["misses"] += 1
+    from PIL import ImageFont
+
+    timer = perf_stats.laps((key[0], key[2]))
+    font = ImageFont.truetype(key[0], size=key[2])
+    timer.lap("font_load")
+    _font_cache[key] = font
+    if len(_font_cache) > FONT_CACHE_SIZE:
+        # 最も長く使われていないフォントを破棄する
+        _font_cache.popitem(last=False)
+    return font
+
+
+def load_font(font_path, size):
+    """
+    フォントを読み込みます。同じ (フォントパス, 更新時刻, サイズ) の組み合わせは
+    キャッシュから返すため、TTFの解析はフォントごとに1回だけで済みます。
+
+    Args:
+        font_path (str): 使用するフォントファイルのパス。
+        size (int): フォントのサイズ。
+
+    Returns:
+        ImageFont.FreeTypeFont: 読み込まれたフォント。
+    """
+    return _load_font_by_key(_font_key(font_path, size))
+
+
+def font_cache_info():
+    """
+    フォントキャッシュのヒット数・ミス数・現在の保持数を返します。
+    """
+    return {
+        "hits": _cache_stats["hits"],
+        "misses": _cache_stats["misses"],
+        "size": len(_font_cache),
+        "maxsize": FONT_CACHE_SIZE,
+    }
+
+
+def glyph_cache_info():
+    """
+    描画済みグリフのキャッシュのヒット数・ミス数・現在の保持数と、
+    フォントの cmap に無いため描画しなかった文字数 (unsupported) を返します。
+    """
+    return {
+        "hits": _cache_stats["glyph_hits"],
+        "misses": _cache_stats["glyph_misses"],
+        "unsupported": _cache_stats["unsupported"],
+        "size": len(_glyph_cache),
+        "maxsize": GLYPH_CACHE_SIZE,
+    }
+
+
+def clear_font_cache():
+    """
+    フォントキャッシュ・グリフキャッシュと統計情報を初期化します。
+    """
+    _font_cache.clear()
+    _glyph_cache.clear()
+    _proportional_tops.clear()
+    for name in _cache_stats:
+        _cache_stats[name] = 0
+
+
+def _get_canvas(width, height):
+    """
+    スレッドごとに使い回す width x height のモノクロ描画キャンバスを返します。
+    """
+    canvases = getattr(_local, "canvases", None)
+    if canvases is None:
+        canvases = _local.canvases = {}
+    canvas = canvases.get((width, height))
+    if canvas is None:
+        from PIL import Image, ImageDraw
+
+        # モノクロモード('1')で画像を作成し、アンチエイリアスなしで描画
+        image = Image.new("1", (width, height), 0)  # 0:黒
+        canvas = canvases[(width, height)] = (image, ImageDraw.Draw(image))
+    return canvas
+
+
+def _render_bits(font, text, size):
+    timer = perf_stats.laps((font.path, size))
+    image, draw = _get_canvas(size, size)
+
+    bbox = draw.textbbox((0, 0), text, font=font)
+    timer.lap("textbbox")
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+
+    # フォントにグリフ（文字の形）が含まれているかチェック
+    if text_width == 0 or text_height == 0:
+        return None
+
+    # 文字の描画位置を中央に調整
+    x_offset = (size - text_width) // 2 - bbox[0]
+    y_offset = (size - text_height) // 2 - bbox[1]
+
+    draw.rectangle((0, 0, size - 1, size - 1), fill=0)
+    draw.text((x_offset, y_offset), text, font=font, fill=1)  # 1:白
+    timer.lap("draw_text")
+
+    # ピクセルを1つずつ読まず、画像のバイト列をまとめて取り出す
+    data = image.tobytes()
+    timer.lap("tobytes")
+    return data
+
+
+def render_glyph_bits(text, font_path, size):
+    """
+    指定されたドットフォントを使い、文字を1ピクセル1ビットのデータに変換します。
+    各行は左端のピクセルを最上位ビットとして (size + 7) // 8 バイトに詰められます
+    (Pillowの'1'モード画像の tobytes() と同じ並び)。
+    一度描画した文字はグリフキャッシュから返します。
+
+    Args:
+        text (str): 変換したい文字。
+        font_path (str): 使用するフォントファイルのパス。
+        size (int): フォントのサイズ (8または16)。
+
+    Returns:
+        bytes: 行優先・MSBファーストのビット列。フォントにグリフが無い場合は None
+            (cmap にある空白などインクの無い文字は全て0のビット列です)
+    """
+    return render_charset_bits([text], font_path, size)[0]
+
+
+def render_proportional_bits(text, font_path, size):
+    """
+    文字をプロポーショナル (可変幅) 用に描画します。
+    正方形の中央に置く render_glyph_bits() と異なり、全ての文字で同じベースラインを使い、
+    インクのある列だけを切り出します。フォントの行の高さ (ascent + descent) が size 以下の場合は
+    size の中央に合わせ、超える場合はディセンダが入るように size 行を切り出します
+    (size 行に収まらない背の高い文字は上端が欠けます)。
+
+    Args:
+        text (str): 変換したい文字。
+        font_path (str): 使用するフォントファイルのパス。
+        size (int): フォントのサイズ (グリフの高さ)。
+
+    Returns:
+        tuple: (ビット列, インクの幅, ペン位置からインクの左端までの距離, 送り幅)。
+            ビット列は幅をインクの幅とした render_glyph_bits() と同じ形式です
+            (空白文字はインクの幅が0で、ビット列は空になります)。
+            フォントにグリフが無い場合は None を返します。
+    """
+    coverage = font_coverage(font_path)
+    if not _is_supported(text, coverage):
+        return None
+    font = load_font(font_path, size)
+    timer = perf_stats.laps((font.path, size))
+    advance = round(font.getlength(text))
+    bbox = font.getbbox(text)
+    timer.lap("textbbox")
+    if (advance == 0 and (bbox[2] - bbox[0] == 0 or bbox[3] - bbox[1] == 0)
+            and not _in_cmap(text, coverage)):
+        # cmap を読めない場合は、送り幅もインクも無い文字をグリフが無いとみなす
+        return None
+
+    # はみ出した部分も切り取れるよう、左右に余白を取ったキャンバスにペン位置 margin から描く。
+    # キャンバスの高さは行の高さ (ascent + descent) 以上にして、そこから size 行を切り出す
+    margin = size
+    canvas_width = size * 3
+    y, top, canvas_height = _proportional_rows(font, size)
+    image, draw = _get_canvas(canvas_width, canvas_height)
+    draw.rectangle((0, 0, canvas_width - 1, canvas_height - 1), fill=0)
+    draw.text((margin, y), text, font=font, fill=1)
+    timer.lap("draw_text")
+
+    stride = (canvas_width + 7) // 8
+    data = image.tobytes()[top * stride:(top + size) * stride]
+    timer.lap("tobytes")
+    rows = [int.from_bytes(data[y:y + stride], "big") >> (stride * 8 - canvas_width)
+            for y in range(0, len(data), stride)]
+    ink = 0
+    for row in rows:
+        ink |= row
+    if ink == 0:
+        timer.lap("crop")
+        return b"", 0, 0, advance
+
+    # ink の最上位ビットが左端の列
+    first = canvas_width - ink.bit_length()
+    last = canvas_width - 1 - ((ink & -ink).bit_length() - 1)
+    width = last - first + 1
+    out_stride = (width + 7) // 8
+    shift = canvas_width - 1 - last
+    pad = out_stride * 8 - width
+    bits = b"".join((((row >> shift) & ((1 << width) - 1)) << pad).to_bytes(out_stride, "big")
+                    for row in rows)
+    timer.lap("crop")
+    return bits, width, first - margin, advance
+
+
+def _proportional_rows(font, size):
+    """
+    プロポーショナル用の描画位置とキャンバスの高さ、そこから切り出す size 行の先頭の行を返します。
+    行の高さ (ascent + descent) が size 以下の場合は、行の高さを size の中央に置きます。
+    size を超える場合は行の高さのキャンバスに描き、ディセンダ (DESCENDER_PROBE) が
+    最も下まで届く行を最後の行として size 行を切り出します (全ての文字で同じベースライン)。
+
+    Returns:
+        tuple: (描画する y 座標, 先頭の行, キャンバスの高さ)
+    """
+    ascent, descent = font.getmetrics()
+    height = ascent + descent
+    if height <= size:
+        return (size - height) // 2, 0, size
+    key = (font.path, size)
+    top = _proportional_tops.get(key)
+    if top is None:
+        from PIL import Image, ImageDraw
+
+        image = Image.new("1", (size * 2 * len(DESCENDER_PROBE), height), 0)
+        ImageDraw.Draw(image).text((0, 0), DESCENDER_PROBE, font=font, fill=1)
+        bbox = image.getbbox()
+        # インクの最も下の行 (ベースラインより上で終わるフォントではベースラインの行)
+        bottom = max(bbox[3] if bbox else 0, ascent + 1)
+        top = _proportional_tops[key] = min(max(0, bottom - size), height - size)
+    return 0, top, height
+
+
+def is_supported(text, font_path):
+    """
+    フォントの cmap に text (1文字) のグリフがあるかを、描画せずに返します。
+    cmap を読めないフォントや、2文字以上の text の場合は描画してみないと分からないので True を返します。
+    """
+    return _is_supported(text, font_coverage(font_path))
+
+
+def _is_supported(text, coverage):
+    return coverage is None or len(text) != 1 or ord(text) in coverage
+
+
+def _in_cmap(text, coverage):
+    # cmap で有無が分かる1文字で、cmap にある場合に True
+    return coverage is not None and len(text) == 1 and ord(text) in coverage
+
+
+def render_charset_bits(chars, font_path, size, jobs=None, disk_cache=None):
+    """
+    複数の文字をまとめて render_glyph_bits() と同じ形式に変換します。
+    引数は iter_charset_bits() と同じです。
+
+    Returns:
+        list: 文字ごとのビット列 (グリフが無い文字は None)。並びは chars と同じです。
+    """
+    return list(iter_charset_bits(chars, font_path, size, jobs, disk_cache))
+
+
+def iter_charset_bits(chars, font_path, size, jobs=None, disk_cache=None):
+    """
+    複数の文字を render_glyph_bits() と同じ形式に変換し、chars の順に1文字ずつ返すジェネレータです。
+    描画し終えた文字から順に返すので、受け取った側は全体の描画を待たずに書き出しを始められます。
+    フォントの確認と読み込みは呼び出しごとに1回だけ行います。
+    フォントの cmap に無い文字は描画もキャッシュの検索もせずに None を返します。
+    cmap にある文字は、空白のようにインクが無くても全て0のビット列を返します
+    (cmap を読めないフォントでは、インクの無い文字はグリフが無いとみなして None を返します)。
+
+    Args:
+        chars (str or list): 変換したい文字の並び。
+        font_path (str): 使用するフォントファイルのパス。
+        size (int): フォントのサイズ。
+        jobs (int): 指定した場合、キャッシュに無い文字を jobs 個のワーカープロセスで
+            分担して描画します (0 はCPU数)。None の場合はこのプロセスだけで描画します。
+        disk_cache (glyph_cache.GlyphDiskCache): 指定した場合、メモリ上のキャッシュに無い文字は
+            まずディスクキャッシュから探し、新しく描画した文字はディスクキャッシュに保存します。
+
+    Yields:
+        bytes: 文字ごとのビット列 (グリフが無い文字は None)
+    """
+    font_key = _font_key(font_path, size)
+    blank = bytes(((size + 7) // 8) * size)
+    unique = dict.fromkeys(chars)
+    coverage = font_coverage(font_path)
+    unsupported = {text for text in unique if not _is_supported(text, coverage)}
+
+    # 描画が必要な文字を、最初に現れた順に決めておく (同じ文字の描画は1回だけ)
+    missing = [text for text in unique
+               if text not in unsupported and font_key + (text,) not in _glyph_cache]
+    stored = {}
+    if disk_cache is not None and missing:
+        with perf_stats.stage("disk_cache_lookup", (font_key[0], size)):
+            stored = disk_cache.lookup(missing, font_path, size)
+    # 計測する場合は、キャッシュの統計の増えた分を最後にフォントごとのカウンタに加える
+    before = dict(_cache_stats) if perf_stats.active else None
+    texts = [text for text in missing if text not in stored]
+    planned = set(texts)
+    rendered_iter = _iter_rendered(font_key, texts, jobs)
+    rendered = {}
+
+    try:
+        for text in chars:
+            if text in unsupported:
+                _cache_stats["unsupported"] += 1
+                yield None
+                continue
+            key = font_key + (text,)
+            if key in _glyph_cache:
+                _cache_stats["glyph_hits"] += 1
+                _glyph_cache.move_to_end(key)
+                yield _glyph_cache[key]
+                continue
+
+            _cache_stats["glyph_misses"] += 1
+            if text in stored:
+                data = stored[text]
+            elif text in planned:
+                # texts は chars に最初に現れた順なので、次の描画結果がこの文字のもの
+                data = rendered[text] = next(rendered_iter)
+                planned.discard(text)
+            else:
+                # 最初の確認の後にメモリ上のキャッシュから追い出された文字
+                data = _render_chunk(font_key, [text])[0]
+            if data is None and _in_cmap(text, coverage):
+                # 描画するとインクが無い (None) 文字でも、cmap にあれば全て0のグリフにする
+                data = blank
+            _glyph_cache[key] = data
+            if len(_glyph_cache) > GLYPH_CACHE_SIZE:
+                _glyph_cache.popitem(last=False)
+            yield data
+    finally:
+        # zip() などで最後の文字の後に再開されないまま閉じられることがあるので、
+        # 保存は finally で行う (途中で閉じられた場合も描画済みの分は保存する)
+        if disk_cache is not None and rendered:
+            with perf_stats.stage("disk_cache_store", (font_key[0], size)):
+                disk_cache.store(rendered, font_path, size)
+        if before is not None:
+            for name in ("glyph_hits", "glyph_misses", "unsupported"):
+                perf_stats.count(name, (font_key[0], size), _cache_stats[name] - before[name])
+            perf_stats.count("disk_cache_hits", (font_key[0], size), len(stored))
+            perf_stats.count("rendered", (font_key[0], size), len(rendered))
+
+
+def _iter_rendered(font_key, texts, jobs):
+    """
+    texts を順に描画した結果を返すジェネレータです。
+    """
+    if not texts:
+        return
+    if jobs is not None:
+        yield from _render_parallel(font_key, texts, jobs or os.cpu_count() or 1)
+        return
+    font = _load_font_by_key(font_key)
+    for text in texts:
+        yield _render_bits(font, text, font_key[2])
+
+
+def _render_chunk(font_key, texts):
+    """
+    キャッシュを介さずに文字の並びを描画します (ワーカープロセスからも呼ばれます)。
+    """
+    font = _load_font_by_key(font_key)
+    return [_render_bits(font, text, font_key[2]) for text in texts]
+
+
+def _init_worker(font_key):
+    # ワーカーごとにフォントを1回だけ読み込んでおく
+    _load_font_by_key(font_key)
+
+
+def _render_parallel(font_key, texts, jobs):
+    """
+    文字の並びをチャンクに分け、ワーカープロセスで描画した結果を1文字ずつ返すジェネレータです。
+    結果は executor.map により元の並び順で返るため、出力はワーカー数によらず同じになります。
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunk_size = max(PARALLEL_MIN_CHUNK, -(-len(texts) // (jobs * 4)))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks)),
+                             initializer=_init_worker,
+                             initargs=(font_key,)) as executor:
+        for chunk in executor.map(_render_chunk, [font_key] * len(chunks), chunks):
+            yield from chunk
+
+
+def bits_to_matrix(data, size):
+    """
+    render_glyph_bits() のビット列を0/1の2次元リストに展開します。
+    """
+    stride = (size + 7) // 8
+    if size == 8:
+        return [list(_BYTE_BITS[b]) for b in data]
+    matrix = []
+    for y in range(0, len(data), stride):
+        row = []
+        for b in data[y:y + stride]:
+            row.extend(_BYTE_BITS[b])
+        del row[size:]
+        matrix.append(row)
+    return matrix
+
+
+def bits_to_image(data, size):
+    """
+    render_glyph_bits() のビット列からモノクロ('1')画像を作成します。
+    """
+    from PIL import Image
+
+    return Image.frombytes("1", (size, size), data)
+
+
+def render_glyph(text, font_path, size):
+    """
+    指定されたドットフォントを使い、文字をバイナリ行列に変換します。
+    アンチエイリアスを無効にし、各ピクセルの色で0/1を判断します。
+
+    Args:
+        text (str): 変換したい文字。
+        font_path (str): 使用するフォントファイルのパス。
+        size (int): フォントのサイズ (8または16)。
+
+    Returns:
+        list: バイナリデータの2次元リスト。フォントにグリフが無い場合は None
+    """
+    data = render_glyph_bits(text, font_path, size)
+    if data is None:
+        return None
+    return bits_to_matrix(data, size)
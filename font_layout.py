@@ -0,0 +1,182 @@
+import struct
+
+from font_engine import bits_to_matrix
+
+# 出力レイアウト
+#   pixel  : 1ピクセル1要素の uint8_t (従来形式)
+#   row8   : 1行を uint8_t 1個に詰める (幅8以下、左端がMSB)
+#   row16  : 1行を uint16_t 1個に詰める (幅16以下、左端がMSB)
+#   packed : グリフ全体を行優先・MSBファーストの連続ビット列として uint8_t に詰める
+#   vpage  : SSD1306形式。8行ごとのページ単位で、列ごとに縦8ピクセルを1バイトにする (LSBが上)
+#   column : 列優先。1列を上から (height + 7) // 8 バイトに詰める (MSBが上)
+LAYOUTS = ("pixel", "row8", "row16", "packed", "vpage", "column")
+
+_ROW_BITS = {"row8": 8, "row16": 16}
+
+# 8ビット単位でビット順を反転するための変換表
+_REVERSED_BYTE = bytes(int(f"{b:08b}"[::-1], 2) for b in range(256))
+
+
+def layout_info(layout, width, height):
+    """
+    レイアウトごとのC言語の要素型と、1グリフあたりの要素数・バイト数を返します。
+
+    Args:
+        layout (str): LAYOUTS のいずれか。
+        width (int): グリフの幅。
+        height (int): グリフの高さ。
+
+    Returns:
+        dict: {"ctype": 要素型, "elements": 1グリフの要素数, "bytes": 1グリフのバイト数}
+    """
+    if layout == "pixel":
+        return {"ctype": "uint8_t", "elements": width * height,
+                "bytes": width * height}
+    if layout in _ROW_BITS:
+        row_bits = _ROW_BITS[layout]
+        if width > row_bits:
+            raise ValueError(
+                f"レイアウト {layout} は幅{row_bits}以下のグリフにしか使えません (幅: {width})")
+        return {"ctype": f"uint{row_bits}_t", "elements": height,
+                "bytes": height * row_bits // 8}
+    if layout == "packed":
+        glyph_bytes = (width * height + 7) // 8
+        return {"ctype": "uint8_t", "elements": glyph_bytes,
+                "bytes": glyph_bytes}
+    if layout in ("vpage", "column"):
+        glyph_bytes = width * ((height + 7) // 8)
+        return {"ctype": "uint8_t", "elements": glyph_bytes,
+                "bytes": glyph_bytes}
+    raise ValueError(f"不明なレイアウトです: {layout}")
+
+
+def _row_strings(data, width, mirror):
+    """
+    ビット列を、行ごとの "0"/"1" 文字列 (左端が先頭) のリストにします。
+    """
+    stride = (width + 7) // 8
+    rows = [f"{int.from_bytes(data[y:y + stride], 'big'):0{stride * 8}b}"[:width]
+            for y in range(0, len(data), stride)]
+    if mirror:
+        rows = [row[::-1] for row in rows]
+    return rows
+
+
+def pack_glyph(data, width, height, layout, reverse_bits=False, mirror=False):
+    """
+    render_glyph_bits() のビット列 (行優先・MSBファースト、1行 (width + 7) // 8 バイト) を
+    指定レイアウトの要素値のリストに変換します。
+
+    Args:
+        data (bytes): グリフのビット列。
+        width (int): グリフの幅。
+        height (int): グリフの高さ。
+        layout (str): LAYOUTS のいずれか。
+        reverse_bits (bool): 各要素内のビット順を反転する
+            (row系は左端がLSB、vpage はMSBが上、column はLSBが上になる)。
+        mirror (bool): 左右反転した状態で格納する。
+
+    Returns:
+        list: C配列に並べる要素値 (layout_info() の elements 個)
+    """
+    info = layout_info(layout, width, height)
+    stride = (width + 7) // 8
+
+    if layout == "pixel":
+        matrix = bits_to_matrix(data, width)
+        if mirror:
+            matrix = [row[::-1] for row in matrix]
+        return [bit for row in matrix for bit in row]
+
+    if layout in ("vpage", "column"):
+        # 行文字列を zip で転置して列文字列 (上が先頭) を作る
+        pad = "0" * (((height + 7) // 8) * 8 - height)
+        columns = ["".join(col) + pad
+                   for col in zip(*_row_strings(data, width, mirror))]
+        if layout == "vpage":
+            # ページ -> 列の順に並べ、ページ内の一番上の行をLSBにする
+            chunks = [col[p:p + 8] for p in range(0, len(columns[0]), 8)
+                      for col in columns]
+            if not reverse_bits:
+                chunks = [chunk[::-1] for chunk in chunks]
+            return [int(chunk, 2) for chunk in chunks]
+        packed = b"".join(int(col, 2).to_bytes(len(col) // 8, "big")
+                          for col in columns)
+        if reverse_bits:
+            packed = packed.translate(_REVERSED_BYTE)
+        return list(packed)
+
+    if mirror:
+        rows = _row_strings(data, width, mirror)
+        data = b"".join(int(row + "0" * (stride * 8 - width), 2).to_bytes(stride, "big")
+                        for row in rows)
+
+    if layout == "row8":
+        values = list(data)
+    elif layout == "row16":
+        if stride == 2:
+            values = list(struct.unpack(f">{height}H", data))
+        else:
+            values = [b << 8 for b in data]
+        if reverse_bits:
+            return [int(f"{v:016b}"[::-1], 2) for v in values]
+        return values
+    elif width % 8 == 0:
+        # 行の末尾に余りビットが無いので、そのまま連続ビット列になっている
+        values = list(data)
+    else:
+        pad = stride * 8 - width
+        bits = 0
+        for y in range(0, len(data), stride):
+            bits = (bits << width) | (int.from_bytes(data[y:y + stride], "big") >> pad)
+        total = width * height
+        values = list((bits << (info["bytes"] * 8 - total)).to_bytes(info["bytes"], "big"))
+
+    if reverse_bits:
+        return list(bytes(values).translate(_REVERSED_BYTE))
+    return values
+
+
+def unpack_glyph(values, width, height, layout, reverse_bits=False, mirror=False):
+    """
+    pack_glyph() の逆変換です。要素値の並びを render_glyph_bits() と同じ形式のビット列に戻します。
+    (プレビュー用なので、C言語のアクセサマクロと同じ計算を1ピクセルずつ行います)
+    """
+    layout_info(layout, width, height)
+    pages = (height + 7) // 8
+    stride = (width + 7) // 8
+    rows = []
+    for y in range(height):
+        bits = 0
+        for x in range(width):
+            sx = width - 1 - x if mirror else x
+            if layout == "pixel":
+                bit = values[y * width + sx]
+            elif layout in _ROW_BITS:
+                shift = sx if reverse_bits else _ROW_BITS[layout] - 1 - sx
+                bit = (values[y] >> shift) & 1
+            elif layout == "packed":
+                pos = y * width + sx
+                shift = pos & 7 if reverse_bits else 7 - (pos & 7)
+                bit = (values[pos >> 3] >> shift) & 1
+            elif layout == "vpage":
+                shift = 7 - (y & 7) if reverse_bits else y & 7
+                bit = (values[(y >> 3) * width + sx] >> shift) & 1
+            else:
+                shift = y & 7 if reverse_bits else 7 - (y & 7)
+                bit = (values[sx * pages + (y >> 3)] >> shift) & 1
+            bits = (bits << 1) | bit
+        rows.append((bits << (stride * 8 - width)).to_bytes(stride, "big"))
+    return b"".join(rows)
+
+
+def size_report(array_name, count, width, height, layout):
+    """
+    出力テーブルのサイズを、従来の1ピクセル1バイト形式と比較した文字列で返します。
+    """
+    glyph_bytes = layout_info(layout, width, height)["bytes"]
+    total = count * glyph_bytes
+    unpacked = count * width * height
+    ratio = total / unpacked * 100 if unpacked else 0
+    return (f"{array_name}: {count}文字 x {glyph_bytes}バイト = {total}バイト "
+            f"({layout}, 1ピクセル1バイト形式 {unpacked}バイトの {ratio:.1f}%)")
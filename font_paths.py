@@ -0,0 +1,18 @@
+import os
+
+# フォントファイルのパスの解決 (バッチCLI版・font_build.py・常駐サーバーで共通)。
+# 常駐サーバーがバッチCLI版のモジュール全体を読み込まずに済むよう、別のモジュールにしています。
+
+
+def resolve_font_path(font_path):
+    """
+    フォントパスを解決します。カレントディレクトリに無い場合は
+    スクリプトと同じディレクトリ (同梱フォントの場所) も探します。
+    """
+    if os.path.exists(font_path):
+        return font_path
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    bundled = os.path.join(script_dir, font_path)
+    if os.path.exists(bundled):
+        return bundled
+    return font_path
@@ -1,76 +1,41 @@
 import os
-from PIL import Image, ImageDraw, ImageFont
+import sys
+from c_emitter import write_c_fragment
+from font_blob import FontBlob
+from font_coverage import unsupported_chars
+from font_engine import bits_to_matrix, iter_charset_bits, render_glyph_bits
 
 
-def generate_binary_from_dot_font(text, font_path, size):
+def print_c_fragment(glyphs, size):
     """
-    指定されたドットフォントを使い、文字をバイナリ行列に変換します。
-    (GUI版からプレビュー画像生成部分を除いたCUI版)
+    グリフを描画しながらC言語の配列の中身として標準出力に書き出します。
     """
-    if not os.path.exists(font_path):
-        # フォントファイルが見つからない場合はエラーを発生させる
-        raise FileNotFoundError(f"フォントファイルが見つかりません: {font_path}")
+    if write_c_fragment(sys.stdout, glyphs, size, size):
+        print()
 
-    output_size = (size, size)
-    font = ImageFont.truetype(font_path, size=size)
 
-    image = Image.new("1", output_size, 0)
-    draw = ImageDraw.Draw(image)
-
-    try:
-        bbox = draw.textbbox((0, 0), text, font=font)
-    except AttributeError:
-        left, top, right, bottom = draw.textsize(text, font=font)
-        bbox = (left, top, right, bottom)
-
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
-
-    if text_width == 0 or text_height == 0:
-        return None
-
-    x_offset = (size - text_width) // 2 - bbox[0]
-    y_offset = (size - text_height) // 2 - bbox[1]
-
-    draw.text((x_offset, y_offset), text, font=font, fill=1)
-
-    binary_matrix = []
-    for y in range(size):
-        row = [image.getpixel((x, y)) for x in range(size)]
-        binary_matrix.append(row)
-
-    return binary_matrix
-
-
-def format_c_array(matrices):
+def print_unsupported(text, font_path):
     """
-    バイナリ行列のリストをC言語の配列形式の文字列にフォーマットします。
+    text のうちフォントに収録されていない文字を表示します (描画せずに cmap から調べます)。
     """
-    if not matrices:
-        return ""
-
-    is_3d = len(matrices) > 1
-    result_string = ""
-
-    for char_index, matrix in enumerate(matrices):
-        if is_3d:
-            result_string += "    {\n"
+    missing = unsupported_chars(text, font_path)
+    if missing:
+        print(f"フォントに無い文字 (出力しません): "
+              f"{' '.join(f'{char} (U+{ord(char):04X})' for char in missing)}")
 
-        for i, row in enumerate(matrix):
-            row_str = ", ".join(map(str, row))
-            indent = "        " if is_3d else "    "
-            result_string += f"{indent}{{{row_str}}}"
-            if i < len(matrix) - 1:
-                result_string += ",\n"
-            else:
-                result_string += "\n"
 
-        if is_3d:
-            result_string += "    }"
-            if char_index < len(matrices) - 1:
-                result_string += ",\n"
-
-    return result_string
+def print_blob_preview(blob, text):
+    """
+    .bin ファイルに収録されているグリフを、TTFを描画し直さずにアスキーアートで表示します。
+    """
+    for char in text:
+        data = blob.get_bits(char)
+        if data is None:
+            print(f"'{char}' (U+{ord(char):04X}): .bin ファイルに収録されていません。")
+            continue
+        print(f"'{char}' (U+{ord(char):04X}):")
+        for row in bits_to_matrix(data, blob.width):
+            print("".join("##" if bit else ". " for bit in row))
 
 
 def main():
@@ -99,6 +64,7 @@ def main():
         print("\n--- モードを選択してください ---")
         print("1: 単一文字変換")
         print("2: 文字列変換")
+        print("3: .bin ファイルのプレビュー")
         print("q: 終了")
         mode = input("モード番号を入力してください: ").strip()
 
@@ -114,16 +80,16 @@ def main():
                 print("エラー: 1文字だけ入力してください。")
 
             print("\n--- 16x16 (DotGothic16) ---")
-            matrix_16 = generate_binary_from_dot_font(
-                char_input, font_path_16, 16)
-            if matrix_16:
-                print(format_c_array([matrix_16]))
+            print_unsupported(char_input, font_path_16)
+            glyph_16 = render_glyph_bits(char_input, font_path_16, 16)
+            if glyph_16:
+                print_c_fragment([glyph_16], 16)
 
             print("\n--- 8x8 (Misaki Gothic) ---")
-            matrix_8 = generate_binary_from_dot_font(
-                char_input, font_path_8, 8)
-            if matrix_8:
-                print(format_c_array([matrix_8]))
+            print_unsupported(char_input, font_path_8)
+            glyph_8 = render_glyph_bits(char_input, font_path_8, 8)
+            if glyph_8:
+                print_c_fragment([glyph_8], 8)
 
         elif mode == '2' or mode == '２':
             # --- 文字列モード ---
@@ -132,27 +98,31 @@ def main():
                 print("エラー: 文字列が空です。")
                 continue
 
-            # 16x16
+            # 16x16 (フォントに無い文字は出力しない)
             print("\n--- 16x16 (DotGothic16) ---")
-            matrices_16 = []
-            for char in str_input:
-                matrix = generate_binary_from_dot_font(char, font_path_16, 16)
-                if matrix:
-                    matrices_16.append(matrix)
-            if matrices_16:
-                print(format_c_array(matrices_16))
+            print_unsupported(str_input, font_path_16)
+            print_c_fragment(
+                (g for g in iter_charset_bits(str_input, font_path_16, 16) if g), 16)
 
             # 8x8
             print("\n--- 8x8 (Misaki Gothic) ---")
-            matrices_8 = []
-            for char in str_input:
-                matrix = generate_binary_from_dot_font(char, font_path_8, 8)
-                if matrix:
-                    matrices_8.append(matrix)
-            if matrices_8:
-                print(format_c_array(matrices_8))
+            print_unsupported(str_input, font_path_8)
+            print_c_fragment(
+                (g for g in iter_charset_bits(str_input, font_path_8, 8) if g), 8)
+        elif mode == '3' or mode == '３':
+            # --- .bin プレビューモード (font_to_binary_batch.py で生成したファイル) ---
+            blob_path = input(".bin ファイルのパスを入力してください: ").strip()
+            try:
+                blob = FontBlob(blob_path)
+            except (OSError, ValueError) as e:
+                print(f"エラー: .bin ファイルを開けません: {e}")
+                continue
+            with blob:
+                print(f"{blob.width}x{blob.height}, {blob.layout}, {len(blob)}文字")
+                str_input = input("表示する文字列を入力してください: ").strip()
+                print_blob_preview(blob, str_input)
         else:
-            print("エラー: 無効なモードです。「1」、「2」、または「q」を入力してください。")
+            print("エラー: 無効なモードです。「1」、「2」、「3」、または「q」を入力してください。")
 
 
 if __name__ == "__main__":
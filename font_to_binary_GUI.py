@@ -1,7 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageDraw, ImageFont, ImageTk
+from PIL import Image, ImageTk
+import io
 import os
+from c_emitter import write_c_fragment
+from font_coverage import unsupported_chars
+from font_engine import bits_to_image, render_glyph_bits
+from render_worker import RenderWorker
+from string_preview import StringPreview
+from virtual_view import VirtualTextView, VirtualTileView
+
+# 文字列の入力が止まってから描画を始めるまでの時間 (ミリ秒)
+STRING_DEBOUNCE_MS = 150
+# バックグラウンドの描画結果を確認する間隔 (ミリ秒)
+POLL_INTERVAL_MS = 30
 
 
 def generate_binary_from_dot_font(text, font_path, size):
@@ -15,53 +27,104 @@ def generate_binary_from_dot_font(text, font_path, size):
         size (int): フォントのサイズ (8または16)。
 
     Returns:
-        tuple: (バイナリデータの2次元リスト, Pillowのプレビュー画像オブジェクト) または (None, None)
+        tuple: (1ピクセル1ビットのバイナリデータ, Pillowのプレビュー画像オブジェクト, 描画画像) または (None, None, None)
+    """
+    data = render_glyph_bits(text, font_path, size)
+    if data is None:
+        return None, None, None
+
+    image = bits_to_image(data, size)
+
+    # プレビュー画像生成
+    # '1'モードから'L'モードに変換し、0/1を0/255にマッピングしてからリサイズ
+    preview_image = image.convert("L").point(lambda i: i * 255)
+    preview_image = preview_image.resize((160, 160), Image.Resampling.NEAREST)
+
+    return data, preview_image, image
+
+
+def unsupported_note(text, font_path):
+    """
+    text にフォントに収録されていない文字があれば、それを知らせるC言語のコメント行を返します。
+    (結果の欄にそのまま表示し、コピーしてもソースとして使えるようにコメントにしています)
+    """
+    missing = unsupported_chars(text, font_path)
+    if not missing:
+        return None
+    return ("// フォントに無い文字 (出力しません): "
+            f"{' '.join(f'{char} (U+{ord(char):04X})' for char in missing)}\n")
+
+
+def format_result_text(glyphs, size, note=None):
     """
-    if not os.path.exists(font_path):
-        raise FileNotFoundError(f"フォントファイルが見つかりません: {font_path}")
+    結果の欄に表示する内容 (C言語の配列) を返します。グリフもお知らせも無い場合は None を返します。
+    """
+    if not glyphs and not note:
+        return None
+    result = io.StringIO()
+    if note:
+        result.write(note)
+    if glyphs:
+        write_c_fragment(result, glyphs, size, size)
+    return result.getvalue()
 
-    output_size = (size, size)
-    font = ImageFont.truetype(font_path, size=size)
 
-    # モノクロモード('1')で画像を作成し、アンチエイリアスなしで描画
-    image = Image.new("1", output_size, 0)  # 0:黒
-    draw = ImageDraw.Draw(image)
+def string_tile_image(data, size):
+    """
+    文字列タブのプレビューに並べる1文字分の画像 (高さ160ピクセルに拡大したもの) を返します。
+    """
+    image = bits_to_image(data, size).convert("L").point(lambda i: i * 255)
+    return image.resize((size * (160//size), 160), Image.Resampling.NEAREST)
 
-    # 文字の描画位置を中央に調整
-    try:
-        # Pillow 10.0.0以降
-        bbox = draw.textbbox((0, 0), text, font=font)
-    except AttributeError:
-        # Pillow 10.0.0より前
-        left, top, right, bottom = draw.textsize(text, font=font)
-        bbox = (left, top, right, bottom)
 
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
+def render_char_result(text, font_path, size, cancelled):
+    """
+    単一文字タブの表示内容を作ります (ワーカースレッドで実行します)。
 
-    if text_width == 0 or text_height == 0:
+    Returns:
+        tuple: (結果の欄の内容, プレビュー画像)。フォントに無い文字の場合、プレビュー画像は None。
+    """
+    note = unsupported_note(text, font_path)
+    if note:
+        return note, None
+    glyph, preview, _ = generate_binary_from_dot_font(text, font_path, size)
+    if not glyph:
         return None, None
+    return format_result_text([glyph], size), preview
 
-    x_offset = (size - text_width) // 2 - bbox[0]
-    y_offset = (size - text_height) // 2 - bbox[1]
 
-    draw.text((x_offset, y_offset), text, font=font, fill=1)  # 1:白
+def prepare_string_previews(previews, text, cancelled):
+    """
+    文字列タブの各フォントについて、まだ描画していない文字だけを描画します (ワーカースレッドで実行します)。
+    メインスレッドでは描画しないので、表示に使う結果とお知らせの行はここで全て用意します。
 
-    # 画像のピクセルから直接バイナリ行列を生成
-    binary_matrix = []
-    for y in range(size):
-        row = []
-        for x in range(size):
-            pixel_value = image.getpixel((x, y))
-            row.append(pixel_value)  # '1'モードなので、値は既に0か1
-        binary_matrix.append(row)
+    Returns:
+        tuple: (文字列, フォントごとの (StringPreview.prepare() の結果, お知らせの行) のリスト)。
+            途中で取り消された場合は None。
+    """
+    results = []
+    for preview in previews:
+        entries = preview.prepare(text, cancelled)
+        if entries is None:
+            return None
+        results.append((entries, unsupported_note(text, preview.font_path)))
+    return text, results
 
-    # プレビュー画像生成
-    # '1'モードから'L'モードに変換し、0/1を0/255にマッピングしてからリサイズ
-    preview_image = image.convert("L").point(lambda i: i * 255)
-    preview_image = preview_image.resize((160, 160), Image.Resampling.NEAREST)
 
-    return binary_matrix, preview_image, image
+def render_for_fonts(render, text, fonts, cancelled):
+    """
+    fonts の (フォントパス, サイズ) ごとに render() の結果を作ります (ワーカースレッドで実行します)。
+
+    Returns:
+        list: フォントごとの render() の結果。途中で取り消された場合は None。
+    """
+    results = []
+    for font_path, size in fonts:
+        result = render(text, font_path, size, cancelled)
+        if cancelled():
+            return None
+        results.append(result)
+    return results
 
 
 class FontToBinApp:
@@ -79,6 +142,15 @@ class FontToBinApp:
         self.font_path_16 = os.path.join(
             script_dir, "DotGothic16-Regular.ttf")
         self.font_path_8 = os.path.join(script_dir, "misaki_gothic_2nd.ttf")
+        self.fonts = [(self.font_path_16, 16), (self.font_path_8, 8)]
+        # 文字列タブは文字ごとの描画結果を保持し、編集された範囲だけを表示し直す
+        self.string_previews = [StringPreview(font_path, size) for font_path, size in self.fonts]
+
+        # --- 描画はバックグラウンドのスレッドで行い、結果をメインスレッドで表示する ---
+        self.worker = RenderWorker()
+        self._string_after_id = None
+        self._polling = False
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # --- タブの作成 ---
         self.notebook = ttk.Notebook(root)
@@ -211,15 +283,18 @@ class FontToBinApp:
             preview_frame_16, height=160, bg="white", relief="sunken", borderwidth=1)
         x_scrollbar_16 = tk.Scrollbar(
             preview_frame_16, orient="horizontal", command=self.str_preview_canvas_16.xview)
-        self.str_preview_canvas_16.configure(xscrollcommand=x_scrollbar_16.set)
         x_scrollbar_16.pack(side="bottom", fill="x")
         self.str_preview_canvas_16.pack(side="top", fill="x", expand=True)
+        # プレビューと結果の欄は、見えている範囲の文字・行だけを表示する
+        self.str_preview_tiles_16 = VirtualTileView(
+            self.str_preview_canvas_16, x_scrollbar_16, 160, 160)
 
-        self.str_result_text_16 = tk.Text(
-            frame_16, height=10, relief="sunken", borderwidth=1, font=("Courier", 9))
-        self.str_result_text_16.pack(fill="both", expand=True, pady=5)
+        self.str_result_view_16 = VirtualTextView(
+            frame_16, height=10, font=("Courier", 9), relief="sunken", borderwidth=1)
+        self.str_result_view_16.pack(fill="both", expand=True, pady=5)
         copy_button_16 = tk.Button(
-            frame_16, text="コピー", command=lambda: self.copy_to_clipboard(self.str_result_text_16))
+            frame_16, text="コピー",
+            command=lambda: self.copy_text_to_clipboard(self.str_result_view_16.get_all()))
         copy_button_16.pack(pady=(0, 5))
 
         # --- 8x8 結果表示 ---
@@ -233,15 +308,18 @@ class FontToBinApp:
             preview_frame_8, height=160, bg="white", relief="sunken", borderwidth=1)
         x_scrollbar_8 = tk.Scrollbar(
             preview_frame_8, orient="horizontal", command=self.str_preview_canvas_8.xview)
-        self.str_preview_canvas_8.configure(xscrollcommand=x_scrollbar_8.set)
         x_scrollbar_8.pack(side="bottom", fill="x")
         self.str_preview_canvas_8.pack(side="top", fill="x", expand=True)
+        # プレビューと結果の欄は、見えている範囲の文字・行だけを表示する
+        self.str_preview_tiles_8 = VirtualTileView(
+            self.str_preview_canvas_8, x_scrollbar_8, 160, 160)
 
-        self.str_result_text_8 = tk.Text(
-            frame_8, height=10, relief="sunken", borderwidth=1, font=("Courier", 9))
-        self.str_result_text_8.pack(fill="both", expand=True, pady=5)
+        self.str_result_view_8 = VirtualTextView(
+            frame_8, height=10, font=("Courier", 9), relief="sunken", borderwidth=1)
+        self.str_result_view_8.pack(fill="both", expand=True, pady=5)
         copy_button_8 = tk.Button(
-            frame_8, text="コピー", command=lambda: self.copy_to_clipboard(self.str_result_text_8))
+            frame_8, text="コピー",
+            command=lambda: self.copy_text_to_clipboard(self.str_result_view_8.get_all()))
         copy_button_8.pack(pady=(0, 5))
 
         self.root.after(100, self.update_string_results)
@@ -269,79 +347,97 @@ class FontToBinApp:
         self.update_single_char_results()
 
     def on_string_change(self, *args):
-        self.update_string_results()
+        # 入力が続いている間は描画しない (止まってから STRING_DEBOUNCE_MS 後に描画する)
+        if self._string_after_id is not None:
+            self.root.after_cancel(self._string_after_id)
+        self.worker.cancel("string")
+        self._string_after_id = self.root.after(STRING_DEBOUNCE_MS, self.update_string_results)
+
+    def on_close(self):
+        self.worker.close()
+        self.root.destroy()
 
     # --- 単一文字処理 ---
     def update_single_char_results(self):
         text = self.char_to_convert.get()
         if not text or len(text) > 1:
+            self.worker.cancel("single")
             self.clear_single_char_results()
             return
-        self.update_font_results(
-            text, self.preview_canvas_16, self.result_text_16, self.font_path_16, 16)
-        self.update_font_results(
-            text, self.preview_canvas_8, self.result_text_8, self.font_path_8, 8)
+        self.worker.submit("single", render_for_fonts, render_char_result, text, self.fonts)
+        self.start_polling()
 
     # --- 文字列処理 ---
     def update_string_results(self):
+        self._string_after_id = None
         text = self.string_to_convert.get()
         if not text:
+            self.worker.cancel("string")
             self.clear_string_results()
             return
-        self.update_string_font_results(
-            text, self.str_preview_canvas_16, self.str_result_text_16, self.font_path_16, 16)
-        self.update_string_font_results(
-            text, self.str_preview_canvas_8, self.str_result_text_8, self.font_path_8, 8)
+        self.worker.submit("string", prepare_string_previews, self.string_previews, text)
+        self.start_polling()
 
     # --- 共通ロジック ---
-    def update_font_results(self, text, canvas, text_widget, font_path, size):
-        try:
-            matrix, preview, _ = generate_binary_from_dot_font(
-                text, font_path, size)
-            if matrix:
-                self.update_preview(canvas, preview)
-                self.update_result_text(text_widget, [matrix])
-        except FileNotFoundError as e:
-            self.clear_single_char_results()
-            messagebox.showerror("エラー", e)
-        except Exception:
-            self.clear_single_char_results()
-
-    def update_string_font_results(self, text, canvas, text_widget, font_path, size):
-        matrices = []
-        images = []
-        try:
-            for char in text:
-                matrix, _, raw_image = generate_binary_from_dot_font(
-                    char, font_path, size)
-                if matrix:
-                    matrices.append(matrix)
-                    images.append(raw_image)
-
-            if matrices:
-                self.update_result_text(text_widget, matrices)
-                # プレビュー画像を連結して表示
-                total_width = sum(img.width for img in images)
-                combined_image = Image.new('L', (total_width, size))
-                x_offset = 0
-                for img in images:
-                    combined_image.paste(img, (x_offset, 0))
-                    x_offset += img.width
-
-                preview_image = combined_image.convert(
-                    "L").point(lambda i: i * 255)
-                preview_image = preview_image.resize(
-                    (total_width * (160//size), 160), Image.Resampling.NEAREST)
-                self.update_string_preview(canvas, preview_image)
-
-        except FileNotFoundError as e:
-            self.clear_string_results()
-            messagebox.showerror("エラー", e)
-        except Exception:
+    def start_polling(self):
+        """描画結果の確認を始める (既に確認中の場合は何もしない)"""
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_INTERVAL_MS, self.poll_worker)
+
+    def poll_worker(self):
+        """完了した描画結果を表示し、未完了の描画があれば再び確認を予約する"""
+        for key, results, error in self.worker.poll():
+            if key == "single":
+                self.show_results(results, error, [
+                    (self.preview_canvas_16, self.result_text_16),
+                    (self.preview_canvas_8, self.result_text_8)],
+                    self.update_preview, self.clear_single_char_results)
+            else:
+                self.show_string_results(results, error)
+        if self.worker.busy():
+            self.root.after(POLL_INTERVAL_MS, self.poll_worker)
+        else:
+            self._polling = False
+
+    def show_results(self, results, error, widgets, update_preview, clear):
+        if error is not None:
+            clear()
+            if isinstance(error, FileNotFoundError):
+                messagebox.showerror("エラー", error)
+            return
+        for (canvas, text_widget), (content, preview) in zip(widgets, results):
+            if preview is not None:
+                update_preview(canvas, preview)
+            elif content is not None:
+                # フォントに無い文字だけの場合は、プレビューを消してお知らせだけを表示する
+                canvas.delete("all")
+            if content is not None:
+                self.update_result_text(text_widget, content)
+
+    def show_string_results(self, result, error):
+        """文字列タブの結果の欄とプレビューを、見えている範囲だけ表示し直す"""
+        if error is not None:
             self.clear_string_results()
+            if isinstance(error, FileNotFoundError):
+                messagebox.showerror("エラー", error)
+            return
+        text, prepared = result
+        widgets = [(self.str_preview_tiles_16, self.str_result_view_16),
+                   (self.str_preview_tiles_8, self.str_result_view_8)]
+        for preview, (tiles, view), (entries, note) in zip(self.string_previews, widgets,
+                                                           prepared):
+            start = preview.update(text, entries, note)
+            view.set_source(preview.line_count(), preview.line)
+            tiles.set_source(
+                len(preview.chars), preview.chars.__getitem__,
+                lambda char, preview=preview: string_tile_image(preview.glyph(char), preview.size),
+                start)
 
     def copy_to_clipboard(self, text_widget):
-        text_to_copy = text_widget.get("1.0", "end-1c")
+        self.copy_text_to_clipboard(text_widget.get("1.0", "end-1c"))
+
+    def copy_text_to_clipboard(self, text_to_copy):
         if text_to_copy:
             self.root.clipboard_clear()
             self.root.clipboard_append(text_to_copy)
@@ -353,44 +449,10 @@ class FontToBinApp:
         canvas.create_image(0, 0, anchor="nw", image=photo)
         canvas.image = photo
 
-    def update_string_preview(self, canvas, image):
-        photo = ImageTk.PhotoImage(image)
-        canvas.delete("all")
-        canvas.create_image(0, 0, anchor="nw", image=photo)
-        canvas.image = photo
-        canvas.config(scrollregion=canvas.bbox("all"))
-
-    def update_result_text(self, text_widget, matrices):
-        if not matrices:
-            return
-
-        is_3d = len(matrices) > 1
-        result_string = ""
-
-        for char_index, matrix in enumerate(matrices):
-            if is_3d:
-                result_string += "    {\n"
-
-            for i, row in enumerate(matrix):
-                row_str = ", ".join(map(str, row))
-                indent = "        " if is_3d else "    "
-                result_string += f"{indent}{{{row_str}}}"
-                if i < len(matrix) - 1:
-                    result_string += ",\n"
-                else:
-                    result_string += "\n"
-
-            if is_3d:
-                result_string += "    }"
-                if char_index < len(matrices) - 1:
-                    result_string += ",\n"
-                else:
-                    # 最後のブロックの後には何も追加しない
-                    pass
-
+    def update_result_text(self, text_widget, content):
         text_widget.configure(state='normal')
         text_widget.delete("1.0", tk.END)
-        text_widget.insert(tk.END, result_string)
+        text_widget.insert(tk.END, content)
         text_widget.configure(state='disabled')
 
     def clear_single_char_results(self):
@@ -404,14 +466,12 @@ class FontToBinApp:
         self.result_text_8.configure(state='disabled')
 
     def clear_string_results(self):
-        self.str_preview_canvas_16.delete("all")
-        self.str_result_text_16.configure(state='normal')
-        self.str_result_text_16.delete("1.0", tk.END)
-        self.str_result_text_16.configure(state='disabled')
-        self.str_preview_canvas_8.delete("all")
-        self.str_result_text_8.configure(state='normal')
-        self.str_result_text_8.delete("1.0", tk.END)
-        self.str_result_text_8.configure(state='disabled')
+        for preview in self.string_previews:
+            preview.reset()
+        for tiles, view in ((self.str_preview_tiles_16, self.str_result_view_16),
+                            (self.str_preview_tiles_8, self.str_result_view_8)):
+            tiles.clear()
+            view.clear()
 
 
 def main():
@@ -0,0 +1,645 @@
+import argparse
+import contextlib
+import os
+import sys
+
+import glyph_array
+import perf_stats
+from c_emitter import (OutputFile, format_manifest_line, manifest_hash,
+                       read_manifest_hash, write_c_header, write_c_source)
+from charset import (NAMED_RANGES, glyph_label, parse_range,
+                     read_charset_file, unique_chars)
+from corpus import CorpusScan, coverage_missing, coverage_report, write_coverage_file
+from font_blob import blob_size, read_blob_manifest, write_blob
+from font_coverage import unsupported_chars
+from font_engine import (font_cache_info, glyph_cache_info, iter_charset_bits,
+                         render_charset_bits, render_proportional_bits)
+from font_layout import LAYOUTS, layout_info, size_report
+from font_paths import resolve_font_path
+from glyph_cache import GlyphDiskCache, default_cache_dir, font_sha256
+from glyph_compress import (COMPRESSIONS, check_layout, compress_report,
+                            write_c_compressed)
+from glyph_dedup import (GlyphDeduplicator, dedup_report, glyph_map_bytes,
+                         write_c_glyph_map)
+from glyph_lookup import build_lookup, lookup_report, write_c_lookup
+from proportional import (check_proportional_layout, proportional_report,
+                          write_c_proportional)
+
+TABLE_KEYS = ("font", "size", "output", "layout", "name", "title",
+              "reverse", "mirror", "format", "lookup", "dedup", "compress", "proportional")
+
+# 出力形式 (c: C言語のソース, bin: font_blob.py の .bin ファイル)
+FORMATS = ("c", "bin")
+
+
+def _parse_bool(value):
+    if value.lower() in ("1", "true", "yes", "on"):
+        return True
+    if value.lower() in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"真偽値として解釈できません: {value}")
+
+
+def parse_table_spec(spec, defaults):
+    """
+    --table の指定 ("font=PATH,size=16,output=out.c,layout=row16") を辞書にします。
+
+    Args:
+        spec (str): カンマ区切りの key=value の並び。
+        defaults (dict): 指定されなかったキーの既定値。
+
+    Raises:
+        ValueError: 形式が正しくない場合。
+    """
+    table = dict(defaults)
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        key, sep, value = item.partition("=")
+        key = key.strip()
+        if not sep or key not in TABLE_KEYS:
+            raise ValueError(
+                f"テーブル指定が正しくありません: {item} (使えるキー: {', '.join(TABLE_KEYS)})")
+        table[key] = value.strip()
+    return check_table(table, spec)
+
+
+def check_table(table, spec):
+    """
+    テーブルの辞書 (値は文字列のままでも、数値・真偽値でも構いません) を確認し、
+    値の型を揃えてフォントのパスや既定の名前を補います。
+
+    Args:
+        table (dict): TABLE_KEYS をキーとする辞書。
+        spec (str): エラーメッセージに表示する、テーブルの指定内容。
+
+    Raises:
+        ValueError: 値が正しくない場合。
+    """
+    for key in ("font", "size", "output"):
+        if table.get(key) in (None, ""):
+            raise ValueError(f"テーブル指定に {key}= がありません: {spec}")
+    try:
+        table["size"] = int(table["size"])
+    except (TypeError, ValueError):
+        raise ValueError(f"サイズが正しくありません: {table['size']}")
+    if table["size"] <= 0:
+        raise ValueError(f"サイズが正しくありません: {table['size']}")
+    if table["layout"] not in LAYOUTS:
+        raise ValueError(
+            f"不明なレイアウトです: {table['layout']} (使えるレイアウト: {', '.join(LAYOUTS)})")
+    for key in ("reverse", "mirror", "lookup", "dedup", "proportional"):
+        if isinstance(table[key], str):
+            table[key] = _parse_bool(table[key])
+        elif not isinstance(table[key], bool):
+            raise ValueError(f"真偽値として解釈できません: {table[key]}")
+    if not table.get("format"):
+        table["format"] = "bin" if table["output"].lower().endswith(".bin") else "c"
+    if table["format"] not in FORMATS:
+        raise ValueError(
+            f"不明な出力形式です: {table['format']} (使える形式: {', '.join(FORMATS)})")
+    if table["compress"] not in COMPRESSIONS:
+        raise ValueError(
+            f"不明な圧縮形式です: {table['compress']} (使える形式: {', '.join(COMPRESSIONS)})")
+    if table["compress"] != "none":
+        if table["format"] != "c":
+            raise ValueError(f"圧縮は format=c のテーブルにだけ使えます: {spec}")
+        check_layout(table["layout"])
+    if table["proportional"]:
+        if table["format"] != "c" or table["dedup"] or table["compress"] != "none":
+            raise ValueError(
+                f"プロポーショナル出力は format=c で、dedup・compress を使わない場合だけ指定できます: {spec}")
+        check_proportional_layout(table["layout"])
+    else:
+        # row8 / row16 に収まらないサイズは、描画する前にここで弾く
+        layout_info(table["layout"], table["size"], table["size"])
+    table["font"] = resolve_font_path(table["font"])
+    if not table.get("name"):
+        table["name"] = f"font_data_{table['size']}"
+    if not table.get("title"):
+        font_name = os.path.splitext(os.path.basename(table["font"]))[0]
+        table["title"] = f"{table['size']}x{table['size']} Font Data ({font_name})"
+    return table
+
+
+def collect_charset(args, scan=None):
+    """
+    コマンドライン引数から文字セットを組み立てます (重複は最初の1つだけ残します)。
+    scan を指定した場合は、コーパスで見つかった文字をコードポイント順に加えます。
+    """
+    return build_charset(args.chars, args.charset_file, args.range, scan)
+
+
+def build_charset(chars=None, charset_files=None, ranges=None, scan=None):
+    """
+    文字列・文字セットファイル・文字範囲・コーパスの順に連結した文字セットを返します
+    (重複は最初の1つだけ残します)。
+
+    Raises:
+        OSError: 文字セットファイルを読めない場合。
+        ValueError: 文字範囲の形式が正しくない場合。
+    """
+    text = ""
+    for text_chars in chars or []:
+        text += text_chars
+    for path in charset_files or []:
+        text += read_charset_file(path)
+    for spec in ranges or []:
+        text += parse_range(spec)
+    if scan is not None:
+        text += scan.chars()
+    return unique_chars(text)
+
+
+def report_corpus_coverage(scan, tables, jobs, disk_cache, report, coverage_file=None):
+    """
+    テーブルのフォントごとに、コーパスの文字のうちフォントに無い文字を表示します。
+    フォントの cmap から調べるので描画はしません (cmap を読めないフォントの場合だけ描画して調べます)。
+    """
+    chars = scan.chars()
+    for font_path, size in dict.fromkeys((table["font"], table["size"]) for table in tables):
+        absent = unsupported_chars(chars, font_path)
+        if absent is None:
+            # 描画して調べる場合は、出力と同じくグリフが無い (None) 文字をフォントに無い文字とする
+            glyphs = render_charset_bits(chars, font_path, size, jobs, disk_cache)
+            absent = [char for char, data in zip(chars, glyphs) if data is None]
+        missing = coverage_missing(scan, absent)
+        font_label = f"{os.path.basename(font_path)} {size}px"
+        if report is not None:
+            print(coverage_report(scan, font_label, missing), file=report)
+        if coverage_file is not None:
+            write_coverage_file(coverage_file, scan, font_label, missing)
+
+
+def write_table(out, table, charset, skip_missing, jobs=None, disk_cache=None):
+    """
+    1つのテーブルを描画しながら out に書き出します。
+
+    Returns:
+        dict: {"count": 配列に書き出したグリフ数, "missing": フォントに無い文字のリスト,
+               "lookup": 検索表 (lookup=1 の場合), "dedup": GlyphDeduplicator (dedup=1 の場合),
+               "map_bytes": 変換表のバイト数, "compressed": 圧縮の結果 (compress を指定した場合),
+               "proportional": write_c_proportional() の結果 (proportional=1 の場合)}
+    """
+    size = table["size"]
+    missing = []
+    emitted = []
+
+    if table["proportional"]:
+        def proportional_glyphs():
+            for char in charset:
+                glyph = render_proportional_bits(char, table["font"], size)
+                if glyph is None:
+                    missing.append(char)
+                    if skip_missing:
+                        continue
+                    # フォントに文字が存在しない場合は幅0・送り幅0のグリフにする
+                    glyph = (b"", 0, 0, 0)
+                emitted.append(char)
+                yield glyph_label(char), glyph
+
+        result = write_c_proportional(
+            out, table["title"], table["name"], proportional_glyphs(), size,
+            table["layout"], table["reverse"], table["mirror"])
+        lookup = None
+        if table["lookup"] and emitted:
+            lookup = build_lookup(emitted)
+            out.write("\n")
+            write_c_lookup(out, table["name"], lookup)
+        return {"count": result["count"], "missing": missing, "lookup": lookup, "dedup": None,
+                "map_bytes": 0, "compressed": None, "proportional": result}
+
+    def labeled_glyphs():
+        glyphs = iter_charset_bits(charset, table["font"], size, jobs, disk_cache)
+        for char, data in zip(charset, glyphs):
+            if data is None:
+                missing.append(char)
+                if skip_missing:
+                    continue
+                # フォントに文字が存在しない場合は全て0のグリフにする
+                data = bytes(((size + 7) // 8) * size)
+            emitted.append(char)
+            yield glyph_label(char), data
+
+    glyphs = labeled_glyphs()
+    dedup = None
+    if table["dedup"]:
+        # 同じビットマップは1回だけ配列に入れ、グリフ番号からの変換表を後に書く
+        dedup = GlyphDeduplicator()
+        glyphs = dedup.filter(glyphs)
+
+    compressed = None
+    if table["compress"] != "none":
+        # 圧縮する場合は全グリフの符号を決めてから書き出す
+        compressed = write_c_compressed(
+            out, table["title"], table["name"], glyphs, size, size,
+            table["layout"], table["reverse"], table["mirror"], table["compress"])
+        count = len(compressed["offsets"]) if compressed else 0
+    elif glyph_array.use_for(len(charset)):
+        # NumPy がある場合は、文字セット全体を配列にまとめて詰め替え・重複の検出・書き出しを行う
+        count, dedup = write_table_array(out, table, charset, skip_missing, missing, emitted,
+                                         jobs, disk_cache)
+    else:
+        # フォントに無い文字を除く場合や重複を除く場合は、書き終えるまで文字数が分からないので
+        # 配列の大きさを省略する
+        count = write_c_source(
+            out, table["title"], table["name"], glyphs, size, size,
+            table["layout"], table["reverse"], table["mirror"],
+            count=None if skip_missing or dedup else len(charset))
+
+    lookup = None
+    map_bytes = 0
+    if table["lookup"] and emitted:
+        # コードポイントからグリフ番号 (重複を除いた場合はスロット) を引けるようにする
+        lookup = build_lookup(emitted, dedup.slots if dedup is not None else None)
+        out.write("\n")
+        write_c_lookup(out, table["name"], lookup)
+    elif dedup is not None and dedup.slots:
+        # 検索表が無い場合は、文字の並び順 (グリフ番号) からスロットを引く変換表を出力する
+        out.write("\n")
+        write_c_glyph_map(out, table["name"], dedup)
+        map_bytes = glyph_map_bytes(dedup)
+    return {"count": count, "missing": missing, "lookup": lookup, "dedup": dedup,
+            "map_bytes": map_bytes, "compressed": compressed, "proportional": None}
+
+
+def write_table_array(out, table, charset, skip_missing, missing, emitted, jobs=None,
+                      disk_cache=None):
+    """
+    write_table() の圧縮しない場合を、glyph_array.py の一括処理で書き出します (出力は同じ内容です)。
+    glyph_array.ARRAY_CHUNK 文字ずつ描画・詰め替え・書き出しを行います。
+    フォントに無い文字を missing に、配列に書き出した文字を emitted に追加します。
+
+    Returns:
+        tuple: (配列に書き出したグリフ数, GlyphDeduplicator (dedup=1 の場合、それ以外は None))
+    """
+    size = table["size"]
+    slots = [] if table["dedup"] else None
+    # 重複を除く場合に、前のチャンクまでに格納したグリフ -> スロット
+    seen = {}
+
+    def labeled_chunks():
+        for chars, pixels, present in glyph_array.iter_glyph_arrays(
+                charset, table["font"], size, jobs, disk_cache):
+            missing.extend(char for char, ok in zip(chars, present) if not ok)
+            if skip_missing:
+                pixels = pixels[glyph_array.np.array(present, dtype=bool)]
+                chars = [char for char, ok in zip(chars, present) if ok]
+            emitted.extend(chars)
+            packed = glyph_array.pack_glyph_array(pixels, table["layout"], table["reverse"],
+                                                  table["mirror"])
+            if slots is not None:
+                rows, chunk_slots = glyph_array.dedup_glyph_array(packed, seen=seen)
+                slots.extend(chunk_slots)
+                packed = packed[rows]
+                chars = [chars[row] for row in rows.tolist()]
+            yield [glyph_label(char) for char in chars], packed
+
+    write_c_header(out, table["title"], table["name"], size, size, table["layout"],
+                   table["reverse"], table["mirror"])
+    count = glyph_array.write_c_array_from_chunks(
+        out, table["name"], labeled_chunks(), size, size, table["layout"],
+        count=None if skip_missing or slots is not None else len(charset))
+    out.write("\n")
+    dedup = GlyphDeduplicator.from_slots(slots) if slots is not None else None
+    return count, dedup
+
+
+def write_blob_table(out, table, charset, jobs=None, disk_cache=None):
+    """
+    1つのテーブルを .bin 形式で out に書き出し、出力した文字数とフォントに無い文字を返します。
+    (フォントに無い文字は索引に含まれないので、常に --skip-missing と同じ扱いになります。
+    dedup=1 の場合は同じビットマップを1回だけ格納し、空白のグリフは格納しません)
+    """
+    missing = []
+    if glyph_array.use_for(len(charset)):
+        size = table["size"]
+
+        def packed_chunks():
+            for chars, pixels, present in glyph_array.iter_glyph_arrays(
+                    charset, table["font"], size, jobs, disk_cache):
+                missing.extend(char for char, ok in zip(chars, present) if not ok)
+                yield chars, present, glyph_array.pack_glyph_array(
+                    pixels, table["layout"], table["reverse"], table["mirror"])
+
+        count, stored = glyph_array.write_blob_chunks(
+            out, packed_chunks(), size, size, table["layout"], table["reverse"],
+            table["mirror"], table["manifest"], table["dedup"])
+        return count, stored, missing
+
+    def present_glyphs():
+        glyphs = iter_charset_bits(charset, table["font"], table["size"], jobs, disk_cache)
+        for char, data in zip(charset, glyphs):
+            if data is None:
+                missing.append(char)
+            yield char, data
+
+    count, stored = write_blob(out, present_glyphs(), table["size"], table["size"],
+                               table["layout"], table["reverse"], table["mirror"],
+                               table["manifest"], table["dedup"])
+    return count, stored, missing
+
+
+def output_manifest_hash(tables, skip_missing):
+    """
+    1つの出力ファイルに含まれるテーブルの生成条件 (テーブルごとの文字セットを含む) から、
+    マニフェストのハッシュを求めます。
+    """
+    return manifest_hash({
+        "skip_missing": skip_missing,
+        "tables": [
+            {"charset": table["charset"],
+             "font_sha256": font_sha256(table["font"]), "size": table["size"],
+             "layout": table["layout"], "reverse_bits": table["reverse"],
+             "mirror": table["mirror"], "name": table["name"], "title": table["title"],
+             "format": table["format"], "lookup": table["lookup"], "dedup": table["dedup"],
+             "compress": table["compress"], "proportional": table["proportional"]}
+            for table in tables
+        ],
+    })
+
+
+def format_chars(chars, limit=10):
+    """
+    レポートに表示する文字の一覧を、先頭の limit 文字までの文字列にします。
+    """
+    text = " ".join(glyph_label(char) for char in chars[:limit])
+    if len(chars) > limit:
+        text += f" ... ほか {len(chars) - limit}文字"
+    return text
+
+
+def print_table_report(table, result, report):
+    """
+    write_table() の結果から、テーブルの大きさなどのレポートを表示します。
+    """
+    size = table["size"]
+    if result["proportional"] is not None:
+        print(proportional_report(table["name"], result["proportional"], size, table["layout"]),
+              file=report)
+    else:
+        print(size_report(table["name"], result["count"], size, size, table["layout"]),
+              file=report)
+    if result["dedup"] is not None:
+        glyph_bytes = layout_info(table["layout"], size, size)["bytes"]
+        print(f"  {dedup_report(table['name'], result['dedup'], glyph_bytes, result['map_bytes'])}",
+              file=report)
+    if result["compressed"] is not None:
+        print(f"  {compress_report(table['name'], result['compressed'])}", file=report)
+    if result["lookup"] is not None:
+        print(f"  {lookup_report(table['name'], result['lookup'])}", file=report)
+    if result["missing"]:
+        print(f"  フォントに無い文字: {len(result['missing'])}文字 "
+              f"({format_chars(result['missing'])})", file=report)
+
+
+def group_outputs(tables):
+    """
+    テーブルを出力先ごとにまとめます (指定された順序を保ちます)。
+
+    Returns:
+        dict: 出力先のパス -> テーブルのリスト
+
+    Raises:
+        ValueError: .bin 形式のテーブルを標準出力や、他のテーブルと同じファイルに出力しようとした場合。
+    """
+    outputs = {}
+    for table in tables:
+        outputs.setdefault(table["output"], []).append(table)
+    for path, path_tables in outputs.items():
+        if any(table["format"] == "bin" for table in path_tables):
+            if path == "-":
+                raise ValueError("format=bin のテーブルは標準出力には出力できません。")
+            if len(path_tables) > 1:
+                raise ValueError(f"'{path}' には .bin 形式のテーブルを1つしか出力できません。")
+    return outputs
+
+
+def generate_output(path, tables, skip_missing, jobs=None, disk_cache=None, force=False,
+                    report=None):
+    """
+    1つの出力ファイルに含まれるテーブルを描画して書き出します。
+    生成条件が前回と同じ場合は何もしません。
+
+    Args:
+        path (str): 出力先のパス ("-" は標準出力)。
+        tables (list): group_outputs() でまとめたテーブル (各テーブルの "charset" に文字セット)。
+        skip_missing (bool): フォントに無い文字を出力しない。
+        jobs (int): 描画に使うワーカープロセス数 (iter_charset_bits() と同じ)。
+        disk_cache (glyph_cache.GlyphDiskCache): グリフのディスクキャッシュ。
+        force (bool): 生成条件が前回と同じでも描画と書き込みをやり直す。
+        report: サイズなどのレポートの出力先 (None の場合は表示しない)。
+
+    Returns:
+        str: "skipped" (生成条件が同じ), "written" (書き込んだ), "unchanged" (内容が同じ)
+
+    Raises:
+        FileNotFoundError: フォントファイルが見つからない場合。
+        OSError: ファイルの書き込みに失敗した場合 (メッセージにその旨を含みます)。
+    """
+    digest = output_manifest_hash(tables, skip_missing)
+    blob = tables[0]["format"] == "bin"
+    previous = read_blob_manifest(path) if blob else read_manifest_hash(path)
+    if path != "-" and not force and previous == digest:
+        # フォント・文字セット・レイアウトが前回と同じなので、描画も書き込みも不要
+        if report is not None:
+            print(f"'{path}' は生成条件が前回と同じため、更新しませんでした。", file=report)
+        return "skipped"
+
+    output = OutputFile(path, binary=blob) if path != "-" else None
+    context = output if output is not None else contextlib.nullcontext(sys.stdout)
+    try:
+        with context as f:
+            if blob:
+                table = dict(tables[0], manifest=digest)
+                with perf_stats.stage("table", path):
+                    count, stored, missing = write_blob_table(
+                        f, table, table["charset"], jobs, disk_cache)
+                if report is not None:
+                    header, index, bitmap = blob_size(
+                        count, stored, table["size"], table["size"], table["layout"])
+                    print(f"{path}: {count}文字 (グリフ {stored}個), ヘッダ {header} + "
+                          f"索引 {index} + ビットマップ {bitmap} = "
+                          f"{header + index + bitmap}バイト ({table['layout']})", file=report)
+                    if table["dedup"]:
+                        glyph_bytes = bitmap // stored if stored else 0
+                        print(f"  重複・空白の除去で {(count - stored) * glyph_bytes}バイト削減",
+                              file=report)
+                    if missing:
+                        print(f"  フォントに無い文字: {len(missing)}文字 (索引に含めていません: "
+                              f"{format_chars(missing)})", file=report)
+            else:
+                f.write(format_manifest_line(digest))
+                f.write("#include <stdint.h>\n\n")
+                for index, table in enumerate(tables):
+                    if index:
+                        f.write("\n")
+                    with perf_stats.stage("table", table["name"]):
+                        result = write_table(
+                            f, table, table["charset"], skip_missing, jobs, disk_cache)
+                    if report is not None:
+                        print_table_report(table, result, report)
+    except OSError as e:
+        raise OSError(f"ファイルの書き込みに失敗しました: {e}") from e
+    if output is None:
+        return "written"
+    if report is not None:
+        if output.changed:
+            print(f"'{path}' に出力しました。", file=report)
+        else:
+            print(f"'{path}' は内容が同じため、更新しませんでした。", file=report)
+    return "written" if output.changed else "unchanged"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="ドットフォントから複数のフォントテーブル (C言語の配列) を一括生成します。",
+        epilog="例: python font_to_binary_batch.py --range ascii --range jis1 "
+               "--table font=DotGothic16-Regular.ttf,size=16,layout=row16,output=font16.c "
+               "--table font=misaki_gothic_2nd.ttf,size=8,layout=row8,output=font8.c")
+    charset = parser.add_argument_group("文字セット (複数指定した場合は連結されます)")
+    charset.add_argument("-c", "--chars", action="append", metavar="TEXT",
+                         help="変換する文字列")
+    charset.add_argument("-f", "--charset-file", action="append", metavar="PATH",
+                         help="文字セットファイル (UTF-8、改行は無視)")
+    charset.add_argument("-r", "--range", action="append", metavar="RANGE",
+                         help="文字範囲 (U+3040-U+309F, 0x20-0x7E など) または名前付きの集合 "
+                              f"({', '.join(NAMED_RANGES)})")
+    charset.add_argument("--corpus", action="append", metavar="PATH",
+                         help="実際に表示する文字を集めるファイルまたはディレクトリ。"
+                              "C/C++ のソースは文字列リテラル、JSON は文字列の値、CSV/TSV は全てのセル、"
+                              "その他はテキスト全体から、使われている文字だけを加えます")
+    charset.add_argument("--corpus-encoding", default="utf-8", metavar="ENCODING",
+                         help="--corpus のファイルの文字コード (既定: utf-8)")
+
+    parser.add_argument("-t", "--table", action="append", required=True, metavar="SPEC",
+                        help="出力するテーブル。key=value をカンマで区切って指定します "
+                             f"(キー: {', '.join(TABLE_KEYS)})。font, size, output は必須。"
+                             "output が同じテーブルは1つのファイルにまとめて出力されます。"
+                             "output が .bin の場合 (または format=bin) はバイナリ形式で出力します")
+    parser.add_argument("--layout", choices=LAYOUTS, default="pixel",
+                        help="layout= を省略したテーブルのレイアウト (既定: pixel)")
+    parser.add_argument("--reverse-bits", action="store_true",
+                        help="reverse= を省略したテーブルでビット順を反転する")
+    parser.add_argument("--mirror", action="store_true",
+                        help="mirror= を省略したテーブルを左右反転して格納する")
+    parser.add_argument("--lookup", action="store_true",
+                        help="lookup= を省略したテーブルに、コードポイントからグリフ番号を求める"
+                             "検索表と検索関数 <name>_lookup() を出力する")
+    parser.add_argument("--dedup", action="store_true",
+                        help="dedup= を省略したテーブルで、同じビットマップのグリフを1つにまとめ、"
+                             "空白のグリフを格納しない (変換表 <name>_glyph_map を出力する)")
+    parser.add_argument("--compress", choices=COMPRESSIONS, default="none",
+                        help="compress= を省略したテーブルの圧縮形式。rle は空白の行が多い表向けで展開が軽く、"
+                             "huffman は漢字の表でも縮む。展開関数 <name>_decode() を出力する (既定: none)")
+    parser.add_argument("--proportional", action="store_true",
+                        help="proportional= を省略したテーブルを、文字ごとにインクの幅で切り出した"
+                             "プロポーショナル (可変幅) 形式で出力する (レイアウトは packed, vpage, column)")
+    parser.add_argument("--skip-missing", action="store_true",
+                        help="フォントに無い文字を出力しない (既定では全て0のグリフを出力)")
+    parser.add_argument("--coverage-report", metavar="PATH",
+                        help="コーパスの文字のうちフォントに無い文字の全件を、タブ区切りで PATH に書き出す")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                        help="N 個のワーカープロセスで並列に描画する (0 はCPU数)。"
+                             "省略時は1プロセスで描画します")
+    parser.add_argument("--cache-dir", metavar="PATH",
+                        help=f"描画済みグリフのキャッシュを置くディレクトリ (既定: {default_cache_dir()})")
+    parser.add_argument("--cache-max-mb", type=float, default=64, metavar="MB",
+                        help="キャッシュディレクトリの上限サイズ (既定: 64MB)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ディスク上のグリフキャッシュを使わない")
+    parser.add_argument("--force", action="store_true",
+                        help="生成条件が前回と同じでも描画と書き込みをやり直す")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="サイズなどのレポートを表示しない")
+    perf_stats.add_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.jobs is not None and args.jobs < 0:
+        parser.error("--jobs には0以上の数を指定してください。")
+
+    if args.coverage_report and not args.corpus:
+        parser.error("--coverage-report は --corpus と一緒に指定してください。")
+
+    with perf_stats.session(args.timings, args.trace, args.cprofile):
+        return run(parser, args)
+
+
+def run(parser, args):
+    """
+    main() で確認したオプションに従って、文字セットを集めてテーブルを出力します。
+    """
+    scan = None
+    try:
+        if args.corpus:
+            scan = CorpusScan(args.corpus_encoding)
+            scan.scan_paths(args.corpus, args.jobs)
+        charset = collect_charset(args, scan)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not charset:
+        parser.error("文字セットが空です。--chars, --charset-file, --range, --corpus の"
+                     "いずれかを指定してください。")
+
+    defaults = {"layout": args.layout, "reverse": args.reverse_bits,
+                "mirror": args.mirror, "name": "", "title": "", "format": "",
+                "lookup": args.lookup, "dedup": args.dedup, "compress": args.compress,
+                "proportional": args.proportional, "charset": charset}
+    try:
+        tables = [parse_table_spec(spec, defaults) for spec in args.table]
+    except ValueError as e:
+        parser.error(str(e))
+
+    disk_cache = None
+    if not args.no_cache:
+        disk_cache = GlyphDiskCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+
+    try:
+        outputs = group_outputs(tables)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = None if args.quiet else sys.stderr
+    for path, path_tables in outputs.items():
+        try:
+            generate_output(path, path_tables, args.skip_missing, args.jobs, disk_cache,
+                            args.force, report)
+        except OSError as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            return 1
+
+    if scan is not None and (not args.quiet or args.coverage_report):
+        if not args.quiet:
+            print(scan.summary(), file=report)
+            for skipped_path, reason in scan.skipped:
+                print(f"  読めなかったファイル: {skipped_path} ({reason})", file=report)
+        try:
+            coverage = (open(args.coverage_report, "w", encoding="utf-8")
+                        if args.coverage_report else contextlib.nullcontext())
+            with coverage as coverage_file:
+                report_corpus_coverage(scan, tables, args.jobs, disk_cache,
+                                       None if args.quiet else report, coverage_file)
+        except OSError as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            return 1
+
+    if not args.quiet:
+        fonts = font_cache_info()
+        glyphs = glyph_cache_info()
+        print(f"フォントキャッシュ: ヒット {fonts['hits']} 回 / ミス {fonts['misses']} 回, "
+              f"グリフキャッシュ: ヒット {glyphs['hits']} 回 / ミス {glyphs['misses']} 回, "
+              f"cmap に無いため描画しなかった文字: {glyphs['unsupported']} 回",
+              file=report)
+        if disk_cache is not None:
+            print(f"ディスクキャッシュ ({disk_cache.cache_dir}): ヒット {disk_cache.hits} 文字 / "
+                  f"ミス {disk_cache.misses} 文字", file=report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
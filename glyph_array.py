@@ -0,0 +1,299 @@
+import perf_stats
+from font_blob import BLANK_SLOT, finish_blob, start_blob
+from font_engine import iter_charset_bits
+from font_layout import layout_info
+
+# 文字セット全体を1つの NumPy 配列として扱う一括処理 (NumPy がある場合だけ使えます)。
+# 描画済みのビット列を (文字数, 高さ, 幅) の uint8 配列 (0/1) にまとめ、レイアウトへの詰め替え・
+# 転置・重複の検出・C言語と .bin への書き出しを、1文字ずつではなく配列に対してまとめて行います。
+# 出力は font_layout.pack_glyph() / c_emitter.write_c_array() / font_blob.write_blob() と
+# 1バイトも違わない内容になります。
+# NumPy が無い場合 (Pillow だけの環境) は、呼び出し側が従来の1文字ずつの処理を使います。
+# NumPy の読み込みには数十ミリ秒かかるので、一括処理を使うときに初めて読み込みます。
+# 大きな文字セットでもメモリの使用量が増えず、描画と書き出しが重なるように、
+# 描画・詰め替え・書き出しは ARRAY_CHUNK 文字ずつの配列に分けて行います。
+
+# まだ NumPy を読み込んでいない場合、これより文字数が少ないテーブルは1文字ずつ処理する
+# (読み込む時間の方が、一括処理で短くなる時間より長いため)
+ARRAY_MIN_CHARS = 1024
+
+# 一度に描画・詰め替え・書き出しを行う文字数
+ARRAY_CHUNK = 256
+
+np = None
+_numpy_checked = False
+
+
+def available():
+    """
+    NumPy が使えるかを返します (初めて呼ばれたときに NumPy を読み込みます)。
+    """
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np is not None
+
+
+def use_for(count):
+    """
+    count 文字のテーブルを一括処理で書き出すかを返します。
+    """
+    if not _numpy_checked and count < ARRAY_MIN_CHARS:
+        return False
+    return available()
+
+
+def bits_to_array(glyphs, width, height):
+    """
+    render_glyph_bits() 形式のビット列のリストを (文字数, 高さ, 幅) の uint8 配列 (0/1) にします。
+    """
+    stride = (width + 7) // 8
+    packed = np.frombuffer(b"".join(glyphs), dtype=np.uint8).reshape(len(glyphs), height, stride)
+    return np.unpackbits(packed, axis=2)[:, :, :width]
+
+
+def iter_glyph_arrays(chars, font_path, size, jobs=None, disk_cache=None, chunk=None):
+    """
+    文字セットを描画し、chunk 文字 (既定は ARRAY_CHUNK) ずつ配列にまとめて返すジェネレータです。
+    描画とキャッシュは iter_charset_bits() と同じです (引数も同じです)。
+    iter_charset_bits() が描画し終えた文字から順にまとめるので、受け取った側は
+    全体の描画を待たずに書き出しを始められます。
+
+    Yields:
+        tuple: (文字のリスト, (文字数, size, size) の uint8 配列, フォントにある文字かを表す
+            bool のリスト)。フォントに無い文字のグリフは全て0になります。
+    """
+    chunk = chunk or ARRAY_CHUNK
+    blank = bytes(((size + 7) // 8) * size)
+    chunk_chars = []
+    glyphs = []
+    present = []
+    for char, data in zip(chars, iter_charset_bits(chars, font_path, size, jobs, disk_cache)):
+        chunk_chars.append(char)
+        present.append(data is not None)
+        glyphs.append(blank if data is None else data)
+        if len(glyphs) == chunk:
+            with perf_stats.stage("pack"):
+                pixels = bits_to_array(glyphs, size, size)
+            yield chunk_chars, pixels, present
+            chunk_chars, glyphs, present = [], [], []
+    if glyphs:
+        with perf_stats.stage("pack"):
+            pixels = bits_to_array(glyphs, size, size)
+        yield chunk_chars, pixels, present
+
+
+def _pack_last_axis(bits, reverse):
+    # 最後の軸の8要素ずつを1バイトに詰める (reverse の場合は先頭を LSB にする)
+    return np.packbits(bits, axis=-1, bitorder="little" if reverse else "big")
+
+
+def _pad_axis(pixels, axis, length):
+    if pixels.shape[axis] == length:
+        return pixels
+    pad = [(0, 0)] * pixels.ndim
+    pad[axis] = (0, length - pixels.shape[axis])
+    return np.pad(pixels, pad)
+
+
+def pack_glyph_array(pixels, layout, reverse_bits=False, mirror=False):
+    """
+    (文字数, 高さ, 幅) の配列を、レイアウトの要素値の配列 (文字数, 要素数) に詰め替えます。
+    1文字ごとの結果は font_layout.pack_glyph() と同じです (row16 は uint16、それ以外は uint8)。
+    """
+    with perf_stats.stage("pack"):
+        return _pack_glyph_array(pixels, layout, reverse_bits, mirror)
+
+
+def _pack_glyph_array(pixels, layout, reverse_bits, mirror):
+    count, height, width = pixels.shape
+    info = layout_info(layout, width, height)
+    if mirror:
+        pixels = pixels[:, :, ::-1]
+    if layout == "pixel":
+        return pixels.reshape(count, height * width)
+    if layout == "row8":
+        return _pack_last_axis(_pad_axis(pixels, 2, 8), reverse_bits).reshape(count, height)
+    if layout == "row16":
+        # row16 の反転は16ビット全体の反転なので、左端が下位バイトの最下位ビットになる
+        halves = _pack_last_axis(_pad_axis(pixels, 2, 16), reverse_bits).astype(np.uint16)
+        if reverse_bits:
+            return halves[:, :, 0] | (halves[:, :, 1] << 8)
+        return (halves[:, :, 0] << 8) | halves[:, :, 1]
+    if layout == "packed":
+        flat = _pad_axis(pixels.reshape(count, height * width), 1, info["bytes"] * 8)
+        return _pack_last_axis(flat, reverse_bits)
+
+    # vpage / column は高さを8の倍数にして、縦8ピクセルを1バイトにする
+    pages = (height + 7) // 8
+    columns = _pad_axis(pixels, 1, pages * 8).reshape(count, pages, 8, width)
+    if layout == "vpage":
+        # ページ -> 列の順。ページ内の一番上の行を LSB にする (反転時は MSB)
+        return _pack_last_axis(columns.transpose(0, 1, 3, 2), not reverse_bits).reshape(
+            count, pages * width)
+    # column: 列 -> ページの順。一番上の行を MSB にする (反転時は LSB)
+    return _pack_last_axis(columns.transpose(0, 3, 1, 2), reverse_bits).reshape(
+        count, width * pages)
+
+
+def dedup_glyph_array(packed, elide_blank=True, seen=None):
+    """
+    詰め替えた配列から同じグリフを探し、glyph_dedup.GlyphDeduplicator と同じスロットを求めます。
+    文字セットを分けて処理する場合は、同じ seen を続けて渡すと前の分と同じグリフも見つけます。
+
+    Args:
+        seen (dict): 格納済みのグリフのバイト列 -> スロット。新しいグリフを追加します。
+
+    Returns:
+        tuple: (新しく格納するグリフの番号の配列 (初めて現れた順),
+            グリフ番号 -> スロットのリスト (空白は None))
+    """
+    with perf_stats.stage("dedup"):
+        return _dedup_glyph_array(packed, elide_blank, {} if seen is None else seen)
+
+
+def _dedup_glyph_array(packed, elide_blank, seen):
+    count = len(packed)
+    rows = np.arange(count)
+    if elide_blank:
+        rows = rows[packed.any(axis=1)]
+    if not len(rows):
+        return rows, [None] * count
+    _, first, inverse = np.unique(packed[rows], axis=0, return_index=True, return_inverse=True)
+    # np.unique は値の順に並べるので、初めて現れた順に seen と照らしてスロットを決める
+    renumber = np.empty(len(first), dtype=np.int64)
+    new_rows = []
+    for group in np.argsort(first, kind="stable").tolist():
+        row = int(rows[first[group]])
+        key = packed[row].tobytes()
+        slot = seen.get(key)
+        if slot is None:
+            slot = seen[key] = len(seen)
+            new_rows.append(row)
+        renumber[group] = slot
+    slots = [None] * count
+    for row, slot in zip(rows.tolist(), renumber[inverse.reshape(-1)].tolist()):
+        slots[row] = slot
+    return np.array(new_rows, dtype=np.int64), slots
+
+
+def _hex_values(packed):
+    # 全ての要素を "0xAB, " の形式で連結した文字列と、1要素あたりの文字数を返す
+    digits = packed.dtype.itemsize * 2
+    data = packed.astype(f">u{packed.dtype.itemsize}").tobytes()
+    text = "0x" + data.hex(" ", packed.dtype.itemsize).upper().replace(" ", ", 0x")
+    return text, digits + 4
+
+
+def _pixel_blocks(pixels):
+    # pixel レイアウトの1文字分の初期化子 ("{" の行, 高さ分の行, "}" の行) を全ての文字について作る
+    count, height, width = pixels.shape
+    cells = np.empty((count, height, width, 3), dtype=np.uint8)
+    cells[..., 0] = pixels + ord("0")
+    cells[..., 1] = ord(",")
+    cells[..., 2] = ord(" ")
+    lines = np.concatenate([
+        np.broadcast_to(np.frombuffer(b"        {", dtype=np.uint8), (count, height, 9)),
+        cells.reshape(count, height, width * 3)[:, :, :-2],
+        np.broadcast_to(np.frombuffer(b"},\n", dtype=np.uint8), (count, height, 3)),
+    ], axis=2)
+    text = lines.tobytes().decode("ascii")
+    size = lines.shape[1] * lines.shape[2]
+    # 最後の行の ",\n" を除いて閉じる
+    return ["    {\n" + text[i * size:(i + 1) * size - 2] + "\n    }" for i in range(count)]
+
+
+def write_c_array_from_chunks(out, array_name, chunks, width, height, layout, count=None):
+    """
+    詰め替えた配列を、c_emitter.write_c_array() と同じ内容の C言語配列として out に書き出します。
+    chunks を受け取るたびに整形して書き出すので、文字セット全体の文字列は作りません。
+
+    Args:
+        chunks: (文字ごとのコメントに書く文字列のリスト, pack_glyph_array() の結果) を
+            順に返すイテラブル。
+        count (int): 配列の大きさとして書く文字数 (None の場合は省略します)。
+
+    Returns:
+        int: 書き出した文字数 (0 の場合は何も書き出しません)
+    """
+    info = layout_info(layout, width, height)
+    timer = perf_stats.laps(array_name)
+    first_dim = "" if count is None else count
+    if layout == "pixel":
+        dims = f"[{first_dim}][{height}][{width}]"
+        separator = ",\n\n"
+    else:
+        dims = f"[{first_dim}][{info['elements']}]"
+        separator = ",\n"
+    written = 0
+    for labels, packed in chunks:
+        if not len(labels):
+            continue
+        timer.start()
+        if layout == "pixel":
+            blocks = _pixel_blocks(packed.reshape(len(labels), height, width))
+        else:
+            text, token = _hex_values(packed)
+            length = info["elements"] * token
+            blocks = [f"    {{{text[i * length:(i + 1) * length - 2]}}}"
+                      for i in range(len(labels))]
+        text = separator.join(f"    // {label}\n{block}" for label, block in zip(labels, blocks))
+        timer.lap("format")
+        out.write(separator if written else f"const {info['ctype']} {array_name}{dims} = {{\n")
+        out.write(text)
+        timer.lap("write")
+        written += len(labels)
+    if written:
+        out.write("\n};")
+    return written
+
+
+def write_blob_chunks(out, chunks, width, height, layout, reverse_bits=False, mirror=False,
+                      digest=None, dedup=False):
+    """
+    詰め替えた配列を、font_blob.write_blob() と同じ内容の .bin 形式で out に書き出します。
+    chunks を受け取るたびにビットマップを書き出し、索引は最後にまとめて書きます。
+
+    Args:
+        chunks: (文字のリスト, フォントにある文字かを表す bool のリスト,
+            pack_glyph_array() の結果) を順に返すイテラブル。
+            フォントに無い文字は索引に含めません。
+        その他の引数は write_blob() と同じです。
+
+    Returns:
+        tuple: (索引に入れた文字数, ビットマップに格納したグリフ数)
+    """
+    timer = perf_stats.laps(None)
+    start_blob(out)
+    index = {}
+    seen = {}
+    stored = 0
+    for chars, present, packed in chunks:
+        timer.start()
+        # 索引に入れる行 (フォントにあり、同じ文字が先に現れていないもの)
+        rows = []
+        for row, char in enumerate(chars):
+            if present[row] and ord(char) not in index:
+                index[ord(char)] = None
+                rows.append(row)
+        packed = packed[rows]
+        if dedup:
+            stored_rows, slots = dedup_glyph_array(packed, seen=seen)
+            slots = [BLANK_SLOT if slot is None else slot for slot in slots]
+            packed = packed[stored_rows]
+        else:
+            slots = range(stored, stored + len(rows))
+        for row, slot in zip(rows, slots):
+            index[ord(chars[row])] = slot
+        # row16 はリトルエンディアン、それ以外は1要素1バイト
+        out.write(packed.astype("<u2" if layout == "row16" else np.uint8).tobytes())
+        stored += len(packed)
+        timer.lap("write")
+    finish_blob(out, index, stored, width, height, layout, reverse_bits, mirror, digest)
+    timer.lap("write")
+    return len(index), stored
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import struct
+import tempfile
+
+# キャッシュファイルの形式
+#   ヘッダ : マジック "F2BG", 形式バージョン (uint8), グリフサイズ (uint16), 件数 (uint32)
+#   レコード: 文字のUTF-8バイト長 (uint8), 文字 (UTF-8), グリフの有無 (uint8), ビット列 (有る場合)
+#   末尾   : 先頭から末尾直前までの SHA-256 (32バイト)。読み込み時に照合します
+_MAGIC = b"F2BG"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sBHI")
+
+# 描画方法を変えた場合はこの値を変えて、古いキャッシュを使わないようにする
+RENDER_OPTIONS = "center-v1"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# (フォントパス, 更新時刻, ファイルサイズ) -> SHA-256
+_font_hashes = {}
+
+
+def default_cache_dir():
+    """
+    既定のキャッシュディレクトリを返します。環境変数 FONT_TO_BIN_CACHE_DIR で変更できます。
+    """
+    path = os.environ.get("FONT_TO_BIN_CACHE_DIR")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "font_to_bin")
+
+
+def font_sha256(font_path):
+    """
+    フォントファイルの内容の SHA-256 を返します。同じファイルは1回だけ読み込みます。
+    """
+    try:
+        st = os.stat(font_path)
+    except OSError:
+        raise FileNotFoundError(f"フォントファイルが見つかりません: {font_path}")
+    key = (os.path.abspath(font_path), st.st_mtime_ns, st.st_size)
+    digest = _font_hashes.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(font_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = _font_hashes[key] = h.hexdigest()
+    return digest
+
+
+class GlyphDiskCache:
+    """
+    描画済みグリフをディスクに保存する永続キャッシュ。
+    (フォントの SHA-256, サイズ, 描画オプション) ごとに1ファイルを使い、
+    合計サイズが max_bytes を超えると最も長く使われていないファイルから削除します。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # ファイルパス -> {文字: ビット列}
+        self._loaded = {}
+
+    def _path(self, font_path, size):
+        name = f"{font_sha256(font_path)}-{size}-{RENDER_OPTIONS}.glyphs"
+        return os.path.join(self.cache_dir, name)
+
+    def _read(self, path, size):
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except OSError:
+            return {}
+
+        body, digest = blob[:-32], blob[-32:]
+        if len(blob) < _HEADER.size + 32 or hashlib.sha256(body).digest() != digest:
+            # 壊れたキャッシュは捨てて描画し直す
+            self._remove(path)
+            return {}
+        magic, version, glyph_size, count = _HEADER.unpack_from(body)
+        if magic != _MAGIC or version != _FORMAT_VERSION or glyph_size != size:
+            self._remove(path)
+            return {}
+
+        glyph_bytes = ((size + 7) // 8) * size
+        glyphs = {}
+        pos = _HEADER.size
+        for _ in range(count):
+            length = body[pos]
+            text = body[pos + 1:pos + 1 + length].decode("utf-8")
+            pos += 1 + length
+            present = body[pos]
+            pos += 1
+            if present:
+                glyphs[text] = body[pos:pos + glyph_bytes]
+                pos += glyph_bytes
+            else:
+                glyphs[text] = None
+
+        # 最後に使った時刻として更新時刻を記録する (削除の順序に使う)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return glyphs
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _glyphs(self, font_path, size):
+        path = self._path(font_path, size)
+        glyphs = self._loaded.get(path)
+        if glyphs is None:
+            glyphs = self._loaded[path] = self._read(path, size)
+        return path, glyphs
+
+    def lookup(self, texts, font_path, size):
+        """
+        キャッシュにある文字のビット列を {文字: ビット列} で返します。
+        (グリフが無いと記録されている文字の値は None です)
+        """
+        _, glyphs = self._glyphs(font_path, size)
+        found = {text: glyphs[text] for text in texts if text in glyphs}
+        self.hits += len(found)
+        self.misses += len(texts) - len(found)
+        return found
+
+    def store(self, rendered, font_path, size):
+        """
+        新しく描画したグリフ {文字: ビット列} をキャッシュファイルに追加します。
+        """
+        path, glyphs = self._glyphs(font_path, size)
+        new = {text: data for text, data in rendered.items() if glyphs.get(text, 0) != data}
+        if not new:
+            return
+        glyphs.update(new)
+
+        parts = [_HEADER.pack(_MAGIC, _FORMAT_VERSION, size, len(glyphs))]
+        for text in sorted(glyphs):
+            encoded = text.encode("utf-8")
+            data = glyphs[text]
+            parts.append(bytes((len(encoded),)) + encoded)
+            parts.append(b"\x00" if data is None else b"\x01" + data)
+        body = b"".join(parts)
+
+        # キャッシュへの書き込みに失敗しても生成自体は続けられるので、エラーにはしない
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # 書き込み途中のファイルを読まないよう、一時ファイルに書いてから置き換える
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+                f.write(hashlib.sha256(body).digest())
+            os.replace(tmp_path, path)
+            self._evict(keep=path)
+        except OSError:
+            if tmp_path is not None:
+                self._remove(tmp_path)
+
+    def _evict(self, keep):
+        """
+        キャッシュディレクトリの合計サイズが上限を超えていれば、古いファイルから削除します。
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".glyphs") and entry.is_file():
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        for _, file_size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            self._loaded.pop(path, None)
+            total -= file_size
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses, "dir": self.cache_dir}
@@ -0,0 +1,371 @@
+import heapq
+from collections import Counter
+
+from c_emitter import format_c_accessor_macros
+from font_layout import layout_info, pack_glyph
+
+# グリフを1文字ずつ圧縮して格納する形式。ファームウェアでは <name>_decode(glyph, buf) で
+# 1文字分を buf (<NAME>_GLYPH_BYTES バイト) に展開してから使います。どちらの形式もメモリ確保は不要です。
+#   rle     : 行 (vpage は1バイト、column は1列) 単位のランレングス符号。ヘッダ1バイトの後に
+#             bit7=1 なら (下位7ビット + 1) 単位の0、bit7=0 なら続く1単位を (下位7ビット + 1) 回繰り返す。
+#             空白の行が多い表 (ASCII など) 向けで、展開が最も軽い
+#   huffman : 全グリフで共有する、バイト単位の正準ハフマン符号 (符号長は最大16ビット)。
+#             画数の多い漢字の表でも縮むが、展開は1ビットずつの処理になる
+# グリフごとの圧縮データは1バイト境界から始まり、位置は <name>_offsets に入ります。
+# 圧縮データが64KBを超える場合は、64文字ごとの先頭位置 <name>_offset_base (uint32_t) と、
+# そこからの差 <name>_offsets (uint16_t) に分けて位置の表を小さくします。
+COMPRESSIONS = ("none", "rle", "huffman")
+
+HUFFMAN_MAX_BITS = 16
+
+# <name>_offset_base の1要素が受け持つ文字数
+OFFSET_BLOCK = 64
+
+
+def check_layout(layout):
+    """
+    圧縮できるレイアウトか確認します。展開先が uint8_t の配列になるレイアウトだけが使えます。
+
+    Raises:
+        ValueError: 圧縮できないレイアウトの場合。
+    """
+    if layout in ("pixel", "row16"):
+        raise ValueError(
+            f"レイアウト {layout} は圧縮できません (row8, packed, vpage, column のいずれかを使ってください。"
+            "幅16の場合は packed が row16 と同じ並びになります)")
+
+
+def _unit_bytes(layout, width, height):
+    """
+    rle で繰り返しの単位にするバイト数を返します。
+    """
+    if layout == "packed" and width % 8 == 0:
+        return width // 8
+    if layout == "column":
+        return (height + 7) // 8
+    return 1
+
+
+def _rle_encode(data, unit):
+    out = bytearray()
+    pos = 0
+    zero = bytes(unit)
+    while pos < len(data):
+        chunk = data[pos:pos + unit]
+        run = 1
+        while run < 128 and data[pos + run * unit:pos + (run + 1) * unit] == chunk:
+            run += 1
+        if chunk == zero:
+            out.append(0x80 | (run - 1))
+        else:
+            out.append(run - 1)
+            out += chunk
+        pos += run * unit
+    return bytes(out)
+
+
+def _rle_decode(data, glyph_bytes, unit):
+    out = bytearray()
+    pos = 0
+    while len(out) < glyph_bytes:
+        header = data[pos]
+        pos += 1
+        run = (header & 0x7F) + 1
+        if header & 0x80:
+            out += bytes(unit * run)
+        else:
+            out += data[pos:pos + unit] * run
+            pos += unit
+    return bytes(out)
+
+
+def huffman_code_lengths(freq, max_bits=HUFFMAN_MAX_BITS):
+    """
+    {記号: 出現回数} からハフマン符号の符号長 {記号: ビット数} を求めます。
+    符号長が max_bits を超える場合は、出現回数をならしてから作り直します。
+    """
+    if len(freq) == 1:
+        return {symbol: 1 for symbol in freq}
+    while True:
+        heap = [(count, symbol, [symbol]) for symbol, count in freq.items()]
+        heapq.heapify(heap)
+        lengths = dict.fromkeys(freq, 0)
+        while len(heap) > 1:
+            count1, key1, symbols1 = heapq.heappop(heap)
+            count2, key2, symbols2 = heapq.heappop(heap)
+            for symbol in symbols1 + symbols2:
+                lengths[symbol] += 1
+            heapq.heappush(heap, (count1 + count2, min(key1, key2), symbols1 + symbols2))
+        if max(lengths.values()) <= max_bits:
+            return lengths
+        freq = {symbol: (count + 1) // 2 for symbol, count in freq.items()}
+
+
+def canonical_codes(lengths):
+    """
+    符号長から正準ハフマン符号を求め、({記号: (符号, ビット数)}, 符号長ごとの個数, 符号順の記号) を返します。
+    """
+    order = sorted(lengths, key=lambda symbol: (lengths[symbol], symbol))
+    counts = [0] * (HUFFMAN_MAX_BITS + 1)
+    codes = {}
+    code = 0
+    previous = 0
+    for symbol in order:
+        length = lengths[symbol]
+        code <<= length - previous
+        codes[symbol] = (code, length)
+        counts[length] += 1
+        code += 1
+        previous = length
+    return codes, counts, order
+
+
+def _huffman_encode(data, codes):
+    bits = 0
+    nbits = 0
+    for b in data:
+        code, length = codes[b]
+        bits = (bits << length) | code
+        nbits += length
+    pad = -nbits % 8
+    return (bits << pad).to_bytes((nbits + pad) // 8, "big"), nbits
+
+
+def _huffman_decode(data, glyph_bytes, counts, symbols):
+    out = bytearray()
+    bitpos = 0
+    while len(out) < glyph_bytes:
+        code = first = index = 0
+        for length in range(1, HUFFMAN_MAX_BITS + 1):
+            code |= (data[bitpos >> 3] >> (7 - (bitpos & 7))) & 1
+            bitpos += 1
+            count = counts[length]
+            if code - first < count:
+                out.append(symbols[index + code - first])
+                break
+            index += count
+            first = (first + count) << 1
+            code <<= 1
+    return bytes(out)
+
+
+def compress_glyphs(packed, mode, width, height, layout):
+    """
+    pack_glyph() で詰めたグリフ (バイト列) のリストを圧縮します。
+
+    Args:
+        packed (list): グリフごとのバイト列。
+        mode (str): "rle" または "huffman"。
+
+    Returns:
+        dict: {"mode", "unit", "data": 圧縮データ全体, "offsets": グリフごとの開始位置,
+               "counts"/"symbols": ハフマン符号の表 (huffman の場合),
+               "glyph_bytes", "worst_bytes": 1グリフの最大の圧縮サイズ,
+               "worst_steps": 1グリフの展開にかかる最大の処理回数 (rle はヘッダ数、huffman はビット数)}
+    """
+    check_layout(layout)
+    glyph_bytes = layout_info(layout, width, height)["bytes"]
+    unit = _unit_bytes(layout, width, height)
+    result = {"mode": mode, "unit": unit, "glyph_bytes": glyph_bytes,
+              "counts": None, "symbols": None}
+    encoded = []
+    steps = []
+    if mode == "rle":
+        for data in packed:
+            chunk = _rle_encode(data, unit)
+            encoded.append(chunk)
+            # ヘッダの数 = 展開ループの回数
+            pos = count = 0
+            while pos < len(chunk):
+                pos += 1 if chunk[pos] & 0x80 else 1 + unit
+                count += 1
+            steps.append(count)
+    elif mode == "huffman":
+        freq = Counter(b for data in packed for b in data)
+        codes, counts, symbols = canonical_codes(huffman_code_lengths(freq))
+        result["counts"] = counts
+        result["symbols"] = symbols
+        for data in packed:
+            chunk, nbits = _huffman_encode(data, codes)
+            encoded.append(chunk)
+            steps.append(nbits)
+    else:
+        raise ValueError(f"不明な圧縮形式です: {mode} (使える形式: {', '.join(COMPRESSIONS)})")
+
+    offsets = []
+    pos = 0
+    for chunk in encoded:
+        offsets.append(pos)
+        pos += len(chunk)
+    result["data"] = b"".join(encoded)
+    result["offsets"] = offsets
+    result["worst_bytes"] = max((len(chunk) for chunk in encoded), default=0)
+    result["worst_steps"] = max(steps, default=0)
+    return result
+
+
+def decode_glyph(compressed, glyph):
+    """
+    生成するC言語の展開関数と同じ方法で、glyph 番目のグリフを pack_glyph() のバイト列に戻します。
+    """
+    data = compressed["data"][compressed["offsets"][glyph]:]
+    if compressed["mode"] == "rle":
+        return _rle_decode(data, compressed["glyph_bytes"], compressed["unit"])
+    return _huffman_decode(data, compressed["glyph_bytes"], compressed["counts"],
+                           compressed["symbols"])
+
+
+def _offset_tables(compressed):
+    """
+    位置の表を (64文字ごとの先頭位置のリスト または None, グリフごとの位置, 要素型) で返します。
+    """
+    offsets = compressed["offsets"]
+    if len(compressed["data"]) <= 0xFFFF:
+        return None, offsets, "uint16_t"
+    bases = offsets[::OFFSET_BLOCK]
+    deltas = [offset - bases[i // OFFSET_BLOCK] for i, offset in enumerate(offsets)]
+    if max(deltas) <= 0xFFFF:
+        return bases, deltas, "uint16_t"
+    return None, offsets, "uint32_t"
+
+
+def compressed_size(compressed):
+    """
+    圧縮データ・グリフごとの位置・ハフマン符号の表を合わせたバイト数を返します。
+    """
+    bases, offsets, offset_type = _offset_tables(compressed)
+    size = len(compressed["data"])
+    size += len(offsets) * (2 if offset_type == "uint16_t" else 4)
+    if bases is not None:
+        size += len(bases) * 4
+    if compressed["mode"] == "huffman":
+        size += len(compressed["counts"]) * 2 + len(compressed["symbols"])
+    return size
+
+
+def compress_report(array_name, compressed):
+    """
+    圧縮率と、1グリフの展開にかかる最悪の場合の処理量を文字列で返します。
+    """
+    count = len(compressed["offsets"])
+    raw = count * compressed["glyph_bytes"]
+    total = compressed_size(compressed)
+    ratio = total / raw * 100 if raw else 0
+    step_unit = "ヘッダ" if compressed["mode"] == "rle" else "ビット"
+    return (f"{array_name}: {compressed['mode']} 圧縮 {raw}バイト -> {total}バイト "
+            f"(位置・符号表を含む, {ratio:.1f}%), 展開は最悪の場合1グリフあたり "
+            f"入力 {compressed['worst_bytes']}バイト / {compressed['worst_steps']}{step_unit}")
+
+
+def _write_bytes(out, values, per_line=16):
+    lines = []
+    for i in range(0, len(values), per_line):
+        lines.append("    " + ", ".join(f"0x{v:02X}" for v in values[i:i + per_line]))
+    out.write(",\n".join(lines) + "\n")
+
+
+def write_c_compressed(out, title, array_name, glyphs, width, height, layout,
+                       reverse_bits=False, mirror=False, mode="rle"):
+    """
+    グリフを圧縮し、圧縮データ・グリフごとの位置・展開関数を C言語のソースとして out に書き出します。
+    展開関数 void <array_name>_decode(uint32_t glyph, uint8_t *buf) は、glyph 番目のグリフを
+    圧縮しない場合と同じ並びで buf に展開します。<NAME>_PIXEL(buf, x, y) でピクセルを取り出せます。
+
+    Args:
+        glyphs: (コメントに書く文字, ビット列) を順に返すイテラブル。
+        mode (str): "rle" または "huffman"。
+        その他の引数は c_emitter.write_c_source() と同じです。
+
+    Returns:
+        dict: compress_glyphs() の結果 (グリフが1つも無い場合は None で、何も書き出しません)
+    """
+    check_layout(layout)
+    labels = []
+    packed = []
+    for label, data in glyphs:
+        labels.append(label)
+        packed.append(bytes(pack_glyph(data, width, height, layout, reverse_bits, mirror)))
+    if not packed:
+        return None
+    compressed = compress_glyphs(packed, mode, width, height, layout)
+    prefix = array_name.upper()
+    bases, offsets, offset_type = _offset_tables(compressed)
+
+    out.write(f"// --- {title} ---\n")
+    out.write(format_c_accessor_macros(array_name, width, height, layout, reverse_bits, mirror,
+                                       buffer=True))
+    out.write(f"#define {prefix}_COMPRESSION_{mode.upper()} 1\n")
+    out.write(f"#define {prefix}_COUNT {len(packed)}\n\n")
+
+    out.write(f"static const uint8_t {array_name}_data[{len(compressed['data'])}] = {{\n")
+    _write_bytes(out, compressed["data"])
+    out.write("};\n\n")
+    if bases is not None:
+        out.write(f"static const uint32_t {array_name}_offset_base[{len(bases)}] = {{\n")
+        lines = []
+        for i in range(0, len(bases), 8):
+            lines.append("    " + ", ".join(f"0x{v:08X}" for v in bases[i:i + 8]))
+        out.write(",\n".join(lines) + "\n};\n")
+        source = (f"{array_name}_data + {array_name}_offset_base[glyph / {OFFSET_BLOCK}] + "
+                  f"{array_name}_offsets[glyph]")
+    else:
+        source = f"{array_name}_data + {array_name}_offsets[glyph]"
+    out.write(f"static const {offset_type} {array_name}_offsets[{len(packed)}] = {{\n")
+    digits = 4 if offset_type == "uint16_t" else 8
+    for i, (label, offset) in enumerate(zip(labels, offsets)):
+        separator = "," if i + 1 < len(packed) else ""
+        out.write(f"    0x{offset:0{digits}X}{separator} // {label}\n")
+    out.write("};\n\n")
+
+    glyph_bytes = compressed["glyph_bytes"]
+    unit = compressed["unit"]
+    out.write(f"// Decodes glyph into buf ({prefix}_GLYPH_BYTES bytes, same layout as the "
+              f"uncompressed table).\n"
+              f"void {array_name}_decode(uint32_t glyph, uint8_t *buf)\n{{\n"
+              f"    const uint8_t *src = {source};\n"
+              f"    uint32_t pos = 0;\n")
+    if mode == "rle":
+        out.write(f"    uint32_t run, i;\n"
+                  f"    while (pos < {glyph_bytes}) {{\n"
+                  f"        uint8_t header = *src++;\n"
+                  f"        run = (uint32_t)(header & 0x7F) + 1;\n"
+                  f"        if (header & 0x80) {{\n"
+                  f"            for (i = 0; i < run * {unit}; i++) {{\n"
+                  f"                buf[pos++] = 0;\n"
+                  f"            }}\n"
+                  f"        }} else {{\n"
+                  f"            for (; run > 0; run--) {{\n"
+                  f"                for (i = 0; i < {unit}; i++) {{\n"
+                  f"                    buf[pos++] = src[i];\n"
+                  f"                }}\n"
+                  f"            }}\n"
+                  f"            src += {unit};\n"
+                  f"        }}\n"
+                  f"    }}\n}}\n")
+    else:
+        counts = ", ".join(str(c) for c in compressed["counts"])
+        out.write(f"    uint32_t bitpos = 0;\n"
+                  f"    static const uint16_t counts[{HUFFMAN_MAX_BITS + 1}] = {{{counts}}};\n"
+                  f"    static const uint8_t symbols[{len(compressed['symbols'])}] = {{\n")
+        lines = []
+        for i in range(0, len(compressed["symbols"]), 16):
+            lines.append("        " + ", ".join(
+                f"0x{v:02X}" for v in compressed["symbols"][i:i + 16]))
+        out.write(",\n".join(lines) + "\n    };\n")
+        out.write(f"    while (pos < {glyph_bytes}) {{\n"
+                  f"        int32_t code = 0, first = 0, index = 0, count;\n"
+                  f"        uint32_t length;\n"
+                  f"        for (length = 1; length <= {HUFFMAN_MAX_BITS}; length++) {{\n"
+                  f"            code |= (src[bitpos >> 3] >> (7 - (bitpos & 7))) & 1;\n"
+                  f"            bitpos++;\n"
+                  f"            count = counts[length];\n"
+                  f"            if (code - first < count) {{\n"
+                  f"                buf[pos++] = symbols[index + code - first];\n"
+                  f"                break;\n"
+                  f"            }}\n"
+                  f"            index += count;\n"
+                  f"            first = (first + count) << 1;\n"
+                  f"            code <<= 1;\n"
+                  f"        }}\n"
+                  f"    }}\n}}\n")
+    return compressed
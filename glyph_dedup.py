@@ -0,0 +1,110 @@
+# 同じビットマップのグリフを1つにまとめ、空白のグリフを格納しないための処理。
+# 配列には固有のグリフだけを並べ、文字の並び (グリフ番号) から配列内の位置 (スロット) を
+# 引くための変換表 <name>_glyph_map を別に出力します。
+# 空白のグリフ (全て0。フォントに無い文字を含む) は配列に入れず、スロットを BLANK にします。
+# (コードポイントの検索表 (glyph_lookup.py) も出力する場合は、検索表が直接スロットを返すので
+# 変換表は不要です)
+
+
+class GlyphDeduplicator:
+    """
+    グリフを1文字ずつ受け取り、初めて現れたビットマップだけを通すフィルタ。
+    受け取った全ての文字のスロットを slots に記録します (空白は None)。
+
+    使い方:
+        dedup = GlyphDeduplicator()
+        write_c_array(out, name, dedup.filter(glyphs), ...)
+        dedup.slots  # グリフ番号 -> スロット
+    """
+
+    def __init__(self, elide_blank=True):
+        self.elide_blank = elide_blank
+        self.slots = []
+        self.unique = 0
+        self.duplicates = 0
+        self.blanks = 0
+        # ビットマップ -> スロット
+        self._seen = {}
+
+    @classmethod
+    def from_slots(cls, slots, elide_blank=True):
+        """
+        まとめて求めたスロット (glyph_array.dedup_glyph_array() の結果) から作ります。
+        """
+        dedup = cls(elide_blank)
+        dedup.slots = list(slots)
+        dedup.blanks = dedup.slots.count(None)
+        dedup.unique = len(set(dedup.slots) - {None})
+        dedup.duplicates = len(dedup.slots) - dedup.blanks - dedup.unique
+        return dedup
+
+    def filter(self, glyphs):
+        """
+        (ラベル, ビット列) の並びから、固有のグリフだけを順に返すジェネレータです。
+        """
+        for label, data in glyphs:
+            if self.elide_blank and not any(data):
+                self.slots.append(None)
+                self.blanks += 1
+                continue
+            slot = self._seen.get(data)
+            if slot is not None:
+                self.slots.append(slot)
+                self.duplicates += 1
+                continue
+            slot = self._seen[data] = self.unique
+            self.unique += 1
+            self.slots.append(slot)
+            yield label, data
+
+
+def map_ctype(unique):
+    """
+    変換表の要素型と BLANK の値を返します (BLANK は要素型の最大値)。
+    """
+    if unique < 0xFF:
+        return "uint8_t", 0xFF
+    if unique < 0xFFFF:
+        return "uint16_t", 0xFFFF
+    return "uint32_t", 0xFFFFFFFF
+
+
+def write_c_glyph_map(out, array_name, dedup):
+    """
+    グリフ番号からスロットを引く変換表と、関連するマクロを C言語のソースとして out に書き出します。
+    <NAME>_GLYPH_SLOT(index) が <NAME>_BLANK の場合、その文字は何も描かない空白です。
+    """
+    prefix = array_name.upper()
+    ctype, blank = map_ctype(dedup.unique)
+    digits = len(f"{blank:X}")
+    values = [blank if slot is None else slot for slot in dedup.slots]
+    out.write(f"// {array_name}_glyph_map: glyph index -> slot in {array_name} "
+              f"({dedup.unique} unique glyphs, {prefix}_BLANK = blank glyph)\n")
+    out.write(f"#define {prefix}_BLANK 0x{blank:X}\n")
+    out.write(f"#define {prefix}_GLYPH_SLOT(index) ({array_name}_glyph_map[(index)])\n")
+    out.write(f"const {ctype} {array_name}_glyph_map[{len(values)}] = {{\n")
+    lines = []
+    for i in range(0, len(values), 12):
+        lines.append("    " + ", ".join(f"0x{v:0{digits}X}" for v in values[i:i + 12]))
+    out.write(",\n".join(lines) + "\n};\n")
+
+
+def glyph_map_bytes(dedup):
+    """
+    write_c_glyph_map() で出力する変換表のバイト数を返します。
+    """
+    ctype = map_ctype(dedup.unique)[0]
+    return len(dedup.slots) * {"uint8_t": 1, "uint16_t": 2, "uint32_t": 4}[ctype]
+
+
+def dedup_report(array_name, dedup, glyph_bytes, map_bytes):
+    """
+    重複の除去と空白の省略で節約できたバイト数 (変換表 map_bytes の分を差し引いたもの) を文字列で返します。
+    """
+    before = len(dedup.slots) * glyph_bytes
+    after = dedup.unique * glyph_bytes + map_bytes
+    saved = before - after
+    result = f"{saved}バイト削減" if saved >= 0 else f"{-saved}バイト増加"
+    return (f"{array_name}: 重複 {dedup.duplicates}文字・空白 {dedup.blanks}文字を除き "
+            f"固有グリフ {dedup.unique}個, {before}バイト -> {after}バイト "
+            f"(変換表 {map_bytes}バイトを含む, {result})")
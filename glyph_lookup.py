@@ -0,0 +1,179 @@
+import bisect
+
+# Unicode のコードポイントから配列内のグリフ番号を求めるための検索表。
+#   範囲表   : コードポイントとグリフ番号が両方とも1ずつ増える連続区間 (先頭, 長さ, 先頭のグリフ番号)
+#   個別の表 : 範囲にならなかった文字の (コードポイント, グリフ番号) をコードポイント順に並べたもの
+# どちらもコードポイント順なので、ファームウェア側では二分探索で O(log n) で引けます。
+# 重複を除いた配列 (glyph_dedup.py) の場合は、グリフ番号の代わりに配列内のスロットを直接引けるようにし、
+# 変換表を省きます。空白のグリフは BLANK を返します。
+
+
+def _ctype(max_value):
+    return ("uint16_t", 2) if max_value <= 0xFFFF else ("uint32_t", 4)
+
+
+def _blank_value(count):
+    # グリフ番号として使われない値。int32_t の戻り値で -1 と区別できるようにする
+    return 0xFFFF if _ctype(count)[1] == 2 else 0x7FFFFFFF
+
+
+def build_lookup(chars, slots=None):
+    """
+    配列に並べた順の文字列 (またはコードポイントのリスト) から検索表を作ります。
+
+    Args:
+        chars: 先頭から順に並んだ文字 (グリフ番号 = 位置)。同じ文字は最初の位置を使います。
+        slots (list): 指定した場合、グリフ番号の代わりに引く値 (GlyphDeduplicator.slots)。
+            None の要素は空白のグリフとして lookup["blank"] の値になります。
+
+    Returns:
+        dict: {"ranges": [(先頭, 長さ, グリフ番号)], "singles": [(コードポイント, グリフ番号)],
+               "count": 文字数, "max_codepoint": 最大のコードポイント,
+               "blank": 空白の値 (slots を指定した場合。それ以外は None)}
+    """
+    blank = _blank_value(len(chars)) if slots is not None else None
+    pairs = {}
+    for index, char in enumerate(chars):
+        if slots is not None:
+            index = blank if slots[index] is None else slots[index]
+        pairs.setdefault(char if isinstance(char, int) else ord(char), index)
+    entries = sorted(pairs.items())
+    max_codepoint = entries[-1][0] if entries else 0
+    cp_bytes = _ctype(max_codepoint)[1]
+    index_bytes = _ctype(len(chars))[1]
+    range_bytes = cp_bytes + index_bytes * 2
+    single_bytes = cp_bytes + index_bytes
+
+    # 連続区間に分ける
+    runs = []
+    for codepoint, index in entries:
+        if runs and index != blank and codepoint == runs[-1][0] + runs[-1][1] \
+                and index == runs[-1][2] + runs[-1][1]:
+            runs[-1][1] += 1
+        else:
+            runs.append([codepoint, 1, index])
+
+    # 範囲表に入れた方が小さくなる区間だけを範囲にする
+    ranges = []
+    singles = []
+    for first, length, index in runs:
+        if range_bytes < single_bytes * length:
+            ranges.append((first, length, index))
+        else:
+            singles.extend((first + i, index + i) for i in range(length))
+    return {"ranges": ranges, "singles": singles, "count": len(chars),
+            "max_codepoint": max_codepoint, "blank": blank}
+
+
+def lookup_index(lookup, codepoint):
+    """
+    生成するC言語の検索関数と同じ方法でグリフ番号を求めます。収録されていない場合は -1 を返します。
+    """
+    ranges = lookup["ranges"]
+    pos = bisect.bisect_right(ranges, (codepoint, float("inf"))) - 1
+    if pos >= 0:
+        first, length, index = ranges[pos]
+        if codepoint - first < length:
+            return index + (codepoint - first)
+    singles = lookup["singles"]
+    pos = bisect.bisect_left(singles, (codepoint, -1))
+    if pos < len(singles) and singles[pos][0] == codepoint:
+        return singles[pos][1]
+    return -1
+
+
+def lookup_size(lookup):
+    """
+    検索表のバイト数を (範囲表, 個別の表) で返します。
+    """
+    cp_bytes = _ctype(lookup["max_codepoint"])[1]
+    index_bytes = _ctype(lookup["count"])[1]
+    return (len(lookup["ranges"]) * (cp_bytes + index_bytes * 2),
+            len(lookup["singles"]) * (cp_bytes + index_bytes))
+
+
+def lookup_report(array_name, lookup):
+    """
+    検索表の大きさを、コードポイントとグリフ番号を全て並べた単純な表と比較した文字列で返します。
+    """
+    range_total, single_total = lookup_size(lookup)
+    total = range_total + single_total
+    flat = lookup["count"] * (_ctype(lookup["max_codepoint"])[1] + _ctype(lookup["count"])[1])
+    ratio = total / flat * 100 if flat else 0
+    return (f"{array_name}_lookup: 範囲 {len(lookup['ranges'])}個 ({range_total}バイト) + "
+            f"個別 {len(lookup['singles'])}文字 ({single_total}バイト) = {total}バイト "
+            f"(全文字を並べた表 {flat}バイトの {ratio:.1f}%)")
+
+
+def _format_values(values, per_line=12):
+    lines = []
+    for i in range(0, len(values), per_line):
+        lines.append("    " + ", ".join(f"0x{v:04X}" for v in values[i:i + per_line]))
+    return ",\n".join(lines)
+
+
+def write_c_lookup(out, array_name, lookup):
+    """
+    検索表と検索関数 int32_t <array_name>_lookup(uint32_t codepoint) を C言語のソースとして
+    out に書き出します。関数は配列内のグリフ番号を返し、収録されていない文字には -1 を返します。
+    (文字が1つも無い検索表は書き出せません)
+    build_lookup() に slots を指定した場合は、<NAME>_BLANK (空白のグリフ) も定義します。
+    """
+    cp_type = _ctype(lookup["max_codepoint"])[0]
+    index_type = _ctype(lookup["count"])[0]
+    ranges = lookup["ranges"]
+    singles = lookup["singles"]
+
+    out.write(f"// {array_name}_lookup: {len(ranges)} ranges + {len(singles)} single codepoints\n")
+    if lookup["blank"] is not None:
+        out.write(f"#define {array_name.upper()}_BLANK 0x{lookup['blank']:X}\n")
+    if ranges:
+        out.write(f"static const {cp_type} {array_name}_range_first[{len(ranges)}] = {{\n"
+                  f"{_format_values([r[0] for r in ranges])}\n}};\n")
+        out.write(f"static const {index_type} {array_name}_range_length[{len(ranges)}] = {{\n"
+                  f"{_format_values([r[1] for r in ranges])}\n}};\n")
+        out.write(f"static const {index_type} {array_name}_range_index[{len(ranges)}] = {{\n"
+                  f"{_format_values([r[2] for r in ranges])}\n}};\n")
+    if singles:
+        out.write(f"static const {cp_type} {array_name}_single_codepoint[{len(singles)}] = {{\n"
+                  f"{_format_values([s[0] for s in singles])}\n}};\n")
+        out.write(f"static const {index_type} {array_name}_single_index[{len(singles)}] = {{\n"
+                  f"{_format_values([s[1] for s in singles])}\n}};\n")
+
+    if lookup["blank"] is not None:
+        returns = (f"the slot of codepoint in {array_name} "
+                   f"({array_name.upper()}_BLANK for a blank glyph)")
+    else:
+        returns = f"the glyph index of codepoint in {array_name}"
+    out.write(f"\n// Returns {returns}, or -1 if it is not included.\n"
+              f"int32_t {array_name}_lookup(uint32_t codepoint)\n{{\n"
+              f"    uint32_t low, high, mid;\n")
+    if ranges:
+        out.write(f"    low = 0;\n"
+                  f"    high = {len(ranges)};\n"
+                  f"    while (low < high) {{\n"
+                  f"        mid = (low + high) / 2;\n"
+                  f"        if (codepoint < {array_name}_range_first[mid]) {{\n"
+                  f"            high = mid;\n"
+                  f"        }} else if (codepoint - {array_name}_range_first[mid] >= "
+                  f"{array_name}_range_length[mid]) {{\n"
+                  f"            low = mid + 1;\n"
+                  f"        }} else {{\n"
+                  f"            return (int32_t)({array_name}_range_index[mid] + "
+                  f"(codepoint - {array_name}_range_first[mid]));\n"
+                  f"        }}\n"
+                  f"    }}\n")
+    if singles:
+        out.write(f"    low = 0;\n"
+                  f"    high = {len(singles)};\n"
+                  f"    while (low < high) {{\n"
+                  f"        mid = (low + high) / 2;\n"
+                  f"        if (codepoint < {array_name}_single_codepoint[mid]) {{\n"
+                  f"            high = mid;\n"
+                  f"        }} else if (codepoint > {array_name}_single_codepoint[mid]) {{\n"
+                  f"            low = mid + 1;\n"
+                  f"        }} else {{\n"
+                  f"            return (int32_t){array_name}_single_index[mid];\n"
+                  f"        }}\n"
+                  f"    }}\n")
+    out.write("    return -1;\n}\n")
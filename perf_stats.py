@@ -0,0 +1,237 @@
+import contextlib
+import json
+import os
+import sys
+import time
+
+# 描画と出力の段階ごとの時間と回数を記録する、必要なときだけ有効にする計測の仕組み。
+# 段階はフォント (フォントパスとサイズ) や配列名などの対象ごとに集計します。
+#   font_load: ImageFont.truetype によるフォントの読み込み
+#   textbbox / draw_text / tobytes: 1文字の描画の各段階 (プロポーショナルは crop も)
+#   disk_cache_lookup / disk_cache_store: ディスクキャッシュの読み書き
+#   format / write: C言語の初期化子の整形と、出力ファイルへの書き込み
+#   pack / dedup: NumPy での一括の詰め替えと重複の検出
+#   file_commit: 出力ファイルの比較と置き換え
+#   table: 1つのテーブルの出力全体 (上の段階を含む)
+# 無効の場合は laps() が何もしないオブジェクトを返すので、描画の速さはほとんど変わりません。
+# --jobs で並列に描画した場合、ワーカープロセスでの描画の段階は記録されません
+# (メインプロセスでの待ち時間が table などに含まれます)。
+
+# 有効かどうか (描画処理などはこれを見て計測するかを決める)
+active = False
+
+# (段階, 対象) -> [回数, 合計秒数]
+_stages = {}
+# (カウンタ名, 対象) -> 値
+_counters = {}
+
+# 結果の JSON の形式バージョン
+TRACE_VERSION = 1
+
+
+def enable():
+    """
+    計測を有効にします。
+    """
+    global active
+    active = True
+
+
+def disable():
+    global active
+    active = False
+
+
+def reset():
+    """
+    記録した時間と回数を消します。
+    """
+    _stages.clear()
+    _counters.clear()
+
+
+def add(stage, key, seconds, count=1):
+    """
+    段階 stage (対象 key) に、seconds 秒と count 回を加えます。
+    """
+    entry = _stages.get((stage, key))
+    if entry is None:
+        entry = _stages[(stage, key)] = [0, 0.0]
+    entry[0] += count
+    entry[1] += seconds
+
+
+def count(counter, key, value=1):
+    """
+    カウンタ counter (対象 key) に value を加えます (無効の場合は何もしません)。
+    """
+    if active and value:
+        _counters[(counter, key)] = _counters.get((counter, key), 0) + value
+
+
+class _Laps:
+    # 直前の区切りからの時間を、lap() のたびに段階の時間として記録する
+    __slots__ = ("key", "last")
+
+    def __init__(self, key):
+        self.key = key
+        self.last = time.perf_counter()
+
+    def start(self):
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        add(stage, self.key, now - self.last)
+        self.last = now
+
+
+class _NullLaps:
+    __slots__ = ()
+
+    def start(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+
+_NULL_LAPS = _NullLaps()
+
+
+def laps(key):
+    """
+    処理の区切りごとに時間を記録するオブジェクトを返します (無効の場合は何もしないオブジェクト)。
+
+    使い方:
+        timer = perf_stats.laps((font_path, size))
+        bbox = draw.textbbox(...)
+        timer.lap("textbbox")   # laps() または直前の lap() からの時間を記録する
+    """
+    return _Laps(key) if active else _NULL_LAPS
+
+
+@contextlib.contextmanager
+def stage(name, key=None):
+    """
+    with ブロックの時間を段階 name (対象 key) として記録します (無効の場合は何もしません)。
+    """
+    if not active:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, key, time.perf_counter() - start)
+
+
+def key_label(key):
+    """
+    対象を表示用の文字列にします ((フォントパス, サイズ) は "ファイル名 サイズpx")。
+    """
+    if key is None:
+        return "-"
+    if isinstance(key, tuple):
+        return f"{os.path.basename(key[0])} {key[1]}px"
+    return str(key)
+
+
+def trace(wall=None):
+    """
+    記録した内容を JSON にできる辞書で返します。
+    """
+    return {
+        "version": TRACE_VERSION,
+        "command": sys.argv,
+        "wall_seconds": wall,
+        "stages": [{"stage": name, "key": key_label(key), "count": entry[0],
+                    "seconds": entry[1]}
+                   for (name, key), entry in sorted(_stages.items(), key=lambda i: -i[1][1])],
+        "counters": [{"counter": name, "key": key_label(key), "value": value}
+                     for (name, key), value in sorted(_counters.items(),
+                                                      key=lambda i: (i[0][0], key_label(i[0][1])))],
+    }
+
+
+def summary(wall=None):
+    """
+    記録した内容を、合計時間の長い順に並べた表の文字列で返します。
+    """
+    data = trace(wall)
+    lines = []
+    total = f" (実行時間 {wall:.3f}s)" if wall is not None else ""
+    lines.append(f"段階ごとの時間{total}")
+    # 全角の見出しは表示幅が2倍なので、空白の数で揃える
+    lines.append("段階" + " " * 16 + "対象" + " " * 30 + " " * 6 + "回数"
+                 + " " * 8 + "合計" + " " * 8 + "平均")
+    for item in data["stages"]:
+        average = item["seconds"] / item["count"] * 1000 if item["count"] else 0
+        lines.append(f"{item['stage']:<20}{item['key']:<34}{item['count']:>10}"
+                     f"{item['seconds'] * 1000:>10.2f}ms{average:>10.3f}ms")
+    if data["counters"]:
+        lines.append("カウンタ")
+        for item in data["counters"]:
+            lines.append(f"{item['counter']:<20}{item['key']:<34}{item['value']:>10}")
+    return "\n".join(lines)
+
+
+def add_arguments(parser):
+    """
+    計測のオプション (--timings, --trace, --cprofile) を argparse のパーサーに追加します。
+    """
+    group = parser.add_argument_group("計測")
+    group.add_argument("--timings", action="store_true",
+                       help="終了時に段階ごと・フォントごとの時間と回数の表を表示する")
+    group.add_argument("--trace", metavar="PATH",
+                       help="段階ごとの時間と回数を JSON で PATH に書き出す")
+    group.add_argument("--cprofile", metavar="PATH",
+                       help="cProfile で計測し、結果を PATH に保存する (python -m pstats PATH で確認できます)")
+
+
+@contextlib.contextmanager
+def session(timings=False, trace_path=None, cprofile_path=None, out=None):
+    """
+    with ブロックの間だけ計測を有効にし、終了時に表を表示したり結果を書き出したりします。
+    どれも指定しない場合は何もしません。
+
+    Args:
+        timings (bool): 終了時に summary() の表を out (既定は標準エラー出力) に表示する。
+        trace_path (str): trace() の内容を JSON で書き出すパス。
+        cprofile_path (str): cProfile の結果を保存するパス。
+    """
+    if not (timings or trace_path or cprofile_path):
+        yield
+        return
+    out = out or sys.stderr
+    reset()
+    enable()
+    profile = None
+    if cprofile_path:
+        import cProfile
+
+        profile = cProfile.Profile()
+        profile.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start
+        if profile is not None:
+            profile.disable()
+        disable()
+        if timings:
+            print(summary(wall), file=out)
+        if trace_path:
+            with open(trace_path, "w", encoding="utf-8") as f:
+                json.dump(trace(wall), f, ensure_ascii=False, indent=2)
+                f.write("\n")
+            print(f"計測結果を '{trace_path}' に書き出しました。", file=out)
+        if profile is not None:
+            profile.dump_stats(cprofile_path)
+            if timings:
+                import pstats
+
+                print("cProfile (累積時間の長い順, 上位15件):", file=out)
+                pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(15)
+            print(f"cProfile の結果を '{cprofile_path}' に保存しました。", file=out)
@@ -0,0 +1,163 @@
+from font_layout import layout_info, pack_glyph
+
+# プロポーショナル (可変幅) のフォントテーブル。
+# グリフはインクのある列だけを切り出した幅で詰めて1つの配列 <name> に続けて並べ、
+# 文字ごとのメトリクスを別の配列に持ちます。
+#   <name>_offsets   : <name> 内のグリフの先頭位置
+#   <name>_widths    : インクの幅 (0 の文字は空白で、ビットマップを持たない)
+#   <name>_x_offsets : ペン位置からインクの左端までの距離 (負の場合もある)
+#   <name>_advances  : 次の文字までのペンの送り幅
+# 描画するときは (ペン位置 + x_offset) からインクを描き、ペン位置を advance だけ進めます。
+# 可変幅でも1グリフを続けて格納できる packed / vpage / column だけが使えます。
+PROPORTIONAL_LAYOUTS = ("packed", "vpage", "column")
+
+
+def check_proportional_layout(layout):
+    """
+    プロポーショナル出力に使えるレイアウトか確認します。
+
+    Raises:
+        ValueError: 使えないレイアウトの場合。
+    """
+    if layout not in PROPORTIONAL_LAYOUTS:
+        raise ValueError(
+            f"プロポーショナル出力ではレイアウト {layout} は使えません "
+            f"(使えるレイアウト: {', '.join(PROPORTIONAL_LAYOUTS)})")
+
+
+def format_c_proportional_macros(array_name, height, layout, reverse_bits=False, mirror=False):
+    """
+    プロポーショナルのテーブル用のマクロ (サイズ定義、ピクセル取得マクロ) を返します。
+    PIXEL(glyph, x, y) の x はインクの左端を 0 とし、<name>_widths[glyph] 未満で指定します。
+    """
+    prefix = array_name.upper()
+    lines = [
+        f"// layout: {layout} (proportional), bit reversed: {'yes' if reverse_bits else 'no'}, "
+        f"mirrored: {'yes' if mirror else 'no'}",
+        f"#define {prefix}_PROPORTIONAL 1",
+        f"#define {prefix}_LAYOUT_{layout.upper()} 1",
+        f"#define {prefix}_BIT_REVERSED {int(reverse_bits)}",
+        f"#define {prefix}_MIRRORED {int(mirror)}",
+        f"#define {prefix}_HEIGHT {height}",
+    ]
+    width = f"{array_name}_widths[(glyph)]"
+    base = f"{array_name}[{array_name}_offsets[(glyph)]"
+    x = f"({width} - 1 - (x))" if mirror else "(x)"
+    if layout == "packed":
+        bit = f"((y) * {width} + {x})"
+        shift = f"({bit} & 7)" if reverse_bits else f"(7 - ({bit} & 7))"
+        pixel = f"(({base} + ({bit} >> 3)] >> {shift}) & 1)"
+    elif layout == "vpage":
+        shift = "(7 - ((y) & 7))" if reverse_bits else "((y) & 7)"
+        pixel = f"(({base} + ((y) >> 3) * {width} + {x}] >> {shift}) & 1)"
+    else:
+        pages = (height + 7) // 8
+        shift = "((y) & 7)" if reverse_bits else "(7 - ((y) & 7))"
+        pixel = f"(({base} + {x} * {pages} + ((y) >> 3)] >> {shift}) & 1)"
+    lines.append(f"#define {prefix}_PIXEL(glyph, x, y) {pixel}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_values(out, values, digits=None, per_line=16):
+    # digits を指定した場合は16進数、それ以外は10進数で書く
+    lines = []
+    for i in range(0, len(values), per_line):
+        lines.append("    " + ", ".join(
+            f"0x{v:0{digits}X}" if digits else str(v) for v in values[i:i + per_line]))
+    out.write(",\n".join(lines) + "\n")
+
+
+def metric_ctype(values, signed=False):
+    """
+    メトリクスの値が全て収まる要素型とそのバイト数を返します (大きなサイズでは16ビットになります)。
+    """
+    if signed:
+        if all(-0x80 <= v <= 0x7F for v in values):
+            return "int8_t", 1
+        return "int16_t", 2
+    if max(values) <= 0xFF:
+        return "uint8_t", 1
+    return "uint16_t", 2
+
+
+def write_c_proportional(out, title, array_name, glyphs, height, layout,
+                         reverse_bits=False, mirror=False):
+    """
+    プロポーショナルのグリフを1文字ずつ受け取り、C言語のソースとして out に書き出します。
+    ビットマップは受け取った順に書き出し、メトリクスの配列は最後にまとめて書きます。
+
+    Args:
+        out: 書き出し先のテキストファイル。
+        title (str): 見出しコメントの内容。
+        array_name (str): 配列名。
+        glyphs: (コメントに書く文字, render_proportional_bits() の結果) を順に返すイテラブル。
+        height (int): グリフの高さ。
+        layout (str): PROPORTIONAL_LAYOUTS のいずれか。
+        reverse_bits (bool): 要素内のビット順を反転する。
+        mirror (bool): 左右反転して格納する。
+
+    Returns:
+        dict: {"count": 文字数, "bitmap_bytes": ビットマップのバイト数,
+               "metrics_bytes": メトリクスの配列のバイト数, "max_width": 最大のインクの幅}
+    """
+    check_proportional_layout(layout)
+    out.write(f"// --- {title} ---\n")
+    out.write(format_c_proportional_macros(array_name, height, layout, reverse_bits, mirror))
+    out.write("\n")
+
+    offsets = []
+    widths = []
+    x_offsets = []
+    advances = []
+    pos = 0
+    for label, (data, width, x_offset, advance) in glyphs:
+        if pos == 0 and width:
+            out.write(f"const uint8_t {array_name}[] = {{\n")
+        offsets.append(pos)
+        widths.append(width)
+        x_offsets.append(x_offset)
+        advances.append(advance)
+        if not width:
+            continue
+        values = pack_glyph(data, width, height, layout, reverse_bits, mirror)
+        if pos:
+            out.write(",\n")
+        out.write(f"    // {label}\n    {', '.join(f'0x{v:02X}' for v in values)}")
+        pos += len(values)
+    if pos:
+        out.write("\n};\n\n")
+    else:
+        # 全て空白の場合も、PIXEL マクロが参照する配列は必要
+        out.write(f"const uint8_t {array_name}[1] = {{0}};\n\n")
+    if not offsets:
+        return {"count": 0, "bitmap_bytes": 0, "metrics_bytes": 0, "max_width": 0}
+
+    offset_type, offset_bytes = ("uint16_t", 2) if pos <= 0xFFFF else ("uint32_t", 4)
+    width_type, width_bytes = metric_ctype(widths)
+    x_offset_type, x_offset_bytes = metric_ctype(x_offsets, signed=True)
+    advance_type, advance_bytes = metric_ctype(advances)
+    out.write(f"#define {array_name.upper()}_MAX_WIDTH {max(widths)}\n")
+    out.write(f"const {offset_type} {array_name}_offsets[{len(offsets)}] = {{\n")
+    _write_values(out, offsets, offset_bytes * 2)
+    out.write(f"}};\nconst {width_type} {array_name}_widths[{len(widths)}] = {{\n")
+    _write_values(out, widths)
+    out.write(f"}};\nconst {x_offset_type} {array_name}_x_offsets[{len(x_offsets)}] = {{\n")
+    _write_values(out, x_offsets)
+    out.write(f"}};\nconst {advance_type} {array_name}_advances[{len(advances)}] = {{\n")
+    _write_values(out, advances)
+    out.write("};\n")
+    metric_bytes = offset_bytes + width_bytes + x_offset_bytes + advance_bytes
+    return {"count": len(offsets), "bitmap_bytes": pos,
+            "metrics_bytes": len(offsets) * metric_bytes, "max_width": max(widths)}
+
+
+def proportional_report(array_name, result, height, layout):
+    """
+    プロポーショナルのテーブルの大きさを、同じ高さの固定幅 (正方形) のテーブルと比較した文字列で返します。
+    """
+    fixed = result["count"] * layout_info(layout, height, height)["bytes"]
+    total = result["bitmap_bytes"] + result["metrics_bytes"]
+    ratio = total / fixed * 100 if fixed else 0
+    return (f"{array_name}: プロポーショナル {result['count']}文字, ビットマップ "
+            f"{result['bitmap_bytes']}バイト + メトリクス {result['metrics_bytes']}バイト = "
+            f"{total}バイト ({layout}, 固定幅 {height}x{height} の {fixed}バイトの {ratio:.1f}%)")
@@ -0,0 +1,474 @@
+import argparse
+import asyncio
+import bisect
+import io
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from c_emitter import write_c_array
+from charset import SURROGATE_FIRST, SURROGATE_LAST, glyph_label
+from font_blob import glyph_to_bytes
+from font_engine import font_cache_info, glyph_cache_info, iter_charset_bits
+from font_layout import LAYOUTS, layout_info, pack_glyph
+from font_paths import resolve_font_path
+from glyph_cache import GlyphDiskCache, default_cache_dir
+
+# フォントとグリフのキャッシュを保持したまま描画の依頼を受け付ける、常駐型のローカルサーバー。
+# 起動のたびに Python・Pillow の読み込みとフォントの解析をする代わりに、エディタの拡張機能や
+# ビルドファームから HTTP (localhost の TCP または Unix ソケット) で描画を依頼できます。
+#
+#   POST /render  JSON で依頼を受け取り、グリフを返す
+#     {"font": "DotGothic16-Regular.ttf", "size": 16, "layout": "row16",
+#      "codepoints": [65, 12354] または "text": "Aあ",
+#      "reverse": false, "mirror": false, "format": "hex" または "c", "name": "font_data_16"}
+#     format=hex: {"glyphs": [{"codepoint": 65, "data": "0000..."}, ...], "missing": [...]}
+#                 (data は .bin と同じバイト列の16進数。フォントに無い文字は data が null)
+#     format=c  : {"c": "const uint16_t font_data_16[2][16] = {...};", "missing": [...]}
+#                 (フォントに無い文字は全て0のグリフ)
+#   GET /stats    リクエスト数・待ち数とエンドポイントごとの応答時間のヒストグラム、キャッシュの統計
+#   GET /health   {"status": "ok"}
+#
+# 描画は1本のスレッドで順に行います (font_engine のキャッシュは1本のスレッドからだけ使うため)。
+# 同時に処理する依頼の数は --max-concurrent、それを超えて待たせる数は --max-queue で制限し、
+# 超えた依頼には 503 を返します。
+# ブラウザから localhost へ送られる依頼を受け付けないように、POST は Content-Type が
+# application/json のものだけを受け付け、Host ヘッダが localhost 以外の依頼は拒否します。
+
+DEFAULT_PORT = 8765
+
+# 1回の依頼で受け付ける最大の文字数と、本文の最大バイト数
+MAX_CODEPOINTS = 65536
+MAX_BODY_BYTES = 4 * 1024 * 1024
+MAX_HEADER_LINES = 100
+
+# 応答時間のヒストグラムの区切り (ミリ秒)。最後の区切りより遅いものは "+Inf" に数える
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "[::1]")
+
+FORMATS = ("hex", "c")
+
+# 応答時間を個別に集計するパス (それ以外は "other" にまとめる)
+PATHS = ("/render", "/stats", "/health")
+
+
+class RequestError(Exception):
+    """
+    依頼の内容が正しくない場合に送出する例外 (HTTP のステータスを持ちます)。
+    """
+
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyHistogram:
+    """
+    応答時間をミリ秒の区切り (LATENCY_BUCKETS_MS) ごとに数えるヒストグラム。
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        """
+        全体の fraction (0.95 など) が収まる区切りの上限 (ミリ秒) を返します。
+        """
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def snapshot(self):
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else None,
+            "max_ms": self.max,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets_ms": dict(zip(bounds, self.counts)),
+        }
+
+
+def host_name(header):
+    """
+    Host ヘッダからポートを除いたホスト名を返します ("[::1]:8765" は "[::1]")。
+    """
+    if header.startswith("["):
+        return header.split("]", 1)[0] + "]"
+    return header.rsplit(":", 1)[0]
+
+
+def parse_render_request(body):
+    """
+    /render の JSON を確認し、描画に使う値の辞書にします。
+
+    Raises:
+        RequestError: 内容が正しくない場合。
+    """
+    try:
+        request = json.loads(body)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise RequestError(f"JSON として読めません: {e}")
+    if not isinstance(request, dict):
+        raise RequestError("依頼は JSON のオブジェクトで指定してください。")
+
+    font = request.get("font")
+    if not isinstance(font, str) or not font:
+        raise RequestError("font にフォントファイルのパスを指定してください。")
+    font = resolve_font_path(font)
+    if not os.path.isfile(font):
+        raise RequestError(f"フォントファイルが見つかりません: {font}", HTTPStatus.NOT_FOUND)
+
+    size = request.get("size")
+    if not isinstance(size, int) or isinstance(size, bool) or not 0 < size <= 256:
+        raise RequestError("size には 1 から 256 の整数を指定してください。")
+    layout = request.get("layout", "pixel")
+    if layout not in LAYOUTS:
+        raise RequestError(f"不明なレイアウトです: {layout} (使えるレイアウト: {', '.join(LAYOUTS)})")
+    try:
+        layout_info(layout, size, size)
+    except ValueError as e:
+        raise RequestError(str(e))
+    output_format = request.get("format", "hex")
+    if output_format not in FORMATS:
+        raise RequestError(f"不明な形式です: {output_format} (使える形式: {', '.join(FORMATS)})")
+    flags = {}
+    for key in ("reverse", "mirror"):
+        flags[key] = request.get(key, False)
+        if not isinstance(flags[key], bool):
+            raise RequestError(f"{key} には true または false を指定してください。")
+    name = request.get("name", f"font_data_{size}")
+    if not isinstance(name, str) or not name.isidentifier():
+        raise RequestError(f"name には C言語の識別子を指定してください: {name}")
+
+    if "codepoints" in request:
+        codepoints = request["codepoints"]
+        if not isinstance(codepoints, list) or not all(
+                isinstance(cp, int) and not isinstance(cp, bool) and 0 <= cp <= 0x10FFFF
+                and not SURROGATE_FIRST <= cp <= SURROGATE_LAST for cp in codepoints):
+            raise RequestError("codepoints にはコードポイント (整数) のリストを指定してください。")
+        chars = [chr(cp) for cp in codepoints]
+    elif isinstance(request.get("text"), str):
+        chars = list(request["text"])
+        # JSON の "\ud800" のような対になっていないサロゲートは文字ではない (UTF-8 にできない)
+        if any(SURROGATE_FIRST <= ord(char) <= SURROGATE_LAST for char in chars):
+            raise RequestError("text に対になっていないサロゲートが含まれています。")
+    else:
+        raise RequestError("codepoints または text を指定してください。")
+    if len(chars) > MAX_CODEPOINTS:
+        raise RequestError(f"1回の依頼は {MAX_CODEPOINTS} 文字までです。",
+                           HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+    return {"font": font, "size": size, "layout": layout, "format": output_format,
+            "reverse": flags["reverse"], "mirror": flags["mirror"], "name": name, "chars": chars}
+
+
+def render_request(request, jobs=None, disk_cache=None):
+    """
+    parse_render_request() の結果に従って描画し、/render の応答の辞書を返します (描画スレッドで実行します)。
+    """
+    size, layout = request["size"], request["layout"]
+    chars = request["chars"]
+    glyphs = list(iter_charset_bits(chars, request["font"], size, jobs, disk_cache))
+    missing = list(dict.fromkeys(ord(char) for char, data in zip(chars, glyphs) if data is None))
+    if request["format"] == "c":
+        blank = bytes(((size + 7) // 8) * size)
+        out = io.StringIO()
+        write_c_array(out, request["name"],
+                      ((glyph_label(char), blank if data is None else data)
+                       for char, data in zip(chars, glyphs)),
+                      size, size, layout, request["reverse"], request["mirror"], count=len(chars))
+        return {"c": out.getvalue(), "missing": missing}
+
+    result = []
+    for char, data in zip(chars, glyphs):
+        if data is not None:
+            data = glyph_to_bytes(pack_glyph(data, size, size, layout, request["reverse"],
+                                             request["mirror"]), layout).hex()
+        result.append({"codepoint": ord(char), "data": data})
+    return {"layout": layout, "width": size, "height": size,
+            "bytes": layout_info(layout, size, size)["bytes"], "glyphs": result, "missing": missing}
+
+
+class RenderServer:
+    """
+    描画の依頼を HTTP で受け付けるサーバー。
+
+    使い方:
+        server = RenderServer(max_concurrent=4, max_queue=32)
+        asyncio.run(server.serve(port=8765))          # または unix_path="/tmp/font_to_bin.sock"
+    """
+
+    def __init__(self, max_concurrent=4, max_queue=32, jobs=None, disk_cache=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.jobs = jobs
+        self.disk_cache = disk_cache
+        self.started = time.monotonic()
+        # 描画中または描画の順番を待っている依頼の数 (max_concurrent 以下)
+        self.in_flight = 0
+        # in_flight の空きを待っている依頼の数 (max_queue 以下)
+        self.queued = 0
+        self.rejected = 0
+        self.requests = {}
+        self.histograms = {}
+        self._semaphore = None
+        # font_engine のキャッシュは1本のスレッドからだけ使う
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None, ready=None):
+        """
+        サーバーを起動し、止められるまで依頼を受け付けます。
+
+        Args:
+            ready: 受け付けを始めたときに呼ぶ関数 (待ち受けているアドレスを受け取ります)。
+        """
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                # 前回異常終了したときに残ったソケットファイル
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path)
+            address = unix_path
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            address = "http://{}:{}".format(*server.sockets[0].getsockname()[:2])
+        # Ctrl+C (SIGINT) と SIGTERM で待ち受けを終える (Windows では Ctrl+C の KeyboardInterrupt)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        try:
+            async with server:
+                if ready is not None:
+                    ready(address)
+                await stop.wait()
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            if unix_path is not None and os.path.exists(unix_path):
+                os.remove(unix_path)
+
+    async def handle_connection(self, reader, writer):
+        # 1つの接続で複数の依頼を順に処理する (keep-alive)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except RequestError as e:
+                    await self._send(writer, e.status, {"error": str(e)}, close=True)
+                    return
+                if request is None:
+                    return
+                method, path, headers, body = request
+                start = time.perf_counter()
+                status, payload = await self.dispatch(method, path, headers, body)
+                close = headers.get("connection", "").lower() == "close"
+                await self._send(writer, status, payload, close)
+                self._record(path, time.perf_counter() - start)
+                if close:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split()
+        except ValueError:
+            raise RequestError("リクエスト行が正しくありません。")
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise RequestError("ヘッダが多すぎます。", HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise RequestError("Content-Length が正しくありません。")
+        if length < 0 or length > MAX_BODY_BYTES:
+            raise RequestError(f"本文は {MAX_BODY_BYTES} バイトまでです。",
+                               HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b""
+        return method, target.split("?", 1)[0], headers, body
+
+    async def dispatch(self, method, path, headers, body):
+        """
+        依頼を処理し、(ステータス, 応答の辞書) を返します。
+        """
+        host = host_name(headers.get("host", "localhost"))
+        if host not in LOCAL_HOSTS:
+            return HTTPStatus.FORBIDDEN, {"error": f"localhost 以外からの依頼は受け付けません: {host}"}
+        if path == "/health":
+            return HTTPStatus.OK, {"status": "ok"}
+        if path == "/stats":
+            return HTTPStatus.OK, self.stats()
+        if path != "/render":
+            return HTTPStatus.NOT_FOUND, {"error": f"不明なパスです: {path}"}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "/render は POST で依頼してください。"}
+        if headers.get("content-type", "").split(";")[0].strip() != "application/json":
+            return HTTPStatus.UNSUPPORTED_MEDIA_TYPE, {
+                "error": "Content-Type: application/json で依頼してください。"}
+        try:
+            request = parse_render_request(body)
+            return HTTPStatus.OK, await self.render(request)
+        except RequestError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            # 1つの依頼の失敗でサーバーを止めない
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+
+    async def render(self, request):
+        """
+        同時に処理する数を制限しながら、描画スレッドで依頼を処理します。
+
+        Raises:
+            RequestError: 待っている依頼が多すぎる場合 (503)。
+        """
+        if self.in_flight >= self.max_concurrent and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise RequestError("依頼が多すぎます。しばらくしてから再度依頼してください。",
+                               HTTPStatus.SERVICE_UNAVAILABLE)
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, render_request, request, self.jobs, self.disk_cache)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _record(self, path, seconds):
+        if path not in PATHS:
+            path = "other"
+        self.requests[path] = self.requests.get(path, 0) + 1
+        if path not in self.histograms:
+            self.histograms[path] = LatencyHistogram()
+        self.histograms[path].record(seconds)
+
+    def stats(self):
+        """
+        /stats の応答 (リクエスト数・待ち数・応答時間のヒストグラム・キャッシュの統計) を返します。
+        """
+        stats = {
+            "uptime_seconds": time.monotonic() - self.started,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "requests": self.requests,
+            "latency": {path: histogram.snapshot() for path, histogram in self.histograms.items()},
+            "font_cache": font_cache_info(),
+            "glyph_cache": glyph_cache_info(),
+        }
+        if self.disk_cache is not None:
+            stats["disk_cache"] = {"hits": self.disk_cache.hits, "misses": self.disk_cache.misses}
+        return stats
+
+    async def _send(self, writer, status, payload, close=False):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="フォントとグリフのキャッシュを保持したまま、描画の依頼を HTTP で受け付けるローカルサーバー。",
+        epilog="例: python render_server.py --unix /tmp/font_to_bin.sock  /  "
+               "curl --unix-socket /tmp/font_to_bin.sock -H 'Content-Type: application/json' "
+               "-d '{\"font\": \"misaki_gothic_2nd.ttf\", \"size\": 8, \"layout\": \"row8\", "
+               "\"text\": \"Aあ\"}' http://localhost/render")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"127.0.0.1 で待ち受けるポート (既定: {DEFAULT_PORT}。0 は空いているポート)")
+    parser.add_argument("--unix", metavar="PATH",
+                        help="TCP の代わりに Unix ソケット PATH で待ち受ける")
+    parser.add_argument("--max-concurrent", type=int, default=4, metavar="N",
+                        help="同時に処理する依頼の数 (既定: 4)")
+    parser.add_argument("--max-queue", type=int, default=32, metavar="N",
+                        help="処理を待たせる依頼の数。超えた依頼には 503 を返す (既定: 32)")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                        help="キャッシュに無い文字を N 個のワーカープロセスで並列に描画する (0 はCPU数)")
+    parser.add_argument("--cache-dir", metavar="PATH",
+                        help=f"描画済みグリフのキャッシュを置くディレクトリ (既定: {default_cache_dir()})")
+    parser.add_argument("--cache-max-mb", type=float, default=64, metavar="MB",
+                        help="キャッシュディレクトリの上限サイズ (既定: 64MB)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ディスク上のグリフキャッシュを使わない")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.max_concurrent < 1 or args.max_queue < 0:
+        parser.error("--max-concurrent には1以上、--max-queue には0以上の数を指定してください。")
+    if args.jobs is not None and args.jobs < 0:
+        parser.error("--jobs には0以上の数を指定してください。")
+    if args.unix and not hasattr(asyncio, "start_unix_server"):
+        parser.error("この環境では Unix ソケットを使えません。--port を指定してください。")
+
+    disk_cache = None
+    if not args.no_cache:
+        disk_cache = GlyphDiskCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+    server = RenderServer(args.max_concurrent, args.max_queue, args.jobs, disk_cache)
+
+    def ready(address):
+        print(f"{address} で待ち受けています (Ctrl+C で終了)。", file=sys.stderr)
+
+    try:
+        asyncio.run(server.serve(port=args.port, unix_path=args.unix, ready=ready))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"エラー: 待ち受けを開始できません: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import queue
+import threading
+
+# GUI の描画処理をバックグラウンドの1本のスレッドで実行するための仕組み。
+# 処理は種類 (キー) ごとに最新の1件だけを保持し、新しい依頼が来た時点で古い依頼は取り消します。
+# 結果はキューに入れ、GUI 側がメインスレッドから poll() で受け取ります
+# (tkinter のウィジェットはメインスレッド以外から操作できないため)。
+# フォントやグリフのキャッシュ (font_engine) には排他制御が無いので、描画はこのスレッドだけで行い、
+# メインスレッドには描画・整形済みの結果だけを渡します (メインスレッドから描画しないでください)。
+
+
+class RenderWorker:
+    """
+    描画処理をバックグラウンドのスレッドで1件ずつ実行するクラス。
+
+    使い方:
+        worker = RenderWorker()
+        worker.submit("string", render_string, text)   # 同じキーの古い依頼は取り消される
+        for key, result, error in worker.poll():       # メインスレッドから定期的に呼ぶ
+            ...
+
+    submit() に渡す関数は、最後の引数に「取り消されたか」を返す関数を受け取ります。
+    時間のかかる処理は途中でこれを確認し、取り消されていれば None を返して中断してください。
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        # キー -> (世代, 関数, 引数)。まだ実行していない依頼
+        self._pending = {}
+        # キー -> 最新の世代。これと異なる世代の依頼・結果は取り消し済み
+        self._generations = {}
+        self._running = None
+        self._results = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="RenderWorker", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, func, *args):
+        """
+        func(*args, cancelled) の実行を依頼します。同じキーの未完了の依頼は取り消します。
+
+        Returns:
+            int: 依頼の世代。
+        """
+        with self._condition:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            self._pending[key] = (generation, func, args)
+            self._condition.notify()
+        return generation
+
+    def cancel(self, key):
+        """
+        キーの未完了の依頼を取り消します (実行中の処理の結果も捨てられます)。
+        """
+        with self._condition:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._pending.pop(key, None)
+
+    def is_current(self, key, generation):
+        """
+        世代 generation の依頼が、まだ取り消されていないかを返します。
+        """
+        return self._generations.get(key) == generation
+
+    def busy(self):
+        """
+        未完了の依頼、または受け取っていない結果があるかを返します。
+        """
+        with self._condition:
+            return bool(self._pending) or self._running is not None or not self._results.empty()
+
+    def poll(self):
+        """
+        完了した依頼の結果を、取り消されていないものだけ返します (メインスレッドから呼びます)。
+
+        Returns:
+            list: (キー, 結果, 例外) のリスト。処理が例外を送出した場合は結果が None になります。
+        """
+        results = []
+        while True:
+            try:
+                key, generation, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if self.is_current(key, generation):
+                results.append((key, result, error))
+        return results
+
+    def close(self):
+        """
+        スレッドを終了させます。未完了の依頼は実行しません。
+        """
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                key = next(iter(self._pending))
+                generation, func, args = self._pending.pop(key)
+                self._running = key
+
+            def cancelled(key=key, generation=generation):
+                return self._closed or not self.is_current(key, generation)
+
+            result = error = None
+            try:
+                result = func(*args, cancelled)
+            except Exception as e:
+                error = e
+            with self._condition:
+                self._running = None
+                if not cancelled():
+                    self._results.put((key, generation, result, error))
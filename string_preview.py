@@ -0,0 +1,152 @@
+import io
+from collections import OrderedDict
+
+from c_emitter import format_fragment_glyph, write_c_fragment
+from font_engine import render_glyph_bits
+
+# GUI の文字列タブの表示内容を、文字ごとに保持して差分だけを更新するための処理。
+# 結果の欄 (C言語の配列) は次の行で構成されます。
+#   お知らせの行 (フォントに無い文字がある場合だけ、1行)
+#   1文字の場合   : height 行 (2次元配列の中身)
+#   複数文字の場合: 文字ごとに height + 2 行 ("{" の行, height 行, "}," の行。最後の文字だけ "}")
+# 文字列を編集すると、前後の変わらない部分を除いた範囲の文字だけを描画・整形し直します。
+# 描画 (font_engine) はワーカースレッドの prepare() だけで行い、メインスレッドの update() には
+# 描画・整形済みの結果を渡します (フォントやグリフのキャッシュを2つのスレッドから使わないため)。
+# 結果の欄の行は全体を組み立てず、line() で必要な行だけを文字ごとの整形結果から取り出します
+# (GUI は virtual_view.py で、見えている範囲の行とプレビューだけを表示します)。
+
+# 文字ごとに保持する描画・整形結果の最大数
+STRING_CACHE_SIZE = 8192
+
+
+def _common_prefix(old, new):
+    """
+    old と new の先頭で一致する長さを返します。
+    """
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    return prefix
+
+
+class StringPreview:
+    """
+    文字列タブの1つのフォント・サイズ分の表示内容を、文字ごとに保持するクラス。
+
+    使い方:
+        preview = StringPreview(font_path, 16)
+        entries = preview.prepare(text, cancelled)   # ワーカースレッドで、新しい文字だけを描画する
+        start = preview.update(text, entries, note)  # メインスレッドで、表示が変わった先頭の文字を求める
+        preview.line(i)                              # 結果の欄の i 行目 (表示する範囲の行だけ取り出す)
+    """
+
+    def __init__(self, font_path, size):
+        self.font_path = font_path
+        self.size = size
+        # 表示中の文字 (グリフの無い文字を除いた並び) と、お知らせの行
+        self.chars = ""
+        self.note = None
+        # 表示中の文字 -> 描画・整形結果。update() で受け取ったもので、メインスレッドだけが使う
+        self._shown = {}
+        # 文字 -> (ビット列, 複数文字の場合の初期化子の行のリスト)。グリフが無い文字は None。
+        # prepare() を実行するワーカースレッドだけが使う
+        self._entries = OrderedDict()
+
+    def reset(self):
+        """
+        表示を消したときに呼び、次の update() で全体を作り直すようにします。
+        """
+        self.chars = ""
+        self.note = None
+        self._shown = {}
+
+    def prepare(self, text, cancelled):
+        """
+        text の文字の描画・整形結果を返します (ワーカースレッドで実行します)。
+        まだ描画していない文字だけを描画し、描画済みの文字は保持している結果を使います。
+
+        Returns:
+            dict: 文字 -> 描画・整形結果 (update() に渡します。グリフが無い文字は None)。
+                途中で取り消された場合は None。
+        """
+        entries = {}
+        for char in dict.fromkeys(text):
+            if cancelled():
+                return None
+            entries[char] = self._entry(char)
+        return entries
+
+    def glyph(self, char):
+        """
+        表示中の文字のビット列を返します。
+        """
+        return self._shown[char][0]
+
+    def _entry(self, char):
+        if char in self._entries:
+            self._entries.move_to_end(char)
+            return self._entries[char]
+        data = render_glyph_bits(char, self.font_path, self.size)
+        entry = None
+        if data is not None:
+            entry = (data, format_fragment_glyph(data, self.size, self.size).split("\n"))
+        self._entries[char] = entry
+        if len(self._entries) > STRING_CACHE_SIZE:
+            self._entries.popitem(last=False)
+        return entry
+
+    def _single_lines(self):
+        # 1文字の場合の行 (2次元配列の中身)
+        out = io.StringIO()
+        write_c_fragment(out, [self.glyph(self.chars)], self.size, self.size)
+        return out.getvalue().splitlines(keepends=True)
+
+    def line_count(self):
+        """
+        結果の欄の行数を返します。
+        """
+        count = len(self.chars)
+        glyph_lines = count * self.size if count <= 1 else count * (self.size + 2)
+        return (1 if self.note else 0) + glyph_lines
+
+    def line(self, index):
+        """
+        結果の欄の index 行目 (0始まり、改行を含む) を返します。
+        """
+        if self.note:
+            if index == 0:
+                return self.note
+            index -= 1
+        if len(self.chars) == 1:
+            return self._single_lines()[index]
+        glyph, row = divmod(index, self.size + 2)
+        text = self._shown[self.chars[glyph]][1][row]
+        if row == self.size + 1 and glyph < len(self.chars) - 1:
+            # 最後の文字以外は "}" の後に区切りの "," が付く
+            return text + ",\n"
+        return text + "\n"
+
+    def text(self):
+        """
+        結果の欄の内容全体を返します。
+        """
+        return "".join(self.line(i) for i in range(self.line_count()))
+
+    def update(self, text, entries, note=None):
+        """
+        表示内容を text に合わせ、前回から表示が変わった先頭の文字の位置を返します (メインスレッドで呼びます)。
+        ここでは描画せず、prepare() の結果 entries だけを使います。
+
+        Args:
+            text (str): 新しい文字列。
+            entries (dict): prepare(text, ...) の結果。
+            note (str): 先頭に表示するお知らせの行 (無い場合は None)。
+
+        Returns:
+            int: 表示が変わった先頭の文字の位置 (これより前の文字はプレビューを作り直す必要がありません)。
+        """
+        chars = "".join(char for char in text if entries[char] is not None)
+        prefix = _common_prefix(self.chars, chars)
+        self.chars, self.note, self._shown = chars, note, entries
+        return prefix
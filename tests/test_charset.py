@@ -0,0 +1,19 @@
+import pytest
+
+from c_emitter import manifest_hash
+from charset import parse_range
+
+
+def test_parse_range_skips_surrogates():
+    chars = parse_range("U+D7F0-U+E010")
+    assert len(chars) == (0xD7FF - 0xD7F0 + 1) + (0xE010 - 0xE000 + 1)
+    assert not any(0xD800 <= ord(char) <= 0xDFFF for char in chars)
+    # 生成条件のハッシュやディスクキャッシュで UTF-8 にできること
+    chars.encode("utf-8")
+    manifest_hash({"charset": chars})
+
+
+@pytest.mark.parametrize("spec", ["U+D800", "U+D800-U+DFFF", "U+E000-U+D000", "U+110000"])
+def test_parse_range_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_range(spec)
@@ -0,0 +1,37 @@
+import ast
+import os
+import re
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def local_imports(module, found):
+    """
+    module がリポジトリ直下から読み込むモジュールを、関数内での読み込みも含めて found に集めます。
+    """
+    if module in found:
+        return found
+    found.add(module)
+    with open(os.path.join(ROOT_DIR, f"{module}.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if os.path.exists(os.path.join(ROOT_DIR, f"{name}.py")):
+                local_imports(name, found)
+    return found
+
+
+def test_readme_lists_cui_modules():
+    # README の Colab の手順に、CUI版が読み込む全ての共通モジュールが書かれていること
+    with open(os.path.join(ROOT_DIR, "README.md"), encoding="utf-8") as f:
+        readme = f.read()
+    section = readme[readme.index("## ☁️ Google Colab"):]
+    section = section[:section.index("\n---")]
+    listed = set(re.findall(r"`(\w+)\.py`", section))
+    assert local_imports("font_to_binary_CUI", set()) <= listed
@@ -0,0 +1,68 @@
+import io
+import os
+
+from corpus import CorpusScan, coverage_missing
+from font_blob import FontBlob
+from font_engine import render_glyph_bits, render_proportional_bits
+from font_to_binary_batch import (generate_output, parse_table_spec, report_corpus_coverage,
+                                  write_table)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOTGOTHIC = os.path.join(ROOT_DIR, "DotGothic16-Regular.ttf")
+MISAKI = os.path.join(ROOT_DIR, "misaki_gothic_2nd.ttf")
+
+DEFAULTS = {"layout": "row16", "reverse": False, "mirror": False, "name": "", "title": "",
+            "format": "", "lookup": False, "dedup": False, "compress": "none",
+            "proportional": False}
+
+
+def make_table(output, charset, **options):
+    table = parse_table_spec(f"font={DOTGOTHIC},size=16,output={output}",
+                             dict(DEFAULTS, charset=charset))
+    table.update(options)
+    return table
+
+
+def test_blank_glyph_in_cmap_is_not_missing():
+    # U+0020 は cmap にあるので、インクが無くても全て0のグリフになる
+    assert render_glyph_bits(" ", DOTGOTHIC, 16) == bytes(2 * 16)
+    assert render_proportional_bits(" ", DOTGOTHIC, 16)[:3] == (b"", 0, 0)
+    assert render_glyph_bits("\U0001F600", DOTGOTHIC, 16) is None
+
+
+def test_skip_missing_keeps_space():
+    charset = "A \U0001F600B"
+    result = write_table(io.StringIO(), make_table("-", charset, lookup=True), charset, True)
+    assert result["missing"] == ["\U0001F600"]
+    assert result["count"] == 3
+    assert result["lookup"] is not None
+
+
+def test_blob_index_contains_space(tmp_path):
+    output = str(tmp_path / "font.bin")
+    generate_output(output, [make_table(output, "A B", format="bin")], False, force=True)
+    with FontBlob(output) as blob:
+        assert " " in blob
+        assert blob.get_bits(" ") == bytes(2 * 16)
+
+
+def test_coverage_missing_reports_spaces():
+    scan = CorpusScan()
+    scan.counts.update("a b\u3000c\u3000")
+    assert coverage_missing(scan, ["c", "\u3000"]) == ["\u3000", "c"]
+
+
+def test_corpus_report_lists_space_missing_from_cmap(tmp_path):
+    # U+00A0 は misaki の cmap に無いので、出力と同じくフォントに無い文字として報告する
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("a\u00a0b \u00a0", encoding="utf-8")
+    scan = CorpusScan()
+    scan.scan_paths([str(corpus)])
+    table = parse_table_spec(f"font={MISAKI},size=8,output=-", dict(DEFAULTS, charset=""))
+    report = io.StringIO()
+    coverage_file = io.StringIO()
+    report_corpus_coverage(scan, [table], None, None, report, coverage_file)
+    assert render_glyph_bits("\u00a0", MISAKI, 8) is None
+    assert "U+00A0" in report.getvalue()
+    assert "U+00A0" in coverage_file.getvalue()
+    assert "U+0020" not in coverage_file.getvalue()
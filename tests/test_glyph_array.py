@@ -0,0 +1,45 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+import glyph_array
+from charset import parse_range
+from font_to_binary_batch import main
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOTGOTHIC = os.path.join(ROOT_DIR, "DotGothic16-Regular.ttf")
+
+if not glyph_array.available():
+    pytest.skip("NumPy がインストールされていません", allow_module_level=True)
+
+
+def generate(path, options, use_array, monkeypatch):
+    # use_array が False の場合は NumPy が無い環境と同じ1文字ずつの処理で書き出す
+    monkeypatch.setattr(glyph_array, "np", glyph_array.np if use_array else None)
+    monkeypatch.setattr(glyph_array, "ARRAY_CHUNK", 100)
+    spec = f"font={DOTGOTHIC},size=16,output={path},name=font"
+    with contextlib.redirect_stdout(io.StringIO()):
+        main(["-r", "ascii", "-r", "kana", "-c", "\U0001F600", "-t", spec, "-q", "--force"]
+             + options)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# .bin は常にフォントに無い文字を除くので、--skip-missing の組み合わせは .c だけで確かめる
+@pytest.mark.parametrize("layout", ["pixel", "row16", "vpage", "column"])
+@pytest.mark.parametrize("ext, options", [
+    (".c", []),
+    (".c", ["--dedup"]),
+    (".c", ["--skip-missing", "--dedup", "--lookup"]),
+    (".bin", []),
+    (".bin", ["--dedup"]),
+])
+def test_chunked_array_output_matches_per_glyph(tmp_path, monkeypatch, layout, ext, options):
+    # 複数のチャンクにまたがる文字セットでも、1文字ずつ処理した出力と1バイトも違わないこと
+    assert len(parse_range("ascii") + parse_range("kana")) > 2 * 100
+    options = options + ["--layout", layout]
+    path = str(tmp_path / f"font{ext}")
+    expected = generate(path, options, False, monkeypatch)
+    assert generate(path, options, True, monkeypatch) == expected
@@ -0,0 +1,69 @@
+import io
+import os
+
+import pytest
+
+from font_engine import render_glyph_bits, render_proportional_bits
+from proportional import write_c_proportional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOTGOTHIC = os.path.join(ROOT_DIR, "DotGothic16-Regular.ttf")
+MISAKI = os.path.join(ROOT_DIR, "misaki_gothic_2nd.ttf")
+
+
+def ink_rows(bits, width, height):
+    """
+    ビット列をインクのある行・列だけに切り詰めた "01" の文字列のリストにします。
+    """
+    stride = (width + 7) // 8
+    rows = [format(int.from_bytes(bits[y * stride:(y + 1) * stride], "big"),
+                   f"0{stride * 8}b")[:width]
+            for y in range(height)]
+    rows = [row for row in rows if "1" in row]
+    if not rows:
+        return []
+    left = min(row.index("1") for row in rows)
+    right = max(row.rindex("1") for row in rows) + 1
+    return [row[left:right] for row in rows]
+
+
+@pytest.mark.parametrize("font_path, size", [(DOTGOTHIC, 16), (DOTGOTHIC, 12), (MISAKI, 8)])
+@pytest.mark.parametrize("char", ["_", "g", "y"])
+def test_proportional_ink_matches_fixed(char, font_path, size):
+    # 行の高さが size を超えるフォントでも、ディセンダが下端で欠けないこと
+    fixed = render_glyph_bits(char, font_path, size)
+    bits, width, _, _ = render_proportional_bits(char, font_path, size)
+    assert width > 0
+    assert ink_rows(bits, width, size) == ink_rows(fixed, size, size)
+
+
+def test_proportional_shares_baseline():
+    # 全ての文字で同じベースラインを使うので、x-height の文字 g と a は上端が揃う
+    g = render_proportional_bits("g", DOTGOTHIC, 16)
+    a = render_proportional_bits("a", DOTGOTHIC, 16)
+    stride = (g[1] + 7) // 8
+    g_top = next(y for y in range(16) if any(g[0][y * stride:(y + 1) * stride]))
+    stride = (a[1] + 7) // 8
+    a_top = next(y for y in range(16) if any(a[0][y * stride:(y + 1) * stride]))
+    assert g_top == a_top
+
+
+def test_large_metrics_use_16bit_types():
+    # 8ビットに収まらない幅・送り幅は、折り返さずに16ビットの型で出力する
+    glyph = render_proportional_bits("W", DOTGOTHIC, 600)
+    assert glyph[1] > 0xFF and glyph[3] > 0xFF
+    out = io.StringIO()
+    result = write_c_proportional(out, "W", "f", [("W", glyph)], 600, "packed")
+    source = out.getvalue()
+    assert f"const uint16_t f_widths[1] = {{\n    {glyph[1]}\n}};" in source
+    assert f"const uint16_t f_advances[1] = {{\n    {glyph[3]}\n}};" in source
+    assert "const int8_t f_x_offsets[1]" in source
+    assert result["metrics_bytes"] == 2 + 2 + 1 + 2
+
+
+def test_small_metrics_use_8bit_types():
+    out = io.StringIO()
+    write_c_proportional(out, "A", "f", [("A", render_proportional_bits("A", DOTGOTHIC, 16))],
+                         16, "packed")
+    assert "const uint8_t f_widths[1]" in out.getvalue()
+    assert "const uint8_t f_advances[1]" in out.getvalue()
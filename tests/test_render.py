@@ -0,0 +1,52 @@
+import os
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from charset import parse_range
+from font_engine import bits_to_matrix, clear_font_cache, render_charset_bits, render_glyph_bits
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONTS = [("misaki_gothic_2nd.ttf", 8), ("DotGothic16-Regular.ttf", 16)]
+
+
+def render_getpixel(text, font, size):
+    """
+    tobytes() を使う前の描画処理 (1ピクセルずつ getpixel で読む) と同じ方法で描画します。
+    インクが無い場合は None を返します。
+    """
+    image = Image.new("1", (size, size), 0)
+    draw = ImageDraw.Draw(image)
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+    if text_width == 0 or text_height == 0:
+        return None
+    x_offset = (size - text_width) // 2 - bbox[0]
+    y_offset = (size - text_height) // 2 - bbox[1]
+    draw.text((x_offset, y_offset), text, font=font, fill=1)
+    return [[1 if image.getpixel((x, y)) else 0 for x in range(size)] for y in range(size)]
+
+
+@pytest.mark.parametrize("font_name, size", FONTS)
+@pytest.mark.parametrize("charset", ["ascii", "kana"])
+def test_tobytes_matches_getpixel(font_name, size, charset):
+    font_path = os.path.join(ROOT_DIR, font_name)
+    font = ImageFont.truetype(font_path, size)
+    chars = parse_range(charset)
+    clear_font_cache()
+    for char, data in zip(chars, render_charset_bits(chars, font_path, size)):
+        expected = render_getpixel(char, font, size)
+        if expected is None:
+            # インクの無い文字 (空白など) は、cmap にあれば全て0のグリフになる
+            assert data is None or not any(data), char
+        else:
+            assert data is not None, char
+            assert bits_to_matrix(data, size) == expected, char
+
+
+def test_render_glyph_bits_uses_cache():
+    font_path = os.path.join(ROOT_DIR, "DotGothic16-Regular.ttf")
+    clear_font_cache()
+    first = render_glyph_bits("あ", font_path, 16)
+    assert render_glyph_bits("あ", font_path, 16) is first
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from render_server import RequestError, parse_render_request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("request_body", [
+    {"font": "DotGothic16-Regular.ttf", "size": 16, "text": "A\ud800"},
+    {"font": "DotGothic16-Regular.ttf", "size": 16, "codepoints": [65, 0xDC00]},
+])
+def test_render_request_rejects_surrogates(request_body):
+    with pytest.raises(RequestError) as info:
+        # JSON では "\ud800" のようにエスケープされる
+        parse_render_request(json.dumps(request_body).encode())
+    assert info.value.status == 400
+
+
+def test_render_request_accepts_text():
+    request = parse_render_request(json.dumps(
+        {"font": "DotGothic16-Regular.ttf", "size": 16, "text": "A\U0001F600"}).encode())
+    assert request["chars"] == ["A", "\U0001F600"]
+
+
+def test_server_does_not_import_batch_cli():
+    # サーバーの起動でバッチCLI版のモジュール全体を読み込まないこと
+    code = "import sys, render_server; print('font_to_binary_batch' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True,
+                            text=True, check=True)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,25 @@
+import io
+import os
+
+import pytest
+
+from benchmarks.bench_startup import (IMPORT_BUDGETS_MS, check_scenarios, forbidden_modules,
+                                      run_importtime)
+
+# 遅いマシンでは環境変数 FONT_TO_BIN_BUDGET_SCALE で予算を広げる (例: 2)
+BUDGET_SCALE = float(os.environ.get("FONT_TO_BIN_BUDGET_SCALE", "1"))
+
+
+@pytest.mark.parametrize("module", list(IMPORT_BUDGETS_MS))
+def test_import_is_lazy_and_within_budget(module):
+    # 読み込むだけで Pillow・NumPy・multiprocessing などを読み込まず、予算内で読み込めること
+    runs = [run_importtime(["-c", f"import {module}"])[0] for _ in range(3)]
+    assert forbidden_modules(runs[0]) == []
+    best = min(modules[module] for modules in runs) / 1000
+    assert best <= IMPORT_BUDGETS_MS[module] * BUDGET_SCALE, f"{module}: {best:.1f}ms"
+
+
+def test_no_render_runs_skip_heavy_modules():
+    # --help・生成条件が前回と同じ場合・ディスクキャッシュからの出力で、重いモジュールを読み込まないこと
+    out = io.StringIO()
+    assert check_scenarios(1, out) == [], out.getvalue()
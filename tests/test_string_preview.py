@@ -0,0 +1,53 @@
+import io
+import os
+
+import pytest
+
+import string_preview
+from c_emitter import write_c_fragment
+from font_engine import render_glyph_bits
+from string_preview import StringPreview
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOTGOTHIC = os.path.join(ROOT_DIR, "DotGothic16-Regular.ttf")
+
+
+def not_cancelled():
+    return False
+
+
+def test_main_thread_methods_do_not_render(monkeypatch):
+    # prepare() (ワーカースレッド) の後は、update() / line() / glyph() (メインスレッド) で描画しないこと
+    preview = StringPreview(DOTGOTHIC, 16)
+    entries = preview.prepare("AB\U0001F600A", not_cancelled)
+
+    def render(*args):
+        raise AssertionError("メインスレッドで描画しました")
+
+    monkeypatch.setattr(string_preview, "render_glyph_bits", render)
+    assert preview.update("AB\U0001F600A", entries) == 0
+    assert preview.chars == "ABA"
+    assert preview.line_count() == 3 * (16 + 2)
+    preview.text()
+    assert preview.glyph("B") == entries["B"][0]
+
+
+def test_update_returns_first_changed_char():
+    preview = StringPreview(DOTGOTHIC, 16)
+    preview.update("ABC", preview.prepare("ABC", not_cancelled))
+    assert preview.update("ABX", preview.prepare("ABX", not_cancelled)) == 2
+
+
+def test_prepare_can_be_cancelled():
+    preview = StringPreview(DOTGOTHIC, 16)
+    assert preview.prepare("ABC", lambda: True) is None
+
+
+@pytest.mark.parametrize("text", ["A", "AB"])
+def test_text_matches_fragment(text):
+    preview = StringPreview(DOTGOTHIC, 16)
+    preview.update(text, preview.prepare(text, not_cancelled))
+    out = io.StringIO()
+    write_c_fragment(out, [render_glyph_bits(char, DOTGOTHIC, 16) for char in text], 16, 16)
+    # 末尾の改行の有無だけは異なる
+    assert preview.text().rstrip("\n") == out.getvalue().rstrip("\n")
@@ -0,0 +1,187 @@
+import math
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+from PIL import ImageTk
+
+# 長い文字列でも軽く表示するための、見えている範囲だけを作るビュー。
+# 内容の全体はウィジェットに入れず、スクロールするたびに表示範囲の行・画像だけを
+# 呼び出し側の関数から受け取って表示します。
+
+
+class VirtualTextView(tk.Frame):
+    """
+    行の内容を get_line(行番号) から表示範囲の分だけ受け取って表示する、読み取り専用のテキスト表示。
+
+    使い方:
+        view = VirtualTextView(parent, height=10, font=("Courier", 9))
+        view.set_source(行数, get_line)   # get_line(i) は改行を含む i 行目 (0始まり) を返す
+        text = view.get_all()             # コピー用に全体を組み立てる
+    """
+
+    def __init__(self, parent, height=10, font=("Courier", 9), **kwargs):
+        super().__init__(parent)
+        self.text = tk.Text(self, height=height, wrap="none", font=font, **kwargs)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text.pack(side="left", fill="both", expand=True)
+        self.text.configure(state="disabled")
+        self.height = height
+        self.linespace = tkfont.Font(font=font).metrics("linespace")
+        self.line_count = 0
+        self.top = 0
+        self.get_line = None
+
+        # ホイールでのスクロールは、親のスクロールより先にこのビューで処理する
+        tag = f"VirtualTextView{id(self)}"
+        self.text.bindtags((tag,) + self.text.bindtags())
+        self.text.bind_class(tag, "<MouseWheel>", self._on_mousewheel)
+        self.text.bind_class(tag, "<Button-4>", lambda e: self._scroll_lines(-3))
+        self.text.bind_class(tag, "<Button-5>", lambda e: self._scroll_lines(3))
+        self.text.bind("<Configure>", lambda e: self.refresh())
+
+    def set_source(self, line_count, get_line):
+        """
+        表示する内容を設定し直し、表示範囲を描き直します (スクロール位置はなるべく保ちます)。
+        """
+        self.line_count = line_count
+        self.get_line = get_line
+        self.refresh()
+
+    def clear(self):
+        self.set_source(0, None)
+
+    def visible_lines(self):
+        """
+        現在の大きさで表示できる行数を返します。
+        """
+        height = self.text.winfo_height()
+        if height <= 1:
+            # まだ配置されていない場合は、指定された行数を使う
+            return self.height
+        return max(1, height // self.linespace)
+
+    def yview(self, *args):
+        """
+        スクロールバーからの操作 ("moveto", 割合 / "scroll", 量, "units" または "pages") を処理します。
+        """
+        if args[0] == "moveto":
+            self.top = round(float(args[1]) * self.line_count)
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_lines()
+            self.top += amount
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        # Windows は1ノッチが120、macOS は1ノッチが1前後
+        delta = event.delta // 40 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_lines(-1 * delta)
+
+    def _scroll_lines(self, amount):
+        self.top += amount
+        self.refresh()
+        return "break"
+
+    def refresh(self):
+        """
+        表示範囲の行だけを get_line() から受け取って表示し直します。
+        """
+        visible = self.visible_lines()
+        self.top = max(0, min(self.top, self.line_count - visible))
+        end = min(self.top + visible, self.line_count)
+        content = "".join(self.get_line(i) for i in range(self.top, end)) if end else ""
+        self.text.configure(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, content)
+        self.text.configure(state="disabled")
+        if self.line_count:
+            self.scrollbar.set(self.top / self.line_count, end / self.line_count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def get_all(self):
+        """
+        内容の全体を文字列で返します。
+        """
+        return "".join(self.get_line(i) for i in range(self.line_count))
+
+
+class VirtualTileView:
+    """
+    同じ幅の画像 (タイル) を横に並べたキャンバスのうち、見えている範囲のタイルだけを作って表示するクラス。
+    タイルの画像は get_key(番号) をキーとして共有します (同じ文字の画像は1つだけ作ります)。
+
+    使い方:
+        tiles = VirtualTileView(canvas, scrollbar, tile_width=160, tile_height=160)
+        tiles.set_source(タイル数, get_key, get_image)   # get_image(キー) は PIL の画像を返す
+    """
+
+    def __init__(self, canvas, scrollbar, tile_width, tile_height):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.count = 0
+        self.get_key = None
+        self.get_image = None
+        # タイルの番号 -> (キー, キャンバスのアイテム)
+        self.items = {}
+        # キー -> PhotoImage (表示中のタイルの分だけ保持する)
+        self.photos = {}
+        canvas.configure(xscrollcommand=self._on_xscroll)
+        canvas.bind("<Configure>", lambda e: self.refresh())
+
+    def set_source(self, count, get_key, get_image, changed_from=0):
+        """
+        表示する内容を設定し直します。
+
+        Args:
+            changed_from (int): この番号より前のタイルは変わっていない (作り直さない)。
+        """
+        self.count = count
+        self.get_key = get_key
+        self.get_image = get_image
+        for index in [index for index in self.items if index >= changed_from]:
+            self.canvas.delete(self.items.pop(index)[1])
+        self.canvas.configure(scrollregion=(0, 0, count * self.tile_width, self.tile_height))
+        self.refresh()
+
+    def clear(self):
+        self.set_source(0, None, None)
+        self.photos.clear()
+
+    def _on_xscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh()
+
+    def visible_range(self):
+        """
+        見えているタイルの番号の範囲 (先頭, 末尾 + 1) を返します。
+        """
+        left = self.canvas.canvasx(0)
+        width = max(self.canvas.winfo_width(), self.tile_width)
+        first = max(0, int(left // self.tile_width))
+        last = min(self.count, math.ceil((left + width) / self.tile_width))
+        return first, max(first, last)
+
+    def refresh(self):
+        """
+        見えている範囲のタイルを作り、範囲外になったタイルと画像を捨てます。
+        """
+        first, last = self.visible_range()
+        for index in [index for index in self.items if not first <= index < last]:
+            self.canvas.delete(self.items.pop(index)[1])
+        for index in range(first, last):
+            if index in self.items:
+                continue
+            key = self.get_key(index)
+            photo = self.photos.get(key)
+            if photo is None:
+                photo = self.photos[key] = ImageTk.PhotoImage(self.get_image(key))
+            self.items[index] = (key, self.canvas.create_image(
+                index * self.tile_width, 0, anchor="nw", image=photo))
+        shown = {key for key, _ in self.items.values()}
+        if len(self.photos) > len(shown):
+            self.photos = {key: photo for key, photo in self.photos.items() if key in shown}